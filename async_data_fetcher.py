@@ -0,0 +1,142 @@
+"""
+异步数据获取模块 - 基于 ccxt.async_support 并发获取多个交易对的数据
+"""
+import asyncio
+import pandas as pd
+from typing import Dict, List, Optional, Tuple, Union
+
+from ccxt_loader import load_async_exchange_class
+from data_fetcher import ohlcv_to_dataframe
+
+
+# 各交易所默认的最大并发请求数，未列出的交易所使用 DEFAULT_MAX_CONCURRENCY
+EXCHANGE_MAX_CONCURRENCY = {
+    'binance': 20,
+    'binanceus': 10,
+    'okx': 10,
+    'bybit': 10
+}
+DEFAULT_MAX_CONCURRENCY = 5
+
+
+class AsyncDataFetcher:
+    """异步交易所数据获取器"""
+
+    def __init__(self, proxy_url: str = None, exchange_id: str = 'binance',
+                 max_concurrency: int = None):
+        """
+        初始化异步数据获取器
+
+        Args:
+            proxy_url: 代理地址，如 'http://127.0.0.1:10808'
+            exchange_id: 交易所ID，如 'binance', 'okx'
+            max_concurrency: 同时进行的最大请求数，默认按交易所取值
+        """
+        self.exchange_id = exchange_id
+        exchange_class = load_async_exchange_class(exchange_id)
+        self.exchange = exchange_class({
+            'aiohttp_proxy': proxy_url or None,
+            'timeout': 30000,
+            'enableRateLimit': True
+        })
+
+        if max_concurrency is None:
+            max_concurrency = EXCHANGE_MAX_CONCURRENCY.get(exchange_id, DEFAULT_MAX_CONCURRENCY)
+        self.max_concurrency = max_concurrency
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self) -> None:
+        """关闭底层HTTP会话"""
+        await self.exchange.close()
+
+    def _limiter(self) -> asyncio.Semaphore:
+        """并发限制信号量（在事件循环内首次使用时创建）"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _fetch_ohlcv_frame(self, symbol: str, timeframe: str, limit: int) -> pd.DataFrame:
+        """获取K线并转换为DataFrame，失败时抛出异常"""
+        async with self._limiter():
+            ohlcv = await self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+        return ohlcv_to_dataframe(ohlcv)
+
+    async def fetch_realtime_price(self, symbol: str) -> Optional[float]:
+        """
+        获取实时价格
+
+        Args:
+            symbol: 交易对，如 'ETH/USDT'
+
+        Returns:
+            当前价格，失败返回None
+        """
+        try:
+            async with self._limiter():
+                ticker = await self.exchange.fetch_ticker(symbol)
+            return ticker['last']
+        except Exception as e:
+            print(f"❌ 获取实时价格失败: {e}")
+            return None
+
+    async def fetch_kline_data(self, symbol: str, timeframe: str = '15m',
+                               limit: int = 100) -> Optional[pd.DataFrame]:
+        """
+        获取K线数据
+
+        Args:
+            symbol: 交易对，如 'ETH/USDT'
+            timeframe: 时间周期，如 '1m', '5m', '15m', '1h', '4h', '1d'
+            limit: 获取的K线数量
+
+        Returns:
+            包含OHLCV数据的DataFrame，失败返回None
+        """
+        try:
+            return await self._fetch_ohlcv_frame(symbol, timeframe, limit)
+        except Exception as e:
+            print(f"❌ 获取K线数据失败: {e}")
+            return None
+
+    async def fetch_many(self, symbols: List[str], timeframes: List[str],
+                         limit: int = 100) -> Dict[Tuple[str, str], Union[pd.DataFrame, Exception]]:
+        """
+        并发获取多个交易对、多个周期的K线
+
+        所有请求同时发出，由信号量限制同时进行的请求数，
+        整体耗时取决于最慢的请求而不是所有请求之和
+
+        Args:
+            symbols: 交易对列表
+            timeframes: 时间周期列表
+            limit: 每个请求获取的K线数量
+
+        Returns:
+            (交易对, 周期) -> DataFrame，失败的请求对应其异常对象
+        """
+        keys = [(symbol, timeframe) for symbol in symbols for timeframe in timeframes]
+        results = await asyncio.gather(
+            *(self._fetch_ohlcv_frame(symbol, timeframe, limit) for symbol, timeframe in keys),
+            return_exceptions=True
+        )
+        return dict(zip(keys, results))
+
+
+if __name__ == '__main__':
+    # 测试代码
+    async def _demo():
+        async with AsyncDataFetcher(proxy_url='http://127.0.0.1:10808') as fetcher:
+            results = await fetcher.fetch_many(['ETH/USDT', 'BTC/USDT'], ['15m', '1h'], limit=30)
+            for (symbol, timeframe), result in results.items():
+                if isinstance(result, Exception):
+                    print(f"❌ {symbol} {timeframe}: {result}")
+                else:
+                    print(f"✅ {symbol} {timeframe}: {len(result)} 条K线, 最新收盘价 {result['close'].iloc[-1]:.2f}")
+
+    asyncio.run(_demo())
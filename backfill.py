@@ -0,0 +1,253 @@
+"""
+历史K线回补工具 - 按时间窗口分页并发下载，写入本地K线存储，支持中断后续传
+
+用法示例:
+    python backfill.py --exchange binance --symbols ETH/USDT BTC/USDT --timeframes 1m 1h \\
+        --start 2025-01-01 --end 2025-06-01 --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import ccxt
+
+from candle_store import CandleStore
+from markets_cache import MarketsCache
+from rate_limiter import PRIORITY_LOW, RateLimitScheduler
+
+
+# 各交易所单次请求的最大K线数量，未列出的使用 DEFAULT_PAGE_SIZE
+PAGE_SIZES = {
+    'binance': 1000,
+    'binanceus': 1000,
+    'bybit': 1000,
+    'okx': 100
+}
+DEFAULT_PAGE_SIZE = 500
+MAX_RETRIES = 5
+
+
+def parse_date(value: str) -> int:
+    """把 'YYYY-MM-DD' 或 'YYYY-MM-DD HH:MM'（UTC）转换为毫秒时间戳"""
+    for fmt in ('%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            dt = datetime.strptime(value, fmt).replace(tzinfo=timezone.utc)
+            return int(dt.timestamp() * 1000)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f'无法解析日期: {value}')
+
+
+def split_windows(start_ms: int, end_ms: int, timeframe_ms: int, page_size: int) -> List[int]:
+    """把 [start_ms, end_ms) 按每页 page_size 根K线切分，返回每页的since"""
+    span = timeframe_ms * page_size
+    return list(range(start_ms, end_ms, span))
+
+
+class RequestPacer:
+    """线程安全的请求节拍器：保证相邻两次请求的发起间隔不小于交易所的rateLimit"""
+
+    def __init__(self, interval_ms: float):
+        self.interval = interval_ms / 1000
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait_for = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+class Checkpoint:
+    """回补进度文件: 序列键 -> {start, end, until, next}（until为实际规划的下载终点）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.progress: Dict[str, dict] = json.load(f)
+        except (OSError, ValueError):
+            self.progress = {}
+
+    def resume_from(self, key: str, start_ms: int, end_ms: int) -> tuple:
+        """
+        同一区间的任务从上次完成的位置继续，否则从头开始
+
+        Returns:
+            (继续下载的起点, 实际下载区间的终点)，终点为上次规划并保存的区间终点
+        """
+        entry = self.progress.get(key)
+        if entry and entry.get('start') == start_ms and entry.get('end') == end_ms:
+            return entry['next'], entry.get('until', end_ms)
+        return start_ms, end_ms
+
+    def update(self, key: str, start_ms: int, end_ms: int, next_ms: int, until_ms: int) -> None:
+        with self._lock:
+            self.progress[key] = {'start': start_ms, 'end': end_ms, 'until': until_ms, 'next': next_ms}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.progress, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+class Backfiller:
+    """历史K线回补器"""
+
+    def __init__(self, exchange, exchange_id: str, store: CandleStore, checkpoint: Checkpoint,
+                 workers: int = 4, page_size: Optional[int] = None,
+                 rate_limiter: Optional[RateLimitScheduler] = None):
+        """
+        初始化回补器
+
+        Args:
+            exchange: ccxt交易所对象
+            exchange_id: 交易所ID（用作存储目录和进度键）
+            store: 写入的K线存储
+            checkpoint: 进度文件
+            workers: 并发下载线程数
+            page_size: 每页K线数量，默认按交易所取值
+            rate_limiter: 与监控进程共享的限频器（以低优先级申请额度）
+        """
+        self.exchange = exchange
+        self.exchange_id = exchange_id
+        self.store = store
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.page_size = page_size or PAGE_SIZES.get(exchange_id, DEFAULT_PAGE_SIZE)
+        self.pacer = RequestPacer(getattr(exchange, 'rateLimit', 0) or 0)
+        self.rate_limiter = rate_limiter
+
+    def _fetch_window(self, symbol: str, timeframe: str, since: int, until: int) -> List[list]:
+        """下载一页K线，网络错误和限频按指数退避重试"""
+        for attempt in range(MAX_RETRIES):
+            self.pacer.wait()
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(self.exchange_id, 'fetch_ohlcv', PRIORITY_LOW)
+            try:
+                candles = self.exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=self.page_size)
+                return [candle for candle in candles if since <= candle[0] < until]
+            except (ccxt.NetworkError, ccxt.RateLimitExceeded) as e:
+                if attempt == MAX_RETRIES - 1:
+                    raise
+                delay = 2 ** attempt
+                print(f"⚠️ {symbol} {timeframe} 请求失败，{delay}秒后重试: {e}")
+                time.sleep(delay)
+        return []
+
+    def _plan(self, symbol: str, timeframe: str, start_ms: int, end_ms: int) -> tuple:
+        """
+        确定实际下载区间
+
+        存储中已有从start之前开始的数据时，从其尾部继续；已有数据晚于start时，从start开始下载，
+        已有数据已经覆盖到end时只补齐头部缺失的部分（存储按时间戳合并，已有的K线不会丢失）。
+        规划出的终点保存在进度文件中，中断后按同一区间续传
+        """
+        key = f'{self.exchange_id}|{symbol}|{timeframe}'
+        begin, until = self.checkpoint.resume_from(key, start_ms, end_ms)
+        if begin > start_ms:
+            return key, begin, until
+
+        arrays = self.store.open_arrays(self.exchange_id, symbol, timeframe)
+        timestamps = arrays['timestamp']
+        if len(timestamps) > 0:
+            timeframe_ms = self.exchange.parse_timeframe(timeframe) * 1000
+            first_ts, last_ts = int(timestamps[0]), int(timestamps[-1])
+            if first_ts <= start_ms:
+                begin = max(begin, last_ts + timeframe_ms)
+            elif last_ts + timeframe_ms >= end_ms:
+                until = min(until, first_ts)
+        del arrays, timestamps
+        return key, begin, until
+
+    def run(self, symbols: List[str], timeframes: List[str], start_ms: int, end_ms: int) -> None:
+        """
+        回补所有 交易对 x 周期
+
+        所有窗口同时提交到线程池，按时间顺序依次写入存储并更新进度，
+        因此进度文件中的next之前的数据一定已经完整落盘
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            jobs = []
+            for symbol in symbols:
+                for timeframe in timeframes:
+                    key, begin, until = self._plan(symbol, timeframe, start_ms, end_ms)
+                    timeframe_ms = self.exchange.parse_timeframe(timeframe) * 1000
+                    windows = split_windows(begin, until, timeframe_ms, self.page_size)
+                    futures = [
+                        pool.submit(self._fetch_window, symbol, timeframe, since,
+                                    min(until, since + timeframe_ms * self.page_size))
+                        for since in windows
+                    ]
+                    jobs.append((key, symbol, timeframe, until, timeframe_ms, windows, futures))
+
+            try:
+                for key, symbol, timeframe, until, timeframe_ms, windows, futures in jobs:
+                    total = 0
+                    print(f"📥 {symbol} {timeframe}: {len(windows)} 页待下载")
+                    for since, future in zip(windows, futures):
+                        candles = future.result()
+                        if candles:
+                            self.store.write(self.exchange_id, symbol, timeframe, candles)
+                            total += len(candles)
+                        next_ms = min(until, since + timeframe_ms * self.page_size)
+                        self.checkpoint.update(key, start_ms, end_ms, next_ms, until)
+                    print(f"✅ {symbol} {timeframe}: 写入 {total} 条K线，"
+                          f"存储共 {self.store.count(self.exchange_id, symbol, timeframe)} 条")
+            except BaseException:
+                # 出错或被中断时取消尚未开始的下载，已落盘的进度下次继续
+                for job in jobs:
+                    for future in job[-1]:
+                        future.cancel()
+                raise
+
+
+def main(argv: List[str] = None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='历史K线回补工具')
+    parser.add_argument('--exchange', default='binance', help='交易所ID')
+    parser.add_argument('--symbols', nargs='+', required=True, help='交易对，如 ETH/USDT')
+    parser.add_argument('--timeframes', nargs='+', default=['1m'], help='时间周期，如 1m 1h')
+    parser.add_argument('--start', type=parse_date, required=True, help='开始日期(UTC)，如 2025-01-01')
+    parser.add_argument('--end', type=parse_date, default=None, help='结束日期(UTC)，默认当前时间')
+    parser.add_argument('--store', default='data/candles', help='K线存储目录')
+    parser.add_argument('--checkpoint', default='data/backfill_checkpoint.json', help='进度文件')
+    parser.add_argument('--workers', type=int, default=4, help='并发下载线程数')
+    parser.add_argument('--page-size', type=int, default=None, help='每页K线数量')
+    parser.add_argument('--proxy', default=None, help='代理地址')
+    parser.add_argument('--rate-limit-dir', default='data/ratelimit', help='共享限频状态目录')
+    args = parser.parse_args(argv)
+
+    proxies = {'http': args.proxy, 'https': args.proxy} if args.proxy else None
+    # 限频由 RequestPacer 统一控制（ccxt自带的限频在多线程下不生效）
+    exchange = getattr(ccxt, args.exchange)({'proxies': proxies, 'timeout': 30000, 'enableRateLimit': False})
+    markets_cache = MarketsCache()
+    if not markets_cache.load(args.exchange, exchange):
+        exchange.load_markets()
+        markets_cache.save(args.exchange, exchange)
+
+    end_ms = args.end if args.end is not None else exchange.milliseconds()
+    backfiller = Backfiller(exchange, args.exchange, CandleStore(args.store),
+                            Checkpoint(args.checkpoint), workers=args.workers,
+                            page_size=args.page_size,
+                            rate_limiter=RateLimitScheduler(args.rate_limit_dir))
+    started = time.perf_counter()
+    backfiller.run(args.symbols, args.timeframes, args.start, end_ms)
+    print(f"\n🎉 回补完成，耗时 {time.perf_counter() - started:.1f}秒")
+
+
+if __name__ == '__main__':
+    sys.stdout.reconfigure(encoding='utf-8')
+    main()
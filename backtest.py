@@ -0,0 +1,376 @@
+"""
+回测模块 - 用本地K线（K线存储或CSV）回放 BOLL 策略，统计交易、收益、回撤和胜率
+
+指标由NumPy内核计算，信号由 SignalDetector.detect_signals_batch 一次生成（与实盘逐根检测的结果相同），
+交易和资金曲线全部向量化，一年的1分钟K线（约52万根）几秒内完成，完全离线运行。
+
+用法示例:
+    python backtest.py --symbol ETH/USDT --timeframe 1m                  # 读取 data/candles 中的K线
+    python backtest.py --symbol ETH/USDT --timeframe 1m --resample 15m --start 2025-01-01
+    python backtest.py --csv eth_1m.csv --fee 0.0005 --band qband
+    python backtest.py --csv eth_1m.csv --import-to-store --symbol ETH/USDT --timeframe 1m
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+
+from candle_store import CandleStore
+from indicator import QUANTILE_BANDS, calculate_quantile_band_arrays, compute_indicator_arrays
+from resampler import timeframe_to_ms
+from signal_detector import SignalDetector
+
+# 单边手续费率（开仓和平仓各收一次）
+DEFAULT_FEE_RATE = 0.0004
+
+# 平仓原因
+EXIT_SIGNAL = 0     # 平多/平空信号
+EXIT_REVERSE = 1    # 反向开仓信号
+EXIT_END = 2        # 回测结束时仍持仓，按最后收盘价结算
+EXIT_REASONS = ('平仓信号', '反向开仓', '回测结束')
+
+
+# ==================== 数据 ====================
+
+def load_csv(path: str) -> Dict[str, np.ndarray]:
+    """
+    读取CSV格式的K线
+
+    需要 timestamp, open, high, low, close, volume 六列（有无表头均可，列名不区分大小写）；
+    timestamp 可以是毫秒时间戳或日期时间字符串（按UTC解析）
+
+    Returns:
+        列名 -> 数组，按时间升序、时间戳去重
+    """
+    import pandas as pd
+
+    columns = list(CandleStore.COLUMNS)
+    # round_trip: 价格按字符串原样精确解析
+    df = pd.read_csv(path, float_precision='round_trip')
+    if not set(columns) <= {str(name).strip().lower() for name in df.columns}:
+        df = pd.read_csv(path, header=None, float_precision='round_trip').iloc[:, :len(columns)]
+        df.columns = columns
+    df.columns = [str(name).strip().lower() for name in df.columns]
+
+    timestamps = df['timestamp']
+    if not pd.api.types.is_numeric_dtype(timestamps):
+        timestamps = pd.to_datetime(timestamps, utc=True).dt.tz_localize(None)
+        timestamps = timestamps.to_numpy().astype('datetime64[ms]').astype(np.int64)
+    arrays = {'timestamp': np.asarray(timestamps, dtype=np.int64)}
+    for column in columns[1:]:
+        arrays[column] = df[column].to_numpy(dtype=np.float64)
+
+    order = np.argsort(arrays['timestamp'], kind='stable')
+    arrays = {name: values[order] for name, values in arrays.items()}
+    # 重复的时间戳保留最后一条
+    keep = np.r_[arrays['timestamp'][1:] != arrays['timestamp'][:-1], True][:len(order)]
+    return {name: values[keep] for name, values in arrays.items()}
+
+
+def to_ohlcv(candles: Mapping[str, np.ndarray]) -> List[list]:
+    """列数组转换为ccxt格式的OHLCV列表（写入K线存储用）"""
+    columns = [np.asarray(candles[name]).tolist() for name in CandleStore.COLUMNS]
+    return [list(row) for row in zip(*columns)]
+
+
+def slice_range(candles: Mapping[str, np.ndarray], start_ms: Optional[int] = None,
+                end_ms: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """截取 [start_ms, end_ms) 范围内的K线"""
+    timestamps = candles['timestamp']
+    lo = 0 if start_ms is None else int(np.searchsorted(timestamps, start_ms))
+    hi = len(timestamps) if end_ms is None else int(np.searchsorted(timestamps, end_ms))
+    return {name: np.asarray(values[lo:hi]) for name, values in candles.items()}
+
+
+def resample_arrays(candles: Mapping[str, np.ndarray], timeframe_ms: int) -> Dict[str, np.ndarray]:
+    """
+    向量化合成更大周期的K线（按UTC整点对齐，丢弃不完整的第一根，与 resampler.resample_ohlcv 相同）
+    """
+    timestamps = np.asarray(candles['timestamp'], dtype=np.int64)
+    if len(timestamps) == 0:
+        return {name: np.asarray(values)[:0] for name, values in candles.items()}
+    buckets = timestamps - timestamps % timeframe_ms
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(timestamps)] - 1
+    result = {
+        'timestamp': buckets[starts],
+        'open': np.asarray(candles['open'])[starts],
+        'high': np.maximum.reduceat(np.asarray(candles['high']), starts),
+        'low': np.minimum.reduceat(np.asarray(candles['low']), starts),
+        'close': np.asarray(candles['close'])[ends],
+        'volume': np.add.reduceat(np.asarray(candles['volume'], dtype=np.float64), starts)
+    }
+    if timestamps[0] != buckets[0]:
+        result = {name: values[1:] for name, values in result.items()}
+    return result
+
+
+# ==================== 回测 ====================
+
+class BacktestResult:
+    """
+    回测结果
+
+    trades 为 列名 -> 数组 的字典，每笔交易一行：
+    entry_index/exit_index（K线下标）、direction（1多/-1空）、entry_price/exit_price、
+    return（扣除双边手续费后的收益率）、exit_reason（EXIT_SIGNAL/EXIT_REVERSE/EXIT_END）。
+    equity 为每根K线收盘时的净值（初始为1，每笔交易按全部净值开仓，持仓期间按开仓名义价值逐根计价）
+    """
+
+    def __init__(self, timestamps: np.ndarray, close: np.ndarray, signals: Dict[str, np.ndarray],
+                 trades: Dict[str, np.ndarray], equity: np.ndarray, fee_rate: float):
+        self.timestamps = timestamps
+        self.close = close
+        self.signals = signals
+        self.trades = trades
+        self.equity = equity
+        self.fee_rate = fee_rate
+        self.stats = self._statistics()
+
+    def __len__(self) -> int:
+        return len(self.trades['return'])
+
+    def _statistics(self) -> Dict:
+        returns = self.trades['return']
+        wins = returns > 0
+        peak = np.maximum.accumulate(self.equity) if len(self.equity) else self.equity
+        drawdown = 1 - self.equity / peak if len(self.equity) else self.equity
+        gross_profit = float(returns[wins].sum())
+        gross_loss = float(-returns[returns < 0].sum())
+        return {
+            'bars': len(self.close),
+            'trades': len(returns),
+            'long_trades': int((self.trades['direction'] == 1).sum()),
+            'short_trades': int((self.trades['direction'] == -1).sum()),
+            'wins': int(wins.sum()),
+            'hit_rate': float(wins.mean()) if len(returns) else 0.0,
+            'total_return': float(self.equity[-1] - 1) if len(self.equity) else 0.0,
+            'avg_trade_return': float(returns.mean()) if len(returns) else 0.0,
+            'best_trade': float(returns.max()) if len(returns) else 0.0,
+            'worst_trade': float(returns.min()) if len(returns) else 0.0,
+            'profit_factor': gross_profit / gross_loss if gross_loss > 0 else (float('inf') if gross_profit else 0.0),
+            'max_drawdown': float(drawdown.max()) if len(drawdown) else 0.0,
+            'exposure': float((self.signals['position'] != 0).mean()) if len(self.close) else 0.0
+        }
+
+    def trade_list(self) -> List[Dict]:
+        """交易明细（便于打印或导出）"""
+        rows = []
+        for i in range(len(self)):
+            entry, exit_ = int(self.trades['entry_index'][i]), int(self.trades['exit_index'][i])
+            rows.append({
+                'entry_time': _format_ms(self.timestamps[entry]),
+                'exit_time': _format_ms(self.timestamps[exit_]),
+                'direction': '做多' if self.trades['direction'][i] == 1 else '做空',
+                'entry_price': float(self.trades['entry_price'][i]),
+                'exit_price': float(self.trades['exit_price'][i]),
+                'return': float(self.trades['return'][i]),
+                'exit_reason': EXIT_REASONS[self.trades['exit_reason'][i]]
+            })
+        return rows
+
+    def print_report(self, show_trades: int = 10) -> None:
+        """打印统计和最近的交易"""
+        stats = self.stats
+        print("=" * 80)
+        print("📊 回测结果")
+        print("=" * 80)
+        if stats['bars']:
+            print(f"⏱️  区间: {_format_ms(self.timestamps[0])} ~ {_format_ms(self.timestamps[-1])} "
+                  f"({stats['bars']} 根K线)")
+        print(f"🔁 交易次数: {stats['trades']} (做多 {stats['long_trades']} / 做空 {stats['short_trades']})")
+        print(f"🎯 胜率: {stats['hit_rate'] * 100:.1f}% ({stats['wins']}/{stats['trades']})")
+        print(f"💰 总收益: {stats['total_return'] * 100:+.2f}% (手续费 {self.fee_rate * 100:.3f}%/边)")
+        print(f"📈 平均每笔: {stats['avg_trade_return'] * 100:+.3f}% | 最好 {stats['best_trade'] * 100:+.2f}% "
+              f"| 最差 {stats['worst_trade'] * 100:+.2f}%")
+        print(f"⚖️  盈亏比(Profit Factor): {stats['profit_factor']:.2f}")
+        print(f"📉 最大回撤: {stats['max_drawdown'] * 100:.2f}%")
+        print(f"⏳ 持仓时间占比: {stats['exposure'] * 100:.1f}%")
+        if show_trades and len(self):
+            print("-" * 80)
+            print(f"最近 {min(show_trades, len(self))} 笔交易:")
+            for trade in self.trade_list()[-show_trades:]:
+                emoji = '🟢' if trade['direction'] == '做多' else '🔴'
+                print(f"  {emoji} {trade['entry_time']} ${trade['entry_price']:,.2f} → "
+                      f"{trade['exit_time']} ${trade['exit_price']:,.2f} "
+                      f"{trade['return'] * 100:+.2f}% ({trade['exit_reason']})")
+        print("=" * 80)
+
+
+def _format_ms(timestamp_ms) -> str:
+    return datetime.fromtimestamp(int(timestamp_ms) / 1000, tz=timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+
+def extract_trades(close: np.ndarray, position: np.ndarray, fee_rate: float = DEFAULT_FEE_RATE) -> Dict[str, np.ndarray]:
+    """
+    由每根K线之后的持仓数组提取交易
+
+    持仓变化处先平掉原有持仓、再按新方向开仓（同方向的重复开仓信号不加仓），均以该K线收盘价成交；
+    最后仍未平仓的交易按最后一根K线的收盘价结算
+    """
+    n = len(close)
+    previous = np.r_[np.int8(0), position[:-1]] if n else position
+    changes = np.flatnonzero(position != previous)
+    entries = changes[position[changes] != 0]
+
+    # 每笔交易在开仓后的下一次持仓变化时平仓
+    following = np.searchsorted(changes, entries, side='right')
+    closed = following < len(changes)
+    exits = np.where(closed, changes[np.minimum(following, max(len(changes) - 1, 0))], n - 1)
+    direction = position[entries].astype(np.int8)
+    exit_reason = np.where(~closed, EXIT_END,
+                           np.where(position[exits] == 0, EXIT_SIGNAL, EXIT_REVERSE)).astype(np.int8)
+
+    entry_price = close[entries]
+    exit_price = close[exits]
+    returns = direction * (exit_price / entry_price - 1) - 2 * fee_rate
+    return {
+        'entry_index': entries,
+        'exit_index': exits,
+        'direction': direction,
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'return': returns,
+        'exit_reason': exit_reason
+    }
+
+
+def equity_curve(close: np.ndarray, trades: Dict[str, np.ndarray], fee_rate: float = DEFAULT_FEE_RATE) -> np.ndarray:
+    """
+    每根K线收盘时的净值
+
+    每笔交易以开仓前的全部净值开仓；持仓期间净值 = 开仓前净值 × (1 - 开仓手续费 + 方向 × 价格涨跌幅)，
+    平仓后等于开仓前净值 × (1 + 该笔收益)
+    """
+    n = len(close)
+    entries, exits = trades['entry_index'], trades['exit_index']
+    after = np.cumprod(1 + trades['return'])
+    before = np.r_[1.0, after[:-1]] if len(after) else after
+
+    bars = np.arange(n)
+    latest = np.searchsorted(entries, bars, side='right') - 1
+    k = np.maximum(latest, 0)
+    if len(entries) == 0:
+        return np.ones(n)
+    holding = (latest >= 0) & (bars < exits[k])
+    marked = before[k] * (1 - fee_rate + trades['direction'][k] * (close / trades['entry_price'][k] - 1))
+    settled = np.where(latest >= 0, after[k], 1.0)
+    return np.where(holding, marked, settled)
+
+
+def run_backtest(candles: Mapping[str, np.ndarray], boll_period: int = 20, boll_std: float = 2.0,
+                 rsi_period: int = 14, fee_rate: float = DEFAULT_FEE_RATE, band: str = 'boll',
+                 quantiles=QUANTILE_BANDS, wilder: bool = False) -> BacktestResult:
+    """
+    回测BOLL策略
+
+    Args:
+        candles: 至少包含 timestamp 和 close 的列数组（CandleStore.open_arrays、load_csv 的返回值）
+        boll_period: 布林带周期（band='qband' 时为分位数窗口长度）
+        boll_std: 布林带标准差倍数
+        rsi_period: RSI周期（只作为参考，不影响信号）
+        fee_rate: 单边手续费率
+        band: 'boll' 使用布林带，'qband' 使用分位数通道
+        quantiles: 分位数通道的 (下轨, 中轨, 上轨) 分位数
+        wilder: RSI使用Wilder平滑
+
+    Returns:
+        BacktestResult
+    """
+    timestamps = np.asarray(candles['timestamp'], dtype=np.int64)
+    close = np.asarray(candles['close'], dtype=np.float64)
+
+    series = compute_indicator_arrays(close, boll_period, boll_std, rsi_period, wilder)
+    series['close'] = close
+    if band == 'qband':
+        series['qband_upper'], series['qband_middle'], series['qband_lower'] = \
+            calculate_quantile_band_arrays(close, boll_period, quantiles)
+    elif band != 'boll':
+        raise ValueError(f'不支持的通道类型: {band}')
+
+    return simulate(timestamps, series, fee_rate, band)
+
+
+def simulate(timestamps: np.ndarray, series: Mapping[str, np.ndarray], fee_rate: float = DEFAULT_FEE_RATE,
+             band: str = 'boll') -> BacktestResult:
+    """
+    按已经算好的指标回放信号并结算交易
+
+    Args:
+        timestamps: 毫秒时间戳数组
+        series: 包含 close, rsi 和通道列（{band}_upper/middle/lower）的 列名 -> 数组
+        fee_rate: 单边手续费率
+        band: 通道列的前缀
+
+    Returns:
+        BacktestResult
+    """
+    close = np.asarray(series['close'], dtype=np.float64)
+    signals = SignalDetector(band_prefix=band).detect_signals_batch(series, update_state=False)
+    trades = extract_trades(close, signals['position'], fee_rate)
+    return BacktestResult(timestamps, close, signals, trades, equity_curve(close, trades, fee_rate), fee_rate)
+
+
+def add_data_arguments(parser: argparse.ArgumentParser) -> None:
+    """添加K线来源相关的命令行参数（回测和参数优化共用）"""
+    from backfill import parse_date
+
+    parser.add_argument('--exchange', default='binance', help='交易所ID（读取K线存储时使用）')
+    parser.add_argument('--symbol', default='ETH/USDT', help='交易对')
+    parser.add_argument('--timeframe', default='1m', help='存储中的K线周期')
+    parser.add_argument('--store', default='data/candles', help='K线存储目录')
+    parser.add_argument('--csv', default=None, help='从CSV读取K线（代替K线存储）')
+    parser.add_argument('--import-to-store', action='store_true', help='把CSV中的K线写入K线存储')
+    parser.add_argument('--resample', default=None, help='合成为更大周期后回测，如 15m 1h')
+    parser.add_argument('--start', type=parse_date, default=None, help='开始日期(UTC)')
+    parser.add_argument('--end', type=parse_date, default=None, help='结束日期(UTC)')
+
+
+def load_candles(args: argparse.Namespace) -> Dict[str, np.ndarray]:
+    """按 add_data_arguments 的参数读取K线（截取日期范围、合成周期），没有K线时退出"""
+    store = CandleStore(args.store)
+    if args.csv:
+        candles = load_csv(args.csv)
+        print(f"📂 从 {args.csv} 读取 {len(candles['timestamp'])} 根K线")
+        if args.import_to_store:
+            total = store.write(args.exchange, args.symbol, args.timeframe, to_ohlcv(candles))
+            print(f"💾 已写入K线存储，{args.exchange} {args.symbol} {args.timeframe} 共 {total} 根")
+    else:
+        candles = store.open_arrays(args.exchange, args.symbol, args.timeframe)
+        print(f"📂 K线存储 {args.exchange} {args.symbol} {args.timeframe}: {len(candles['timestamp'])} 根K线")
+
+    candles = slice_range(candles, args.start, args.end)
+    if args.resample:
+        candles = resample_arrays(candles, timeframe_to_ms(args.resample))
+        print(f"🔄 合成为 {args.resample}: {len(candles['timestamp'])} 根K线")
+    if len(candles['timestamp']) == 0:
+        print("❌ 没有可回测的K线")
+        sys.exit(1)
+    return candles
+
+
+def main(argv: List[str] = None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='BOLL策略回测（离线）')
+    add_data_arguments(parser)
+    parser.add_argument('--boll-period', type=int, default=20, help='布林带周期')
+    parser.add_argument('--boll-std', type=float, default=2.0, help='布林带标准差倍数')
+    parser.add_argument('--rsi-period', type=int, default=14, help='RSI周期')
+    parser.add_argument('--band', choices=['boll', 'qband'], default='boll', help='通道类型')
+    parser.add_argument('--fee', type=float, default=DEFAULT_FEE_RATE, help='单边手续费率')
+    parser.add_argument('--trades', type=int, default=10, help='显示最近几笔交易')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    candles = load_candles(args)
+    result = run_backtest(candles, args.boll_period, args.boll_std, args.rsi_period, args.fee, args.band)
+    result.print_report(args.trades)
+    print(f"⚡ 耗时 {time.perf_counter() - started:.2f}秒")
+
+
+if __name__ == '__main__':
+    sys.stdout.reconfigure(encoding='utf-8')
+    main()
@@ -0,0 +1,64 @@
+"""
+指标计算基准测试 - 比较pandas实现和NumPy内核在不同数据量下的耗时
+
+用法:
+    python benchmark_indicators.py                 # 1e3 ~ 1e7 行
+    python benchmark_indicators.py --sizes 1000 100000 --repeat 5
+"""
+import argparse
+import sys
+import time
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+
+from indicator import calculate_all_indicators, compute_indicator_arrays
+
+DEFAULT_SIZES = [10 ** power for power in range(3, 8)]
+
+
+def best_of(fn: Callable, repeat: int) -> float:
+    """多次运行取最短耗时（秒）"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def run(sizes: List[int], repeat: int, seed: int = 0) -> None:
+    rng = np.random.default_rng(seed)
+    print(f"{'行数':>10} | {'pandas':>10} | {'NumPy内核':>10} | {'Wilder':>10} | {'加速比':>7} | 最大误差")
+    print('-' * 78)
+    for size in sizes:
+        close = 3000 + np.cumsum(rng.normal(0, 3, size))
+        df = pd.DataFrame({'close': close})
+        runs = repeat if size < 10 ** 6 else 1
+
+        pandas_time = best_of(lambda: calculate_all_indicators(df), runs)
+        kernel_time = best_of(lambda: compute_indicator_arrays(close), runs)
+        wilder_time = best_of(lambda: compute_indicator_arrays(close, wilder=True), runs)
+
+        expected = calculate_all_indicators(df)
+        result = compute_indicator_arrays(close)
+        error = max(
+            float(np.nanmax(np.abs(result[name] - expected[name].to_numpy())))
+            for name in ('boll_upper', 'boll_middle', 'boll_lower', 'rsi')
+        )
+        print(f"{size:>10,} | {pandas_time * 1000:>8.2f}ms | {kernel_time * 1000:>8.2f}ms | "
+              f"{wilder_time * 1000:>8.2f}ms | {pandas_time / kernel_time:>6.1f}x | {error:.2e}")
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='指标计算基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='数据行数')
+    parser.add_argument('--repeat', type=int, default=5, help='每个规模重复次数（取最短）')
+    args = parser.parse_args(argv)
+    run(args.sizes, args.repeat)
+
+
+if __name__ == '__main__':
+    sys.stdout.reconfigure(encoding='utf-8')
+    main()
@@ -0,0 +1,154 @@
+"""
+K线环形缓冲区 - 定长的按列存储OHLCV，指标和信号计算直接读取NumPy视图，不再每轮构造DataFrame
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+
+
+class CandleBuffer:
+    """
+    定长OHLCV环形缓冲区
+
+    每列一个连续数组（timestamp为int64毫秒，其余为float64），长度为容量的两倍：
+    每个值同时写入 i 和 i + capacity 两个位置，因此最近n根K线始终是一段连续内存，
+    读取列时直接返回只读视图，追加和更新最后一根K线都是O(1)
+    """
+
+    def __init__(self, capacity: int = 1000):
+        """
+        Args:
+            capacity: 最多保留的K线数量，超出后覆盖最早的K线
+        """
+        if capacity <= 0:
+            raise ValueError('capacity必须大于0')
+        self.capacity = capacity
+        self._data = {
+            name: np.zeros(capacity * 2, dtype=np.int64 if name == 'timestamp' else np.float64)
+            for name in COLUMNS
+        }
+        self._end = 0       # 下一根K线写入的位置（0 ~ capacity-1）
+        self._size = 0
+
+    @classmethod
+    def from_ohlcv(cls, ohlcv: List[list], capacity: Optional[int] = None) -> CandleBuffer:
+        """由ccxt格式的K线列表创建缓冲区（默认容量等于K线数量）"""
+        buffer = cls(capacity or max(1, len(ohlcv)))
+        buffer.extend(ohlcv)
+        return buffer
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _write(self, position: int, candle) -> None:
+        for name, value in zip(COLUMNS, candle):
+            column = self._data[name]
+            column[position] = value
+            column[position + self.capacity] = value
+
+    def append(self, candle) -> None:
+        """追加一根新K线 [timestamp, open, high, low, close, volume]"""
+        self._write(self._end, candle)
+        self._end = (self._end + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def update_last(self, candle) -> None:
+        """更新最后一根（未收盘的）K线"""
+        if not self._size:
+            raise IndexError('缓冲区为空')
+        self._write((self._end - 1) % self.capacity, candle)
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """最后一根K线的时间戳，缓冲区为空时返回None"""
+        if not self._size:
+            return None
+        return int(self._data['timestamp'][(self._end - 1) % self.capacity])
+
+    def extend(self, ohlcv: List[list]) -> int:
+        """
+        合并一批升序K线：时间戳与最后一根相同则更新，更晚的追加，更早的忽略
+
+        只从末尾向前扫描到已有的最后一根K线为止，增量拉取返回的重叠K线不会逐根比较
+
+        Returns:
+            新追加的K线数量
+        """
+        last_ts = self.last_timestamp
+        start = len(ohlcv)
+        if last_ts is None:
+            start = 0
+        else:
+            while start > 0 and ohlcv[start - 1][0] >= last_ts:
+                start -= 1
+
+        appended = 0
+        for candle in ohlcv[start:]:
+            if candle[0] == last_ts:
+                self.update_last(candle)
+            else:
+                self.append(candle)
+                appended += 1
+            last_ts = candle[0]
+        return appended
+
+    def column(self, name: str) -> np.ndarray:
+        """按时间升序的某一列（只读视图，不复制数据）"""
+        start = self._end + self.capacity - self._size
+        view = self._data[name][start:start + self._size]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self.column('timestamp')
+
+    @property
+    def open(self) -> np.ndarray:
+        return self.column('open')
+
+    @property
+    def high(self) -> np.ndarray:
+        return self.column('high')
+
+    @property
+    def low(self) -> np.ndarray:
+        return self.column('low')
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.column('close')
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self.column('volume')
+
+    def last(self) -> list:
+        """最后一根K线 [timestamp, open, high, low, close, volume]"""
+        if not self._size:
+            raise IndexError('缓冲区为空')
+        position = (self._end - 1) % self.capacity
+        return [int(self._data['timestamp'][position])] + [
+            float(self._data[name][position]) for name in COLUMNS[1:]
+        ]
+
+    def to_ohlcv(self) -> List[list]:
+        """转换为ccxt格式的K线列表"""
+        columns = [self.column(name).tolist() for name in COLUMNS]
+        return [list(candle) for candle in zip(*columns)]
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """转换为DataFrame（timestamp列为datetime），仅供看板展示使用"""
+        import pandas as pd
+
+        df = pd.DataFrame({name: self.column(name) for name in COLUMNS})
+        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        return df
@@ -0,0 +1,176 @@
+"""
+K线持久化存储模块 - 按列追加写入本地文件，支持内存映射读取
+"""
+import os
+import numpy as np
+from typing import Dict, List, Optional
+
+from rate_limiter import _lock_file, _unlock_file
+
+
+class CandleStore:
+    """
+    本地K线存储
+
+    目录结构: <root>/<交易所>/<交易对>/<周期>/<列名>.bin
+    每列一个按时间升序追加写入的定长二进制文件（timestamp为int64毫秒，其余为float64），
+    读取时使用 numpy.memmap，不需要把整个文件载入内存。
+    写入时持有该序列目录下 .lock 文件的排他锁，多个线程和进程可以同时写入同一序列。
+    """
+
+    COLUMNS = ('timestamp', 'open', 'high', 'low', 'close', 'volume')
+    DTYPES = {
+        'timestamp': np.int64,
+        'open': np.float64,
+        'high': np.float64,
+        'low': np.float64,
+        'close': np.float64,
+        'volume': np.float64
+    }
+    ITEM_SIZE = 8
+
+    def __init__(self, root_dir: str = 'data/candles'):
+        """
+        初始化K线存储
+
+        Args:
+            root_dir: 存储根目录
+        """
+        self.root_dir = root_dir
+
+    def _series_dir(self, exchange_id: str, symbol: str, timeframe: str) -> str:
+        """获取某个序列的存储目录（交易对中的 / 和 : 替换为 -）"""
+        safe_symbol = symbol.replace('/', '-').replace(':', '-')
+        return os.path.join(self.root_dir, exchange_id, safe_symbol, timeframe)
+
+    def _column_path(self, series_dir: str, column: str) -> str:
+        return os.path.join(series_dir, f'{column}.bin')
+
+    def _row_count(self, series_dir: str) -> int:
+        """
+        已写入的完整行数
+
+        各列文件长度取最小值，写入中途被中断时未写完的行会被忽略
+        """
+        counts = []
+        for column in self.COLUMNS:
+            path = self._column_path(series_dir, column)
+            if not os.path.exists(path):
+                return 0
+            counts.append(os.path.getsize(path) // self.ITEM_SIZE)
+        return min(counts)
+
+    def count(self, exchange_id: str, symbol: str, timeframe: str) -> int:
+        """返回已存储的K线数量"""
+        return self._row_count(self._series_dir(exchange_id, symbol, timeframe))
+
+    def open_arrays(self, exchange_id: str, symbol: str, timeframe: str) -> Dict[str, np.ndarray]:
+        """
+        以只读内存映射方式打开全部列
+
+        Returns:
+            列名 -> numpy数组（memmap），没有数据时返回空数组
+        """
+        series_dir = self._series_dir(exchange_id, symbol, timeframe)
+        rows = self._row_count(series_dir)
+        arrays = {}
+        for column in self.COLUMNS:
+            dtype = self.DTYPES[column]
+            if rows == 0:
+                arrays[column] = np.empty(0, dtype=dtype)
+            else:
+                arrays[column] = np.memmap(self._column_path(series_dir, column),
+                                           dtype=dtype, mode='r', shape=(rows,))
+        return arrays
+
+    def last_timestamp(self, exchange_id: str, symbol: str, timeframe: str) -> Optional[int]:
+        """最后一根K线的时间戳（毫秒），没有数据时返回None"""
+        timestamps = self.open_arrays(exchange_id, symbol, timeframe)['timestamp']
+        if len(timestamps) == 0:
+            return None
+        return int(timestamps[-1])
+
+    def load(self, exchange_id: str, symbol: str, timeframe: str,
+             limit: Optional[int] = None) -> List[list]:
+        """
+        读取最近的K线
+
+        Args:
+            limit: 最多返回的K线数量，None表示全部
+
+        Returns:
+            ccxt格式的OHLCV列表 [[timestamp, open, high, low, close, volume], ...]
+        """
+        arrays = self.open_arrays(exchange_id, symbol, timeframe)
+        start = 0 if limit is None else max(0, len(arrays['timestamp']) - limit)
+
+        # 复制尾部数据后立即释放映射，避免写入时文件被占用
+        columns = [np.array(arrays[column][start:]).tolist() for column in self.COLUMNS]
+        del arrays
+        return [list(row) for row in zip(*columns)]
+
+    def write(self, exchange_id: str, symbol: str, timeframe: str, ohlcv: List[list]) -> int:
+        """
+        写入K线
+
+        按时间戳合并：与已存储K线时间戳相同的行被新数据覆盖（用于更新未收盘的K线），
+        其余行按时间顺序插入。常见的追加/覆盖尾部只写文件末尾；写入比尾部更早的数据
+        （回补、导入部分CSV、并发写入）时只重写新数据起点之后的部分，不会丢弃更新的K线。
+        整个读取-合并-写回过程持有该序列的文件锁，并发写入按先后顺序执行。
+
+        Args:
+            ohlcv: ccxt格式的OHLCV列表（无需有序）
+
+        Returns:
+            写入后的K线总数
+        """
+        series_dir = self._series_dir(exchange_id, symbol, timeframe)
+        if not ohlcv:
+            return self._row_count(series_dir)
+
+        os.makedirs(series_dir, exist_ok=True)
+        with open(os.path.join(series_dir, '.lock'), 'a+b') as lock:
+            _lock_file(lock)
+            try:
+                return self._merge(series_dir, ohlcv)
+            finally:
+                _unlock_file(lock)
+
+    def _merge(self, series_dir: str, ohlcv: List[list]) -> int:
+        """在锁内把新K线合并进已存储的数据，返回写入后的K线总数"""
+        rows = self._row_count(series_dir)
+
+        data = np.asarray(ohlcv, dtype=np.float64)
+        new_ts = data[:, 0].astype(np.int64)
+        order = np.argsort(new_ts, kind='stable')
+        data, new_ts = data[order], new_ts[order]
+
+        # 定位新数据起点在已存储K线中的位置，之后的已存储K线参与合并
+        keep = rows
+        if rows > 0:
+            timestamps = np.fromfile(self._column_path(series_dir, 'timestamp'),
+                                     dtype=np.int64, count=rows)
+            keep = int(np.searchsorted(timestamps, new_ts[0], side='left'))
+
+        columns = {column: data[:, index].astype(self.DTYPES[column])
+                   for index, column in enumerate(self.COLUMNS)}
+        if keep < rows:
+            old = {column: np.fromfile(self._column_path(series_dir, column), dtype=self.DTYPES[column],
+                                       count=rows - keep, offset=keep * self.ITEM_SIZE)
+                   for column in self.COLUMNS}
+            columns = {column: np.concatenate((old[column], columns[column])) for column in self.COLUMNS}
+        # 时间戳相同的行保留最后一条（新数据排在已存储数据之后，稳定排序后新数据优先）
+        merged_ts = columns['timestamp']
+        order = np.argsort(merged_ts, kind='stable')
+        sorted_ts = merged_ts[order]
+        unique = order[np.r_[sorted_ts[1:] != sorted_ts[:-1], True]]
+
+        # 合并后的行数不少于被替换的行数：只去掉中断写入留下的不完整行，之后原位覆盖并追加
+        for column in self.COLUMNS:
+            path = self._column_path(series_dir, column)
+            with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                f.truncate(rows * self.ITEM_SIZE)
+                f.seek(keep * self.ITEM_SIZE)
+                f.write(columns[column][unique].tobytes())
+
+        return keep + len(unique)
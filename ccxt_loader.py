@@ -0,0 +1,100 @@
+"""
+ccxt按需加载模块 - 只导入用到的交易所，避免 import ccxt 时加载上百个交易所模块
+"""
+import importlib
+import importlib.util
+import sys
+
+
+def _base_attribute(attribute: str):
+    """
+    ccxt/__init__.py 从 ccxt.base 导出的异常类和 Exchange 基类，不存在时返回None
+
+    ccxt.async_support 的基础模块会 from ccxt import BaseError、Exchange 等，
+    这些名字直接从 ccxt.base 取得（与完整加载后是同一个对象），不必为此加载全部同步交易所
+    """
+    if attribute == 'Exchange':
+        return importlib.import_module('ccxt.base.exchange').Exchange
+    value = getattr(importlib.import_module('ccxt.base.errors'), attribute, None)
+    return value if isinstance(value, type) and issubclass(value, Exception) else None
+
+
+def _install_light_package(name: str = 'ccxt'):
+    """
+    注册一个尚未执行 __init__.py 的包对象（ccxt 或 ccxt.async_support）
+
+    之后 import ccxt.okx 这类子模块只会加载该交易所及其依赖的 ccxt.base。
+    第一次访问包级属性（如 ccxt.binance）时才执行完整的 __init__.py，
+    因此其他 import ccxt 的代码不受影响；ccxt 的异常类和 Exchange 基类不触发完整加载。
+    """
+    spec = importlib.util.find_spec(name)
+    package = importlib.util.module_from_spec(spec)
+
+    def __getattr__(attribute):
+        if name == 'ccxt':
+            value = _base_attribute(attribute)
+            if value is not None:
+                setattr(package, attribute, value)
+                return value
+        del package.__dict__['__getattr__']
+        spec.loader.exec_module(package)
+        try:
+            return package.__dict__[attribute]
+        except KeyError:
+            raise AttributeError(f"module '{name}' has no attribute '{attribute}'") from None
+
+    package.__getattr__ = __getattr__
+    sys.modules[name] = package
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, package)
+    return package
+
+
+def _load_class(package_name: str, exchange_id: str):
+    package = sys.modules.get(package_name)
+    if package is None:
+        package = _install_light_package(package_name)
+    elif '__getattr__' not in package.__dict__:
+        # 完整的包已经加载
+        return getattr(package, exchange_id)
+
+    module = importlib.import_module(f'{package_name}.{exchange_id}')
+    exchange_class = getattr(module, exchange_id)
+    # 与完整加载时一致：<包>.<id> 指向交易所类而不是模块
+    setattr(package, exchange_id, exchange_class)
+    return exchange_class
+
+
+def load_exchange_class(exchange_id: str):
+    """
+    获取ccxt交易所类
+
+    Args:
+        exchange_id: 交易所ID，如 'binance', 'okx'
+
+    Returns:
+        交易所类，如 ccxt.okx
+    """
+    return _load_class('ccxt', exchange_id)
+
+
+def load_async_exchange_class(exchange_id: str):
+    """
+    获取ccxt异步交易所类（只加载该交易所，不执行 ccxt.async_support 的 __init__.py）
+
+    Args:
+        exchange_id: 交易所ID，如 'binance', 'okx'
+
+    Returns:
+        交易所类，如 ccxt.async_support.okx
+    """
+    if 'ccxt' not in sys.modules:
+        _install_light_package('ccxt')
+    return _load_class('ccxt.async_support', exchange_id)
+
+
+def ccxt_version() -> str:
+    """ccxt版本号（不触发完整加载）"""
+    from ccxt.base.exchange import __version__
+    return __version__
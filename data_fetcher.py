@@ -1,21 +1,117 @@
 """
 数据获取模块 - 从交易所获取价格和K线数据
 """
-import ccxt
-import pandas as pd
-from typing import Dict, List, Optional
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
+
+from candle_store import CandleStore
+from ccxt_loader import load_exchange_class
+from markets_cache import MarketsCache
+from rate_limiter import PRIORITY_CRITICAL, RateLimitScheduler
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def ohlcv_to_dataframe(ohlcv: List[list]) -> pd.DataFrame:
+    """
+    将ccxt格式的OHLCV列表转换为DataFrame
+    
+    Args:
+        ohlcv: [[timestamp, open, high, low, close, volume], ...]
+        
+    Returns:
+        包含OHLCV数据的DataFrame，timestamp列为datetime
+    """
+    import pandas as pd
+    
+    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    
+    # 转换时间戳为datetime
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    
+    return df
+
+
+class ExchangeStats:
+    """
+    单个交易所的请求统计
+    
+    记录最近的请求耗时（用于估算p95对冲等待时间）以及耗时和错误率的EWMA（用于交易所排序）
+    """
+    
+    ALPHA = 0.2             # EWMA平滑系数
+    WINDOW = 50             # 估算p95使用的最近样本数
+    MIN_SAMPLES = 5         # 样本不足时使用默认等待时间
+    ERROR_PENALTY = 10.0    # 错误率折算的等待秒数
+    
+    def __init__(self, default_deadline: float = 2.0):
+        self.default_deadline = default_deadline
+        self.latency_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.requests = 0
+        self.errors = 0
+        self._samples = deque(maxlen=self.WINDOW)
+        self._lock = threading.Lock()
+    
+    def record(self, latency: float, ok: bool) -> None:
+        """记录一次请求结果"""
+        with self._lock:
+            self.requests += 1
+            self.errors += 0 if ok else 1
+            self.error_ewma += self.ALPHA * ((0.0 if ok else 1.0) - self.error_ewma)
+            if ok:
+                self._samples.append(latency)
+                if self.latency_ewma is None:
+                    self.latency_ewma = latency
+                else:
+                    self.latency_ewma += self.ALPHA * (latency - self.latency_ewma)
+    
+    def p95(self) -> Optional[float]:
+        """最近成功请求耗时的p95，样本不足返回None"""
+        with self._lock:
+            if len(self._samples) < self.MIN_SAMPLES:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    
+    def deadline(self) -> float:
+        """对冲等待时间：超过该时间仍未返回则向下一个交易所发起请求"""
+        p95 = self.p95()
+        return self.default_deadline if p95 is None else p95
+    
+    def score(self) -> float:
+        """排序分数（越小越好）：平均耗时 + 错误率惩罚"""
+        latency = self.latency_ewma if self.latency_ewma is not None else self.default_deadline
+        return latency + self.error_ewma * self.ERROR_PENALTY
 
 
 class DataFetcher:
     """交易所数据获取器"""
     
-    def __init__(self, proxy_url: str = None, exchange_id: str = 'binance'):
+    def __init__(self, proxy_url: str = None, exchange_id: Union[str, List[str]] = 'binance',
+                 candle_store: CandleStore = None, hedge_deadline: float = 2.0,
+                 ticker_ttl: float = 5.0, markets_cache: MarketsCache = None,
+                 rate_limiter: RateLimitScheduler = None, priority: int = PRIORITY_CRITICAL):
         """
         初始化数据获取器
         
         Args:
             proxy_url: 代理地址，如 'http://127.0.0.1:10808'
-            exchange_id: 交易所ID，如 'binance', 'binanceus', 'okx', 'bybit'等
+            exchange_id: 交易所ID，如 'binance', 'binanceus', 'okx', 'bybit'等；
+                传入列表时按顺序作为主/备交易所，请求超过p95耗时未返回会对冲到下一个交易所
+            candle_store: 本地K线存储，增量模式下优先从中读取，只从网络补齐新数据
+            hedge_deadline: 样本不足时的默认对冲等待秒数
+            ticker_ttl: 实时价格缓存秒数，同一周期内的多次查询共用一次请求，0表示不缓存
+            markets_cache: 市场信息缓存，启动时从本地加载markets，避免每次执行 load_markets
+            rate_limiter: 跨进程共享的限频器，每次请求前按权重申请额度
+            priority: 本实例请求的优先级（PRIORITY_CRITICAL 或 PRIORITY_LOW）
         """
         self.proxies = None
         if proxy_url:
@@ -24,13 +120,110 @@ class DataFetcher:
                 'https': proxy_url
             }
         
-        # 初始化交易所
-        exchange_class = getattr(ccxt, exchange_id)
-        self.exchange = exchange_class({
-            'proxies': self.proxies,
-            'timeout': 30000,
-            'enableRateLimit': True
-        })
+        # 初始化交易所（第一个为主交易所）
+        self.exchange_ids = [exchange_id] if isinstance(exchange_id, str) else list(exchange_id)
+        self.exchange_id = self.exchange_ids[0]
+        self.exchanges = {}
+        for ex_id in self.exchange_ids:
+            exchange_class = load_exchange_class(ex_id)
+            self.exchanges[ex_id] = exchange_class({
+                'proxies': self.proxies,
+                'timeout': 30000,
+                'enableRateLimit': True
+            })
+        self.stats = {ex_id: ExchangeStats(hedge_deadline) for ex_id in self.exchange_ids}
+        self._pool = None
+        self.rate_limiter = rate_limiter
+        self.priority = priority
+        
+        # 从本地缓存加载市场信息（不访问网络）
+        self.markets_cache = markets_cache
+        if markets_cache is not None:
+            for ex_id, exchange in self.exchanges.items():
+                markets_cache.load(ex_id, exchange)
+        
+        # 实时价格缓存: 交易对 -> (获取时间, 价格)
+        self.ticker_ttl = ticker_ttl
+        self._ticker_cache: Dict[str, Tuple[float, float]] = {}
+        self._ticker_lock = threading.Lock()
+        
+        # K线缓存: (交易所, 交易对, 周期) -> 原始OHLCV列表（按时间升序）
+        self._kline_cache: Dict[Tuple[str, str, str], List[list]] = {}
+        self.candle_store = candle_store
+    
+    @property
+    def exchange(self):
+        """主交易所实例"""
+        return self.exchanges[self.exchange_id]
+    
+    @exchange.setter
+    def exchange(self, value):
+        self.exchanges[self.exchange_id] = value
+    
+    def ranked_exchanges(self) -> List[str]:
+        """按统计分数排序的交易所列表（分数相同时保持配置顺序）"""
+        return sorted(self.exchange_ids, key=lambda ex_id: self.stats[ex_id].score())
+    
+    def _request(self, exchange_id: str, exchange, method: str, *args, **kwargs):
+        """先向限频器申请额度，再调用交易所方法"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(exchange_id, method, self.priority)
+        return getattr(exchange, method)(*args, **kwargs)
+    
+    def _timed_call(self, ex_id: str, fn: Callable):
+        """调用fn并记录耗时和成败"""
+        started = time.perf_counter()
+        try:
+            result = fn(ex_id, self.exchanges[ex_id])
+        except Exception:
+            self.stats[ex_id].record(time.perf_counter() - started, ok=False)
+            raise
+        self.stats[ex_id].record(time.perf_counter() - started, ok=True)
+        return result
+    
+    def _call_hedged(self, fn: Callable):
+        """
+        对冲请求
+        
+        先向排名第一的交易所发起请求；若超过其p95耗时仍未返回（或已失败），
+        再向下一个交易所发起请求，取最先成功的结果。落后的请求在后台继续完成，
+        其耗时仍会计入统计。
+        
+        Args:
+            fn: fn(exchange_id, exchange) -> 结果
+            
+        Returns:
+            最先成功的结果；所有交易所都失败时抛出最后一个异常
+        """
+        if len(self.exchange_ids) == 1:
+            return self._timed_call(self.exchange_id, fn)
+        
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=len(self.exchange_ids) * 2,
+                                            thread_name_prefix='hedge')
+        
+        candidates = self.ranked_exchanges()
+        pending = {}
+        last_error = None
+        
+        while candidates or pending:
+            if candidates:
+                ex_id = candidates.pop(0)
+                pending[self._pool.submit(self._timed_call, ex_id, fn)] = ex_id
+                timeout = self.stats[ex_id].deadline() if candidates else None
+            else:
+                timeout = None
+            
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                ex_id = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    print(f"⚠️ {ex_id} 请求失败: {e}")
+                    last_error = e
+        
+        raise last_error
     
     def fetch_realtime_price(self, symbol: str) -> Optional[float]:
         """
@@ -42,14 +235,90 @@ class DataFetcher:
         Returns:
             当前价格，失败返回None
         """
+        cached = self._cached_prices([symbol])
+        if symbol in cached:
+            return cached[symbol]
+        
         try:
-            ticker = self.exchange.fetch_ticker(symbol)
+            ticker = self._call_hedged(lambda ex_id, exchange: self._request(ex_id, exchange, 'fetch_ticker', symbol))
+            self._cache_prices({symbol: ticker['last']})
             return ticker['last']
         except Exception as e:
             print(f"❌ 获取实时价格失败: {e}")
             return None
     
-    def fetch_kline_data(self, symbol: str, timeframe: str = '15m', limit: int = 100) -> Optional[pd.DataFrame]:
+    def fetch_realtime_prices(self, symbols: List[str], max_workers: int = 8) -> Dict[str, Optional[float]]:
+        """
+        批量获取实时价格
+        
+        交易所支持时用一次 fetch_tickers 获取全部交易对，否则以有限并发逐个调用 fetch_ticker。
+        结果缓存 ticker_ttl 秒，缓存内的交易对不再请求。
+        
+        Args:
+            symbols: 交易对列表
+            max_workers: 逐个请求时的最大并发数
+            
+        Returns:
+            交易对 -> 当前价格，失败的交易对为None
+        """
+        prices = self._cached_prices(symbols)
+        missing = [symbol for symbol in symbols if symbol not in prices]
+        
+        if missing:
+            try:
+                tickers = self._call_hedged(
+                    lambda ex_id, exchange: self._fetch_tickers(ex_id, exchange, missing, max_workers)
+                )
+                fetched = {symbol: tickers[symbol]['last'] for symbol in missing if symbol in tickers}
+                self._cache_prices(fetched)
+                prices.update(fetched)
+            except Exception as e:
+                print(f"❌ 批量获取实时价格失败: {e}")
+        
+        return {symbol: prices.get(symbol) for symbol in symbols}
+    
+    def _fetch_tickers(self, exchange_id: str, exchange, symbols: List[str],
+                       max_workers: int) -> Dict[str, dict]:
+        """一次批量请求，或有限并发的逐个请求（单个失败的交易对会被跳过）"""
+        if exchange.has.get('fetchTickers'):
+            return self._request(exchange_id, exchange, 'fetch_tickers', symbols)
+        
+        def fetch_one(symbol):
+            try:
+                return symbol, self._request(exchange_id, exchange, 'fetch_ticker', symbol)
+            except Exception as e:
+                print(f"⚠️ 获取 {symbol} 价格失败: {e}")
+                return symbol, None
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(fetch_one, symbols)
+        tickers = {symbol: ticker for symbol, ticker in results if ticker is not None}
+        if not tickers:
+            raise RuntimeError('所有交易对价格获取失败')
+        return tickers
+    
+    def _cached_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """返回未过期的缓存价格"""
+        if self.ticker_ttl <= 0:
+            return {}
+        now = time.monotonic()
+        with self._ticker_lock:
+            return {
+                symbol: self._ticker_cache[symbol][1]
+                for symbol in symbols
+                if symbol in self._ticker_cache and now - self._ticker_cache[symbol][0] < self.ticker_ttl
+            }
+    
+    def _cache_prices(self, prices: Dict[str, float]) -> None:
+        if self.ticker_ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._ticker_lock:
+            for symbol, price in prices.items():
+                self._ticker_cache[symbol] = (now, price)
+    
+    def fetch_kline_data(self, symbol: str, timeframe: str = '15m', limit: int = 100,
+                         incremental: bool = False) -> Optional[pd.DataFrame]:
         """
         获取K线数据
         
@@ -57,22 +326,130 @@ class DataFetcher:
             symbol: 交易对，如 'ETH/USDT'
             timeframe: 时间周期，如 '1m', '5m', '15m', '1h', '4h', '1d'
             limit: 获取的K线数量
+            incremental: 增量模式，只拉取缓存中最后一根K线之后的数据
             
         Returns:
             包含OHLCV数据的DataFrame，失败返回None
         """
-        try:
-            ohlcv = self.exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
-            df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-            
-            # 转换时间戳为datetime
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+        ohlcv = self.fetch_ohlcv(symbol, timeframe, limit=limit, incremental=incremental)
+        if ohlcv is None:
+            return None
+        return ohlcv_to_dataframe(ohlcv)
+    
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '15m', limit: int = 100,
+                    incremental: bool = False) -> Optional[List[list]]:
+        """
+        获取原始K线数据（ccxt格式）
+        
+        Args:
+            symbol: 交易对，如 'ETH/USDT'
+            timeframe: 时间周期
+            limit: 获取的K线数量
+            incremental: 增量模式，只拉取缓存中最后一根K线之后的数据
             
-            return df
+        Returns:
+            [[timestamp, open, high, low, close, volume], ...]，失败返回None
+        """
+        try:
+            if incremental:
+                return self._call_hedged(
+                    lambda ex_id, exchange: self._fetch_ohlcv_incremental(ex_id, exchange, symbol, timeframe, limit)
+                )
+            return self._call_hedged(lambda ex_id, exchange: self._request(
+                ex_id, exchange, 'fetch_ohlcv', symbol, timeframe, limit=limit
+            ))
         except Exception as e:
             print(f"❌ 获取K线数据失败: {e}")
             return None
     
+    def _fetch_ohlcv_incremental(self, exchange_id: str, exchange, symbol: str, timeframe: str,
+                                 limit: int) -> List[list]:
+        """
+        增量获取K线：从缓存的最后一根K线开始请求（ccxt since），
+        原地更新未收盘的K线并去除重叠部分
+        
+        每个交易所单独缓存。内存缓存为空时先从本地K线存储读取；缓存不足limit条
+        或距上次拉取的间隔超过limit根K线时，退回全量拉取。新获取的K线会写回本地存储。
+        返回缓存的副本，调用方修改结果不会影响之后的增量合并。
+        """
+        key = (exchange_id, symbol, timeframe)
+        cached = self._kline_cache.get(key)
+        if not cached and self.candle_store is not None:
+            cached = self.candle_store.load(exchange_id, symbol, timeframe, limit=limit)
+        
+        if cached and len(cached) >= limit:
+            since = cached[-1][0]
+            timeframe_ms = exchange.parse_timeframe(timeframe) * 1000
+            missing = (exchange.milliseconds() - since) // timeframe_ms
+            if missing < limit:
+                fresh = self._request(exchange_id, exchange, 'fetch_ohlcv', symbol, timeframe,
+                                      since=since, limit=limit)
+                merged = self._merge_ohlcv(cached, fresh)
+                self._kline_cache[key] = merged[-limit:]
+                self._persist(exchange_id, symbol, timeframe, fresh)
+                return [list(candle) for candle in self._kline_cache[key]]
+        
+        ohlcv = self._merge_ohlcv([], self._request(exchange_id, exchange, 'fetch_ohlcv',
+                                                    symbol, timeframe, limit=limit))
+        self._kline_cache[key] = ohlcv[-limit:]
+        self._persist(exchange_id, symbol, timeframe, ohlcv)
+        return [list(candle) for candle in self._kline_cache[key]]
+    
+    def _persist(self, exchange_id: str, symbol: str, timeframe: str, ohlcv: List[list]) -> None:
+        """把新获取的K线写入本地存储（写入失败不影响本次结果）"""
+        if self.candle_store is None or not ohlcv:
+            return
+        try:
+            self.candle_store.write(exchange_id, symbol, timeframe, self._merge_ohlcv([], ohlcv))
+        except Exception as e:
+            print(f"⚠️ 写入本地K线存储失败: {e}")
+    
+    @staticmethod
+    def _merge_ohlcv(cached: List[list], fresh: List[list]) -> List[list]:
+        """
+        合并K线：新数据覆盖时间戳相同或更晚的缓存K线，结果按时间升序且无重复
+        
+        Args:
+            cached: 已缓存的K线（升序）
+            fresh: 新获取的K线
+            
+        Returns:
+            合并后的K线列表
+        """
+        if not fresh:
+            return cached
+        
+        # 新数据内部去重（同一时间戳保留最后一条）
+        deduped = {}
+        for candle in fresh:
+            deduped[candle[0]] = candle
+        fresh = [deduped[ts] for ts in sorted(deduped)]
+        
+        timestamps = [candle[0] for candle in cached]
+        cut = bisect.bisect_left(timestamps, fresh[0][0])
+        return cached[:cut] + fresh
+    
+    def _ping(self, exchange_id: str, exchange) -> None:
+        """
+        轻量连通性检查
+        
+        市场信息尚未加载时执行 load_markets 并写入缓存（这本身就验证了连通性）；
+        已从缓存加载时只请求服务器时间
+        """
+        if not exchange.markets:
+            self._request(exchange_id, exchange, 'load_markets')
+            if self.markets_cache is not None:
+                try:
+                    self.markets_cache.save(exchange_id, exchange)
+                except Exception as e:
+                    print(f"⚠️ 保存市场信息缓存失败: {e}")
+            return
+        
+        if exchange.has.get('fetchTime'):
+            self._request(exchange_id, exchange, 'fetch_time')
+        else:
+            self._request(exchange_id, exchange, 'fetch_ticker', next(iter(exchange.markets)))
+    
     def test_connection(self) -> bool:
         """
         测试交易所连接
@@ -81,7 +458,7 @@ class DataFetcher:
             连接成功返回True，否则返回False
         """
         try:
-            self.exchange.load_markets()
+            self._call_hedged(self._ping)
             print("✅ 交易所连接成功")
             return True
         except Exception as e:
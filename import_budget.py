@@ -0,0 +1,97 @@
+"""
+启动耗时检查 - 用 python -X importtime 统计入口脚本的导入耗时，并与预算比较
+
+用法:
+    python import_budget.py                      # 检查 run_once 和 main
+    python import_budget.py --module run_once --budget-ms 200
+
+超出预算或在导入阶段加载了重量级依赖时返回非0退出码，可以放在CI中发现启动耗时回退
+"""
+import argparse
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+# 入口模块 -> 导入耗时预算（毫秒）
+DEFAULT_BUDGETS = {
+    'run_once': 250,
+    'main': 250
+}
+
+# 导入入口模块时不允许加载的重量级依赖（应在真正使用时才加载）
+DEFERRED_PACKAGES = ('ccxt', 'pandas', 'requests', 'websockets', 'streamlit', 'plotly', 'numba')
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(module: str) -> List[Tuple[int, int, int, str]]:
+    """
+    在新的解释器中导入模块，返回 importtime 记录
+
+    Returns:
+        [(自身耗时us, 累计耗时us, 嵌套深度, 模块名), ...]，顺序与 -X importtime 输出一致
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True
+    )
+    records = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append((int(self_us), int(cumulative_us), len(indent) // 2, name))
+    return records
+
+
+def analyze(module: str, records: List[Tuple[int, int, int, str]]) -> Dict:
+    """
+    提取目标模块的累计耗时、直接依赖耗时和导入的全部模块
+
+    importtime 按后序输出：子模块在父模块之前，深度越深缩进越多
+    """
+    end = max(i for i, record in enumerate(records) if record[3] == module and record[2] == 0)
+    start = end
+    while start > 0 and records[start - 1][2] > 0:
+        start -= 1
+
+    subtree = records[start:end]
+    direct = sorted(((record[1], record[3]) for record in subtree if record[2] == 1), reverse=True)
+    return {
+        'total_ms': records[end][1] / 1000,
+        'direct': [(name, cumulative / 1000) for cumulative, name in direct],
+        'modules': {record[3] for record in subtree}
+    }
+
+
+def check(module: str, budget_ms: float, top: int = 8) -> bool:
+    """检查单个入口模块，打印报告，返回是否通过"""
+    report = analyze(module, measure(module))
+    deferred = sorted({name.split('.')[0] for name in report['modules']} & set(DEFERRED_PACKAGES))
+    passed = report['total_ms'] <= budget_ms and not deferred
+
+    print(f"{'✅' if passed else '❌'} {module}: 导入耗时 {report['total_ms']:.1f}ms (预算 {budget_ms:.0f}ms)")
+    for name, cumulative_ms in report['direct'][:top]:
+        print(f"    {cumulative_ms:8.1f}ms  {name}")
+    if deferred:
+        print(f"    ⚠️ 导入阶段加载了应延迟加载的依赖: {', '.join(deferred)}")
+    return passed
+
+
+def main(argv: List[str] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='入口脚本导入耗时检查')
+    parser.add_argument('--module', action='append', help='要检查的模块，可重复指定')
+    parser.add_argument('--budget-ms', type=float, default=None, help='导入耗时预算（毫秒）')
+    args = parser.parse_args(argv)
+
+    modules = args.module or list(DEFAULT_BUDGETS)
+    results = [check(module, args.budget_ms or DEFAULT_BUDGETS.get(module, 250)) for module in modules]
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+增量指标模块 - 每根K线（或每次未收盘K线的更新）以O(1)代价更新BOLL和RSI
+
+与 indicator.py 中的批量计算结果一致：BOLL为简单移动平均和样本标准差，
+RSI为涨跌幅的简单移动平均（第一根K线的涨跌计为0）；可选的分位数通道每次更新O(w)（有序列表的一次内存搬移）
+"""
+import math
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from indicator import QUANTILE_BANDS, SortedWindow, indicators_from_row, ms_to_datetime
+
+
+class IncrementalBollinger:
+    """
+    增量布林带
+
+    维护窗口内 (x - shift) 的累加和与平方和，shift 取最近一次重新同步时的均值，
+    避免价格较大时平方和相减造成的精度损失；每 resync_every 次更新按窗口精确重算一次，
+    限制浮点误差的累积。同时维护窗口内相邻收盘价变化的次数，横盘窗口的标准差为精确的0
+    （与 indicator._bollinger_block 相同）
+    """
+
+    def __init__(self, period: int = 20, std_dev: float = 2.0, resync_every: int = 1000):
+        """
+        Args:
+            period: 移动平均周期
+            std_dev: 标准差倍数
+            resync_every: 每隔多少次更新精确重算一次累加和
+        """
+        self.period = period
+        self.std_dev = std_dev
+        self.resync_every = resync_every
+        self.window = deque(maxlen=period)
+        self._shift = 0.0
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        # 窗口内相邻两根收盘价不相等的次数
+        self._changes = 0
+        self._updates = 0
+
+    def _add(self, value: float, sign: float) -> None:
+        offset = value - self._shift
+        self._sum += sign * offset
+        self._sum_sq += sign * offset * offset
+
+    def _resync(self) -> None:
+        """按窗口精确重算累加和"""
+        self._shift = math.fsum(self.window) / len(self.window) if self.window else 0.0
+        offsets = [value - self._shift for value in self.window]
+        self._sum = math.fsum(offsets)
+        self._sum_sq = math.fsum(offset * offset for offset in offsets)
+        self._changes = sum(a != b for a, b in zip(list(self.window), list(self.window)[1:]))
+        self._updates = 0
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        """加入一根新K线的收盘价，返回 (上轨, 中轨, 下轨)"""
+        if len(self.window) == self.period:
+            self._add(self.window[0], -1.0)
+            if self.period > 1:
+                self._changes -= self.window[0] != self.window[1]
+        if self.window:
+            self._changes += self.window[-1] != close
+        self.window.append(close)
+        self._add(close, 1.0)
+        self._updates += 1
+        if self._updates >= self.resync_every or len(self.window) == 1:
+            self._resync()
+        return self.value()
+
+    def replace_last(self, close: float) -> Tuple[float, float, float]:
+        """替换最后一根（未收盘）K线的收盘价"""
+        if not self.window:
+            return self.update(close)
+        self._add(self.window[-1], -1.0)
+        if len(self.window) > 1:
+            self._changes += (self.window[-2] != close) - (self.window[-2] != self.window[-1])
+        self.window[-1] = close
+        self._add(close, 1.0)
+        self._updates += 1
+        if self._updates >= self.resync_every:
+            self._resync()
+        return self.value()
+
+    def value(self) -> Tuple[float, float, float]:
+        """当前的 (上轨, 中轨, 下轨)，数据不足一个周期时为NaN"""
+        n = len(self.window)
+        if n < self.period or n < 2:
+            return math.nan, math.nan, math.nan
+        if self._changes == 0:
+            # 横盘窗口：累加和相减可能残留极小值，按变化次数置为精确的0
+            close = self.window[-1]
+            return close, close, close
+        mean_offset = self._sum / n
+        variance = max(0.0, (self._sum_sq - self._sum * mean_offset) / (n - 1))
+        middle = self._shift + mean_offset
+        band = self.std_dev * math.sqrt(variance)
+        return middle + band, middle, middle - band
+
+
+class IncrementalRSI:
+    """
+    增量RSI
+
+    维护最近period个涨幅和跌幅及其累加和；窗口内没有下跌（或上涨）时累加和直接置0，
+    避免相减残留的极小值让RSI偏离100（或0）
+    """
+
+    def __init__(self, period: int = 14, resync_every: int = 1000):
+        """
+        Args:
+            period: RSI周期
+            resync_every: 每隔多少次更新精确重算一次累加和
+        """
+        self.period = period
+        self.resync_every = resync_every
+        self.gains = deque(maxlen=period)
+        self.losses = deque(maxlen=period)
+        self._gain_sum = 0.0
+        self._loss_sum = 0.0
+        # 窗口内非0涨幅/跌幅的个数
+        self._gain_count = 0
+        self._loss_count = 0
+        self._prev_close: Optional[float] = None
+        self._last_close: Optional[float] = None
+        self._updates = 0
+
+    def _account(self, gain: float, loss: float, sign: int) -> None:
+        self._gain_sum += sign * gain
+        self._loss_sum += sign * loss
+        self._gain_count += sign * (gain > 0)
+        self._loss_count += sign * (loss > 0)
+
+    def _push(self, delta: float) -> None:
+        if len(self.gains) == self.period:
+            self._account(self.gains[0], self.losses[0], -1)
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        self.gains.append(gain)
+        self.losses.append(loss)
+        self._account(gain, loss, 1)
+
+    def _settle(self) -> None:
+        """定期精确重算；窗口全为0时消除残差"""
+        self._updates += 1
+        if self._updates >= self.resync_every:
+            self._gain_sum = math.fsum(self.gains)
+            self._loss_sum = math.fsum(self.losses)
+            self._updates = 0
+        if not self._gain_count:
+            self._gain_sum = 0.0
+        if not self._loss_count:
+            self._loss_sum = 0.0
+
+    def update(self, close: float) -> float:
+        """加入一根新K线的收盘价，返回RSI"""
+        delta = 0.0 if self._last_close is None else close - self._last_close
+        self._prev_close, self._last_close = self._last_close, close
+        self._push(delta)
+        self._settle()
+        return self.value()
+
+    def replace_last(self, close: float) -> float:
+        """替换最后一根（未收盘）K线的收盘价"""
+        if self._last_close is None:
+            return self.update(close)
+        delta = 0.0 if self._prev_close is None else close - self._prev_close
+        self._account(self.gains[-1], self.losses[-1], -1)
+        self.gains[-1], self.losses[-1] = max(delta, 0.0), max(-delta, 0.0)
+        self._account(self.gains[-1], self.losses[-1], 1)
+        self._last_close = close
+        self._settle()
+        return self.value()
+
+    def value(self) -> float:
+        """当前RSI，数据不足一个周期时为NaN"""
+        if len(self.gains) < self.period:
+            return math.nan
+        if self._loss_sum == 0:
+            return math.nan if self._gain_sum == 0 else 100.0
+        rs = self._gain_sum / self._loss_sum
+        return 100 - 100 / (1 + rs)
+
+
+class IncrementalQuantileBands:
+    """
+    增量分位数通道
+
+    有序滑动窗口（见 indicator.SortedWindow）每次更新 O(log w) 次比较加一次O(w)的列表搬移，与
+    calculate_quantile_band_arrays 的结果完全一致（没有累加误差，无需重新同步，含NaN的窗口为NaN）
+    """
+
+    def __init__(self, period: int = 20, quantiles: Tuple[float, float, float] = QUANTILE_BANDS):
+        """
+        Args:
+            period: 窗口长度
+            quantiles: (下轨, 中轨, 上轨) 的分位数
+        """
+        self.period = period
+        self.quantiles = quantiles
+        self.window = SortedWindow(period)
+
+    def update(self, close: float) -> Tuple[float, float, float]:
+        """加入一根新K线的收盘价，返回 (上轨, 中轨, 下轨)"""
+        self.window.push(close)
+        return self.value()
+
+    def replace_last(self, close: float) -> Tuple[float, float, float]:
+        """替换最后一根（未收盘）K线的收盘价"""
+        self.window.replace_last(close)
+        return self.value()
+
+    def value(self) -> Tuple[float, float, float]:
+        """当前的 (上轨, 中轨, 下轨)，数据不足一个周期时为NaN"""
+        if len(self.window) < self.period:
+            return math.nan, math.nan, math.nan
+        lower, middle, upper = (self.window.quantile(q) for q in self.quantiles)
+        return upper, middle, lower
+
+
+class IncrementalIndicators:
+    """
+    单个交易对/周期的增量指标
+
+    按K线时间戳判断是新K线还是未收盘K线的更新，输出与 get_latest_indicators 相同格式的字典
+    """
+
+    def __init__(self, boll_period: int = 20, boll_std: float = 2.0, rsi_period: int = 14,
+                 resync_every: int = 1000, quantiles: Optional[Tuple[float, float, float]] = None):
+        """
+        Args:
+            quantiles: 同时维护 (下轨, 中轨, 上轨) 分位数的分位数通道（窗口长度与BOLL周期相同），
+                输出中增加 qband_upper/qband_middle/qband_lower
+        """
+        self.boll = IncrementalBollinger(boll_period, boll_std, resync_every)
+        self.rsi = IncrementalRSI(rsi_period, resync_every)
+        self.qbands = IncrementalQuantileBands(boll_period, quantiles) if quantiles else None
+        self.last_timestamp: Optional[int] = None
+        self._close: Optional[float] = None
+
+    def update(self, candle: list) -> Dict:
+        """
+        处理一根K线 [timestamp, open, high, low, close, volume]
+
+        时间戳与上一根相同则视为未收盘K线的更新，更早的K线会被忽略
+        """
+        timestamp, close = candle[0], float(candle[4])
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            return self.latest()
+        trackers = [self.boll, self.rsi] + ([self.qbands] if self.qbands else [])
+        if timestamp == self.last_timestamp:
+            for tracker in trackers:
+                tracker.replace_last(close)
+        else:
+            for tracker in trackers:
+                tracker.update(close)
+        self.last_timestamp = timestamp
+        self._close = close
+        return self.latest()
+
+    def extend(self, ohlcv: List[list]) -> Dict:
+        """
+        处理一批升序K线（如推送回调中的整个窗口），只从末尾向前找到尚未处理的部分
+        """
+        start = len(ohlcv)
+        if self.last_timestamp is None:
+            start = 0
+        else:
+            while start > 0 and ohlcv[start - 1][0] >= self.last_timestamp:
+                start -= 1
+        for candle in ohlcv[start:]:
+            self.update(candle)
+        return self.latest()
+
+    def latest(self) -> Dict:
+        """最新指标值，尚无数据时返回空字典"""
+        if self.last_timestamp is None:
+            return {}
+        upper, middle, lower = self.boll.value()
+        latest = indicators_from_row({
+            'timestamp': ms_to_datetime(self.last_timestamp),
+            'close': self._close,
+            'boll_upper': upper,
+            'boll_middle': middle,
+            'boll_lower': lower,
+            'rsi': self.rsi.value()
+        })
+        if self.qbands:
+            latest['qband_upper'], latest['qband_middle'], latest['qband_lower'] = self.qbands.value()
+        return latest
@@ -1,9 +1,20 @@
 """
 技术指标计算模块 - 计算BOLL和RSI指标
 """
-import pandas as pd
+from __future__ import annotations
+
+import math
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Dict, Optional, Tuple, Union
+
 import numpy as np
-from typing import Dict, Tuple
+
+from candle_buffer import CandleBuffer
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def calculate_bollinger_bands(df: pd.DataFrame, period: int = 20, std_dev: float = 2.0) -> pd.DataFrame:
@@ -18,34 +29,38 @@ def calculate_bollinger_bands(df: pd.DataFrame, period: int = 20, std_dev: float
     Returns:
         添加了boll_upper, boll_middle, boll_lower列的DataFrame
     """
+    # 使用指标注册表的滚动运算：结果与 compute_indicator_arrays 逐位相同（包括横盘窗口），
+    # 缺失的收盘价只影响所在窗口（与pandas rolling相同）
+    from indicator_registry import evaluate
+
     df = df.copy()
-    
-    # 计算中轨（移动平均线）
-    df['boll_middle'] = df['close'].rolling(window=period).mean()
-    
-    # 计算标准差
-    rolling_std = df['close'].rolling(window=period).std()
-    
-    # 计算上轨和下轨
-    df['boll_upper'] = df['boll_middle'] + (std_dev * rolling_std)
-    df['boll_lower'] = df['boll_middle'] - (std_dev * rolling_std)
+    bands = evaluate({'close': df['close'].to_numpy(dtype=np.float64)},
+                     [('boll', {'period': period, 'std_dev': std_dev})])
+    df['boll_middle'] = bands['boll_middle']
+    df['boll_upper'] = bands['boll_upper']
+    df['boll_lower'] = bands['boll_lower']
     
     return df
 
 
-def calculate_rsi(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
+def calculate_rsi(df: pd.DataFrame, period: int = 14, wilder: bool = False) -> pd.DataFrame:
     """
     计算RSI指标（相对强弱指数）
     
     Args:
         df: 包含close列的DataFrame
         period: RSI周期，默认14
+        wilder: 使用Wilder平滑（默认为涨跌幅的简单移动平均）
         
     Returns:
         添加了rsi列的DataFrame
     """
     df = df.copy()
     
+    if wilder:
+        df['rsi'] = calculate_rsi_array(df['close'].to_numpy(dtype=np.float64), period, wilder=True)
+        return df
+    
     # 计算价格变化
     delta = df['close'].diff()
     
@@ -64,41 +79,409 @@ def calculate_rsi(df: pd.DataFrame, period: int = 14) -> pd.DataFrame:
     return df
 
 
-def calculate_all_indicators(df: pd.DataFrame, boll_period: int = 20, boll_std: float = 2.0, 
-                            rsi_period: int = 14) -> pd.DataFrame:
+# ==================== NumPy指标内核 ====================
+# 按输出位置分块处理，每块只做一次前缀和（块内平移后求和，限制大数相减的精度损失），
+# 块大小使工作集留在CPU缓存中；BOLL和RSI在同一次分块遍历中完成
+
+KERNEL_BLOCK = 1 << 12
+
+
+def _window_sums(values: np.ndarray, period: int) -> np.ndarray:
+    """values中所有长度为period的窗口之和（第i项对应以values[i + period - 1]结尾的窗口）"""
+    prefix = np.empty(len(values) + 1)
+    prefix[0] = 0.0
+    np.cumsum(values, out=prefix[1:])
+    return prefix[period:] - prefix[:-period]
+
+
+def _bollinger_block(close: np.ndarray, period: int, std_dev: float, lo: int, hi: int,
+                     out: Dict[str, np.ndarray]) -> None:
+    """计算以 lo ~ hi-1 结尾的窗口的布林带和价格位置，写入out"""
+    first = max(lo, period - 1)
+    if first >= hi:
+        return
+    segment = close[first - period + 1:hi]
+    shift = segment[0]
+    offsets = segment - shift
+    sums = _window_sums(offsets, period)
+    sums_sq = _window_sums(offsets * offsets, period)
+    
+    mean_offset = sums / period
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.maximum((sums_sq - sums * mean_offset) / (period - 1), 0.0)
+    middle = mean_offset + shift
+    if period > 1:
+        # 横盘窗口前缀和相减可能残留极小值，按窗口内价格变化次数置为精确的0（与 compute_latest 一致）
+        flat = _window_sums(segment[1:] != segment[:-1], period - 1) == 0
+        variance[flat] = 0.0
+        mean_offset[flat] = offsets[period - 1:][flat]
+        middle[flat] = segment[period - 1:][flat]
+    band = std_dev * np.sqrt(variance)
+    
+    out['boll_middle'][first:hi] = middle
+    out['boll_upper'][first:hi] = middle + band
+    out['boll_lower'][first:hi] = middle - band
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # (close - lower) / (upper - lower) * 100，横盘（带宽为0）时与pandas相同为NaN
+        position = (offsets[period - 1:] - mean_offset + band) / (2 * band) * 100
+    position[band == 0] = np.nan
+    out['boll_position'][first:hi] = position
+
+
+def _gain_loss(close: np.ndarray, lo: int, hi: int) -> Tuple[np.ndarray, np.ndarray]:
+    """lo ~ hi-1 位置的涨幅和跌幅（第一根K线的涨跌计为0）"""
+    if lo == 0:
+        delta = np.empty(hi)
+        delta[0] = 0.0
+        np.subtract(close[1:hi], close[:hi - 1], out=delta[1:])
+    else:
+        delta = close[lo:hi] - close[lo - 1:hi - 1]
+    return np.maximum(delta, 0.0), np.maximum(-delta, 0.0)
+
+
+def _rsi_from_sums(gain_sum: np.ndarray, loss_sum: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100 - 100 / (1 + gain_sum / loss_sum)
+
+
+def _rsi_block(close: np.ndarray, period: int, lo: int, hi: int, out: Dict[str, np.ndarray]) -> None:
+    """计算以 lo ~ hi-1 结尾的窗口的RSI（简单移动平均），写入out"""
+    first = max(lo, period - 1)
+    if first >= hi:
+        return
+    gain, loss = _gain_loss(close, first - period + 1, hi)
+    gain_sum = _window_sums(gain, period)
+    loss_sum = _window_sums(loss, period)
+    # 窗口内没有上涨/下跌时前缀和相减可能残留极小值，按计数置为精确的0
+    gain_sum[_window_sums(gain > 0, period) == 0] = 0.0
+    loss_sum[_window_sums(loss > 0, period) == 0] = 0.0
+    out['rsi'][first:hi] = _rsi_from_sums(gain_sum, loss_sum)
+
+
+def _wilder_rsi(close: np.ndarray, period: int) -> np.ndarray:
+    """
+    Wilder平滑RSI: avg[i] = avg[i-1] + (x[i] - avg[i-1]) / period
+    
+    第一个值与简单移动平均版本相同（前period个涨跌幅的均值），之后递推；
+    递推由 jit_kernels 完成（安装numba时JIT编译）
+    """
+    from jit_kernels import wilder_smooth
+    
+    gain, loss = _gain_loss(close, 0, len(close)) if len(close) else (close, close)
+    return _rsi_from_sums(wilder_smooth(gain, period), wilder_smooth(loss, period))
+
+
+def _empty_outputs(n: int, names) -> Dict[str, np.ndarray]:
+    return {name: np.full(n, np.nan) for name in names}
+
+
+def calculate_bollinger_arrays(close: np.ndarray, period: int = 20,
+                               std_dev: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    基于收盘价数组计算布林带
+    
+    Returns:
+        (上轨, 中轨, 下轨)，与 calculate_bollinger_bands 的结果一致
+    """
+    close = np.asarray(close, dtype=np.float64)
+    out = _empty_outputs(len(close), ('boll_upper', 'boll_middle', 'boll_lower', 'boll_position'))
+    for lo in range(0, len(close), KERNEL_BLOCK):
+        _bollinger_block(close, period, std_dev, lo, min(len(close), lo + KERNEL_BLOCK), out)
+    return out['boll_upper'], out['boll_middle'], out['boll_lower']
+
+
+def calculate_rsi_array(close: np.ndarray, period: int = 14, wilder: bool = False) -> np.ndarray:
+    """基于收盘价数组计算RSI，wilder=False 时与 calculate_rsi 的结果一致"""
+    close = np.asarray(close, dtype=np.float64)
+    if wilder:
+        return _wilder_rsi(close, period)
+    out = _empty_outputs(len(close), ('rsi',))
+    for lo in range(0, len(close), KERNEL_BLOCK):
+        _rsi_block(close, period, lo, min(len(close), lo + KERNEL_BLOCK), out)
+    return out['rsi']
+
+
+def compute_indicator_arrays(close: np.ndarray, boll_period: int = 20, boll_std: float = 2.0,
+                             rsi_period: int = 14, wilder: bool = False) -> Dict[str, np.ndarray]:
+    """
+    一次遍历计算布林带、价格位置和RSI
+    
+    Args:
+        close: 收盘价数组
+        boll_period: 布林带周期
+        boll_std: 布林带标准差倍数
+        rsi_period: RSI周期
+        wilder: RSI使用Wilder平滑
+        
+    Returns:
+        {'boll_upper', 'boll_middle', 'boll_lower', 'boll_position', 'rsi'} -> 数组，
+        数据不足一个周期的位置为NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    out = _empty_outputs(n, ('boll_upper', 'boll_middle', 'boll_lower', 'boll_position', 'rsi'))
+    for lo in range(0, n, KERNEL_BLOCK):
+        hi = min(n, lo + KERNEL_BLOCK)
+        _bollinger_block(close, boll_period, boll_std, lo, hi, out)
+        if not wilder:
+            _rsi_block(close, rsi_period, lo, hi, out)
+    if wilder:
+        out['rsi'] = _wilder_rsi(close, rsi_period)
+    return out
+
+
+def _tail_windows(values: np.ndarray, period: int, last: int) -> np.ndarray:
+    """以最后last个位置结尾、长度为period的窗口，形状 (窗口数, period)；数据不足一个周期的位置不返回"""
+    count = max(0, min(last, len(values) - period + 1))
+    start = len(values) - count - period + 1
+    return values[start + np.arange(count)[:, None] + np.arange(period)]
+
+
+def compute_latest(close: np.ndarray, boll_period: int = 20, boll_std: float = 2.0, rsi_period: int = 14,
+                   wilder: bool = False, last: int = 1) -> Dict[str, np.ndarray]:
+    """
+    只计算最后last根K线的布林带、价格位置和RSI
+
+    每个输出只依赖以它结尾的一个周期的窗口，因此只读取最后 period + last - 1 根收盘价，
+    开销与窗口总长度无关。每个窗口按窗口首个收盘价平移后求和，数据不足一个周期为NaN、
+    横盘时标准差和涨跌幅为精确的0，与 compute_indicator_arrays 相同，数值在浮点舍入误差内一致。
+    Wilder平滑是递推的，wilder=True 时RSI退回完整计算
+
+    Args:
+        close: 收盘价数组
+        boll_period: 布林带周期
+        boll_std: 布林带标准差倍数
+        rsi_period: RSI周期
+        wilder: RSI使用Wilder平滑
+        last: 计算最后几根K线
+
+    Returns:
+        与 compute_indicator_arrays 相同的键 -> 长度为 min(last, len(close)) 的数组
+    """
+    close = np.asarray(close, dtype=np.float64)
+    last = max(0, min(last, len(close)))
+    out = _empty_outputs(last, ('boll_upper', 'boll_middle', 'boll_lower', 'boll_position', 'rsi'))
+
+    windows = _tail_windows(close, boll_period, last)
+    if len(windows):
+        offsets = windows - windows[:, :1]
+        sums = offsets.sum(axis=1)
+        mean_offset = sums / boll_period
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = np.maximum(((offsets * offsets).sum(axis=1) - sums * mean_offset) / (boll_period - 1), 0.0)
+            band = boll_std * np.sqrt(variance)
+            position = (offsets[:, -1] - mean_offset + band) / (2 * band) * 100
+        position[band == 0] = np.nan
+        middle = mean_offset + windows[:, 0]
+        out['boll_middle'][last - len(windows):] = middle
+        out['boll_upper'][last - len(windows):] = middle + band
+        out['boll_lower'][last - len(windows):] = middle - band
+        out['boll_position'][last - len(windows):] = position
+
+    if wilder:
+        out['rsi'][:] = _wilder_rsi(close, rsi_period)[len(close) - last:]
+    else:
+        count = max(0, min(last, len(close) - rsi_period + 1))
+        if count:
+            gain, loss = _gain_loss(close, len(close) - count - rsi_period + 1, len(close))
+            gain_sum = _tail_windows(gain, rsi_period, count).sum(axis=1)
+            loss_sum = _tail_windows(loss, rsi_period, count).sum(axis=1)
+            out['rsi'][last - count:] = _rsi_from_sums(gain_sum, loss_sum)
+    return out
+
+
+# ==================== 分位数通道 ====================
+# 以滚动分位数代替 均值 ± k·标准差 作为通道，对加密货币收益率的厚尾更稳健。
+# 输出 qband_upper/qband_middle/qband_lower，SignalDetector(band_prefix='qband') 可直接替代布林带使用
+
+QUANTILE_BANDS = (0.025, 0.5, 0.975)
+
+
+class SortedWindow:
+    """
+    有序滑动窗口
+
+    按到达顺序淘汰最旧的值，同时维护窗口内的升序列表：插入/删除用二分查找定位（O(log w)次比较），
+    但列表插入/删除要搬移其后的元素，每次更新为O(w)（一次memmove，窗口为几十根时可忽略），
+    任意分位数O(1)读取。NaN不进入有序列表（否则破坏二分查找的顺序），窗口内有NaN时分位数为NaN
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._order = deque()
+        self._sorted = []
+        # 窗口内NaN的个数
+        self._missing = 0
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def _insert(self, value: float) -> None:
+        if value != value:
+            self._missing += 1
+        else:
+            insort(self._sorted, value)
+
+    def _remove(self, value: float) -> None:
+        if value != value:
+            self._missing -= 1
+        else:
+            del self._sorted[bisect_left(self._sorted, value)]
+
+    def push(self, value: float) -> None:
+        """加入一个新值，窗口已满时淘汰最旧的值"""
+        if len(self._order) == self.size:
+            self._remove(self._order.popleft())
+        self._order.append(value)
+        self._insert(value)
+
+    def replace_last(self, value: float) -> None:
+        """替换最新的值（未收盘K线的更新）"""
+        if not self._order:
+            self.push(value)
+            return
+        self._remove(self._order[-1])
+        self._order[-1] = value
+        self._insert(value)
+
+    def quantile(self, q: float) -> float:
+        """分位数（线性插值，与pandas rolling().quantile() 相同），窗口为空或含NaN时为NaN"""
+        n = len(self._sorted)
+        if n == 0 or self._missing:
+            return math.nan
+        position = q * (n - 1)
+        lo = int(position)
+        hi = min(lo + 1, n - 1)
+        return self._sorted[lo] + (self._sorted[hi] - self._sorted[lo]) * (position - lo)
+
+
+def calculate_quantile_band_arrays(close: np.ndarray, period: int = 20,
+                                   quantiles: Tuple[float, float, float] = QUANTILE_BANDS
+                                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    基于收盘价数组计算滚动分位数通道
+
+    按块取出所有窗口，在C中逐窗口排序后按下标插值：共 O(n·w·log w)，每个窗口复制一份
+    （块大小限制临时内存）。窗口较短时仍比逐根维护有序窗口（见 SortedWindow，每根O(w)但在Python中执行）
+    快得多；结果与 pandas rolling().quantile() 一致，含NaN的窗口为NaN
+
+    Args:
+        close: 收盘价数组
+        period: 窗口长度
+        quantiles: (下轨, 中轨, 上轨) 的分位数
+
+    Returns:
+        (上轨, 中轨, 下轨)，数据不足一个周期的位置为NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n = len(close)
+    bands = np.full((3, n), np.nan)
+    positions = np.asarray(quantiles, dtype=np.float64) * (period - 1)
+    below = positions.astype(np.int64)
+    above = np.minimum(below + 1, period - 1)
+    fraction = positions - below
+    for lo in range(max(0, period - 1), n, KERNEL_BLOCK):
+        hi = min(n, lo + KERNEL_BLOCK)
+        windows = np.sort(np.lib.stride_tricks.sliding_window_view(close[lo - period + 1:hi], period), axis=1)
+        bands[:, lo:hi] = (windows[:, below] + (windows[:, above] - windows[:, below]) * fraction).T
+        # NaN排在最后，含NaN的窗口整体置为NaN
+        bands[:, lo:hi][:, np.isnan(windows[:, -1])] = np.nan
+    lower, middle, upper = bands
+    return upper, middle, lower
+
+
+def calculate_quantile_bands(df: pd.DataFrame, period: int = 20,
+                             quantiles: Tuple[float, float, float] = QUANTILE_BANDS) -> pd.DataFrame:
+    """
+    计算滚动分位数通道
+
+    Returns:
+        添加了qband_upper, qband_middle, qband_lower列的DataFrame
+    """
+    df = df.copy()
+    upper, middle, lower = calculate_quantile_band_arrays(df['close'].to_numpy(dtype=np.float64),
+                                                          period, quantiles)
+    df['qband_upper'] = upper
+    df['qband_middle'] = middle
+    df['qband_lower'] = lower
+    return df
+
+
+def calculate_all_indicators(df: Union[pd.DataFrame, CandleBuffer], boll_period: int = 20,
+                             boll_std: float = 2.0, rsi_period: int = 14,
+                             wilder: bool = False, tail: Optional[int] = None) -> Union[pd.DataFrame, Dict]:
     """
     计算所有指标
     
     Args:
-        df: 包含OHLCV数据的DataFrame
+        df: 包含OHLCV数据的DataFrame，或K线环形缓冲区
         boll_period: 布林带周期
         boll_std: 布林带标准差倍数
         rsi_period: RSI周期
+        wilder: RSI使用Wilder平滑
+        tail: 只计算最后tail根K线（仅CandleBuffer，见 compute_latest），不需要完整序列（如不画图）时使用
         
     Returns:
-        包含所有指标的DataFrame
+        传入DataFrame时返回包含所有指标的DataFrame；
+        传入CandleBuffer时返回 列名 -> 数组 的字典（K线列为缓冲区的只读视图）
     """
+    if isinstance(df, CandleBuffer):
+        close = df.close
+        if tail is None:
+            series = compute_indicator_arrays(close, boll_period, boll_std, rsi_period, wilder)
+        else:
+            series = compute_latest(close, boll_period, boll_std, rsi_period, wilder, last=tail)
+        rows = len(series['rsi'])
+        series.update({'timestamp': df.timestamp[len(close) - rows:], 'close': close[len(close) - rows:]})
+        return series
+    
     df = calculate_bollinger_bands(df, period=boll_period, std_dev=boll_std)
-    df = calculate_rsi(df, period=rsi_period)
+    df = calculate_rsi(df, period=rsi_period, wilder=wilder)
     
     return df
 
 
-def get_latest_indicators(df: pd.DataFrame) -> Dict:
+def get_latest_indicators(df: Union[pd.DataFrame, Dict]) -> Dict:
     """
     获取最新的指标值
     
     Args:
-        df: 包含指标的DataFrame
+        df: 包含指标的DataFrame，或 calculate_all_indicators 返回的数组字典
         
     Returns:
         包含最新指标值的字典
     """
-    if df is None or len(df) == 0:
+    if df is None:
+        return {}
+    
+    if isinstance(df, dict):
+        if len(df['close']) == 0:
+            return {}
+        latest = {name: float(values[-1]) for name, values in df.items() if name != 'timestamp'}
+        latest['timestamp'] = ms_to_datetime(int(df['timestamp'][-1]))
+    elif len(df) == 0:
         return {}
+    else:
+        latest = df.iloc[-1]
     
-    latest = df.iloc[-1]
+    return indicators_from_row(latest)
+
+
+def ms_to_datetime(timestamp_ms: int) -> datetime:
+    """毫秒时间戳转换为不带时区的UTC时间（与DataFrame中的时间列一致）"""
+    return datetime.fromtimestamp(timestamp_ms / 1000, tz=timezone.utc).replace(tzinfo=None)
+
+
+def indicators_from_row(latest) -> Dict:
+    """
+    由一行指标值（DataFrame的一行或字典）生成最新指标字典
     
+    Args:
+        latest: 至少包含close列，可包含timestamp、boll_upper、boll_middle、boll_lower、rsi
+        
+    Returns:
+        包含最新指标值的字典
+    """
     return {
         'timestamp': latest.get('timestamp'),
         'close': latest['close'],
@@ -106,9 +489,10 @@ def get_latest_indicators(df: pd.DataFrame) -> Dict:
         'boll_middle': latest.get('boll_middle'),
         'boll_lower': latest.get('boll_lower'),
         'rsi': latest.get('rsi'),
-        # 计算价格相对于布林带的位置百分比
+        # 计算价格相对于布林带的位置百分比（横盘时带宽为0，与 boll_position 列相同为NaN）
         'boll_position': ((latest['close'] - latest.get('boll_lower', 0)) / 
-                         (latest.get('boll_upper', 1) - latest.get('boll_lower', 0)) * 100) 
+                         (latest.get('boll_upper', 1) - latest.get('boll_lower', 0)) * 100
+                         if latest.get('boll_upper') != latest.get('boll_lower') else float('nan'))
                          if latest.get('boll_upper') and latest.get('boll_lower') else None
     }
 
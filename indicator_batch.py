@@ -0,0 +1,175 @@
+"""
+批量指标模块 - 把多个交易对的收盘价堆叠成 (交易对数 × K线数) 的二维数组，一次计算所有交易对的布林带和RSI
+
+监控列表中每个交易对只有100根左右的K线，逐个调用 calculate_all_indicators 时固定开销占了全部耗时；
+批量计算把这部分开销摊到所有交易对上。历史长度不同的交易对在开头补NaN对齐到最新一根K线，
+包含NaN的窗口结果为NaN，因此每一行与单独对该交易对计算的结果一致
+"""
+from typing import Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+from indicator import KERNEL_BLOCK, _rsi_from_sums
+
+BATCH_OUTPUTS = ('boll_upper', 'boll_middle', 'boll_lower', 'boll_position', 'rsi')
+
+
+def stack_closes(series: Sequence[Sequence[float]], length: Optional[int] = None) -> np.ndarray:
+    """
+    把多个收盘价序列按最新一根K线右对齐，开头补NaN
+
+    Args:
+        series: 各交易对的收盘价序列（按时间升序）
+        length: 保留的K线数，默认为最长序列的长度；更长的序列只保留最后length根
+
+    Returns:
+        (交易对数, length) 的数组
+    """
+    arrays = [np.asarray(values, dtype=np.float64) for values in series]
+    if length is None:
+        length = max((len(values) for values in arrays), default=0)
+    stacked = np.full((len(arrays), length), np.nan)
+    for row, values in zip(stacked, arrays):
+        values = values[len(values) - length:] if len(values) > length else values
+        if len(values):
+            row[length - len(values):] = values
+    return stacked
+
+
+def _window_sums_2d(values: np.ndarray, period: int) -> np.ndarray:
+    """按行计算所有长度为period的窗口之和，形状 (行数, 列数 - period + 1)"""
+    prefix = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=prefix[:, 1:])
+    return prefix[:, period:] - prefix[:, :-period]
+
+
+def _bollinger_block_2d(closes: np.ndarray, valid: np.ndarray, period: int, std_dev: float,
+                        lo: int, hi: int, out: Dict[str, np.ndarray]) -> None:
+    """计算以 lo ~ hi-1 列结尾的窗口的布林带和价格位置，写入out"""
+    first = max(lo, period - 1)
+    if first >= hi:
+        return
+    segment = closes[:, first - period + 1:hi]
+    mask = valid[:, first - period + 1:hi]
+    # 每行按该行的均值平移，减少大数相减的精度损失
+    count = mask.sum(axis=1)
+    shift = np.where(count > 0, np.where(mask, segment, 0.0).sum(axis=1) / np.maximum(count, 1), 0.0)
+    offsets = np.where(mask, segment - shift[:, None], 0.0)
+
+    full = _window_sums_2d(mask, period) == period
+    sums = _window_sums_2d(offsets, period)
+    sums_sq = _window_sums_2d(offsets * offsets, period)
+    mean_offset = sums / period
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.maximum((sums_sq - sums * mean_offset) / (period - 1), 0.0)
+        middle = mean_offset + shift[:, None]
+        if period > 1:
+            # 横盘窗口按价格变化次数把方差置为精确的0（与 compute_indicator_arrays 一致）
+            flat = _window_sums_2d(segment[:, 1:] != segment[:, :-1], period - 1) == 0
+            variance[flat] = 0.0
+            mean_offset[flat] = offsets[:, period - 1:][flat]
+            middle[flat] = segment[:, period - 1:][flat]
+        band = np.where(full, std_dev * np.sqrt(variance), np.nan)
+        middle = np.where(full, middle, np.nan)
+        position = (offsets[:, period - 1:] - mean_offset + band) / (2 * band) * 100
+
+    out['boll_middle'][:, first:hi] = middle
+    out['boll_upper'][:, first:hi] = middle + band
+    out['boll_lower'][:, first:hi] = middle - band
+    out['boll_position'][:, first:hi] = position
+
+
+def _rsi_block_2d(closes: np.ndarray, valid: np.ndarray, period: int, lo: int, hi: int,
+                  out: Dict[str, np.ndarray]) -> None:
+    """计算以 lo ~ hi-1 列结尾的窗口的RSI（简单移动平均），写入out"""
+    first = max(lo, period - 1)
+    if first >= hi:
+        return
+    start = first - period + 1
+    current, current_valid = closes[:, start:hi], valid[:, start:hi]
+    if start == 0:
+        previous = np.concatenate((np.full((len(closes), 1), np.nan), closes[:, :hi - 1]), axis=1)
+        previous_valid = np.concatenate((np.zeros((len(closes), 1), dtype=bool), valid[:, :hi - 1]), axis=1)
+    else:
+        previous, previous_valid = closes[:, start - 1:hi - 1], valid[:, start - 1:hi - 1]
+
+    # 每个交易对第一根有效K线的涨跌计为0（与单独计算时一致）
+    with np.errstate(invalid='ignore'):
+        delta = np.where(current_valid & previous_valid, current - previous, 0.0)
+    gain, loss = np.maximum(delta, 0.0), np.maximum(-delta, 0.0)
+
+    full = _window_sums_2d(current_valid, period) == period
+    gain_sum = _window_sums_2d(gain, period)
+    loss_sum = _window_sums_2d(loss, period)
+    # 窗口内没有上涨/下跌时前缀和相减可能残留极小值，按计数置为精确的0
+    gain_sum[_window_sums_2d(gain > 0, period) == 0] = 0.0
+    loss_sum[_window_sums_2d(loss > 0, period) == 0] = 0.0
+    out['rsi'][:, first:hi] = np.where(full, _rsi_from_sums(gain_sum, loss_sum), np.nan)
+
+
+def compute_indicator_batch(closes: np.ndarray, boll_period: int = 20, boll_std: float = 2.0,
+                            rsi_period: int = 14) -> Dict[str, np.ndarray]:
+    """
+    批量计算多个交易对的布林带、价格位置和RSI
+
+    Args:
+        closes: (交易对数, K线数) 的收盘价数组，历史不足的交易对在开头补NaN（见 stack_closes）
+        boll_period: 布林带周期
+        boll_std: 布林带标准差倍数
+        rsi_period: RSI周期
+
+    Returns:
+        {'boll_upper', 'boll_middle', 'boll_lower', 'boll_position', 'rsi'} -> 与closes同形状的数组，
+        每一行与 compute_indicator_arrays 对该交易对的有效K线单独计算的结果一致
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=np.float64))
+    valid = np.isfinite(closes)
+    n = closes.shape[1]
+    out = {name: np.full(closes.shape, np.nan) for name in BATCH_OUTPUTS}
+    # 分块大小按总元素数计算，使工作集留在CPU缓存中
+    block = max(KERNEL_BLOCK // max(len(closes), 1), max(boll_period, rsi_period) * 4)
+    for lo in range(0, n, block):
+        hi = min(n, lo + block)
+        _bollinger_block_2d(closes, valid, boll_period, boll_std, lo, hi, out)
+        _rsi_block_2d(closes, valid, rsi_period, lo, hi, out)
+    return out
+
+
+def latest_indicator_batch(closes: np.ndarray, boll_period: int = 20, boll_std: float = 2.0,
+                           rsi_period: int = 14) -> Dict[str, np.ndarray]:
+    """
+    批量计算并取出每个交易对最新一根K线上的指标
+
+    Returns:
+        {'close', 'boll_upper', 'boll_middle', 'boll_lower', 'boll_position', 'rsi'} -> (交易对数,) 的数组；
+        最新一根K线为每行最后一个有效收盘价，没有任何有效收盘价的交易对全部为NaN
+    """
+    closes = np.atleast_2d(np.asarray(closes, dtype=np.float64))
+    series = compute_indicator_batch(closes, boll_period, boll_std, rsi_period)
+    series['close'] = closes
+    if closes.shape[1] == 0:
+        return {name: np.full(len(closes), np.nan) for name in series}
+
+    valid = np.isfinite(closes)
+    last = closes.shape[1] - 1 - np.argmax(valid[:, ::-1], axis=1)
+    rows = np.arange(len(closes))
+    has_data = valid.any(axis=1)
+    return {name: np.where(has_data, values[rows, last], np.nan) for name, values in series.items()}
+
+
+def scan_symbols(histories: Mapping[str, Sequence[float]], boll_period: int = 20, boll_std: float = 2.0,
+                 rsi_period: int = 14) -> Dict[str, Dict[str, float]]:
+    """
+    扫描监控列表：一次批量计算所有交易对，返回每个交易对的最新指标
+
+    Args:
+        histories: 交易对 -> 收盘价序列
+
+    Returns:
+        交易对 -> {'close', 'boll_upper', 'boll_middle', 'boll_lower', 'boll_position', 'rsi'}
+    """
+    symbols = list(histories)
+    latest = latest_indicator_batch(stack_closes([histories[symbol] for symbol in symbols]),
+                                    boll_period, boll_std, rsi_period)
+    return {symbol: {name: float(values[i]) for name, values in latest.items()}
+            for i, symbol in enumerate(symbols)}
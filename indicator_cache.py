@@ -0,0 +1,213 @@
+"""
+指标结果缓存模块 - 按输入序列指纹和指标参数缓存计算结果
+
+Streamlit每次交互和自动刷新都会重新运行整个脚本，大部分时候输入的K线和参数都没有变化。
+缓存以 (K线数, 首尾时间戳, 收盘价校验和) + 参数 为键，命中时直接返回结果；
+只有最后几根K线变化（新K线收盘、当前K线价格更新）时，复用缓存中未变化的行，只计算变化的几根
+"""
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from candle_buffer import CandleBuffer
+from indicator import compute_indicator_arrays, compute_latest
+
+# 复用的行数不足输入的一半时直接完整计算
+MIN_REUSE_RATIO = 0.5
+
+
+class _Entry:
+    __slots__ = ('params', 'timestamps', 'close', 'outputs', 'nbytes')
+
+    def __init__(self, params: tuple, timestamps: np.ndarray, close: np.ndarray, outputs: Dict[str, np.ndarray]):
+        self.params = params
+        self.timestamps = timestamps
+        self.close = close
+        self.outputs = outputs
+        self.nbytes = timestamps.nbytes + close.nbytes + sum(values.nbytes for values in outputs.values())
+
+
+class IndicatorCache:
+    """
+    有界LRU指标缓存（线程安全，可在多个Streamlit会话间共享）
+
+    按条目数和总字节数淘汰最久未使用的结果；缓存的数组为只读，调用方需要修改时先复制
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 32 * 1024 * 1024):
+        """
+        初始化指标缓存
+
+        Args:
+            max_entries: 最多缓存的结果数
+            max_bytes: 缓存数组的总字节数上限
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[tuple, _Entry]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.extended = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict[str, int]:
+        """命中/未命中/增量扩展/淘汰次数和当前占用"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'extended': self.extended,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'bytes': self._bytes
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @staticmethod
+    def fingerprint(timestamps: np.ndarray, close: np.ndarray) -> tuple:
+        """输入序列指纹：(K线数, 首尾时间戳, 收盘价CRC32)"""
+        if len(close) == 0:
+            return (0, None, None, 0)
+        return (len(close), int(timestamps[0]), int(timestamps[-1]), zlib.crc32(close.tobytes()))
+
+    def compute(self, timestamps: np.ndarray, close: np.ndarray, boll_period: int = 20, boll_std: float = 2.0,
+                rsi_period: int = 14, wilder: bool = False) -> Dict[str, np.ndarray]:
+        """
+        计算（或从缓存取出）布林带、价格位置和RSI
+
+        Args:
+            timestamps: 毫秒时间戳数组（只用于识别K线）
+            close: 收盘价数组
+
+        Returns:
+            与 compute_indicator_arrays 相同的字典，数组为只读
+        """
+        timestamps = np.ascontiguousarray(timestamps, dtype=np.int64)
+        close = np.ascontiguousarray(close, dtype=np.float64)
+        params = (int(boll_period), float(boll_std), int(rsi_period), bool(wilder))
+        key = (self.fingerprint(timestamps, close), params)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.outputs
+            # Wilder平滑是递推的，每个值依赖全部历史，不能复用
+            base = None if wilder else self._find_base(params, timestamps, close)
+
+        if base is None:
+            outputs = compute_indicator_arrays(close, boll_period, boll_std, rsi_period, wilder)
+        else:
+            outputs = self._extend(base, close, params)
+
+        for values in outputs.values():
+            values.setflags(write=False)
+        timestamps = timestamps.copy()
+        close = close.copy()
+        with self._lock:
+            if base is None:
+                self.misses += 1
+            else:
+                self.extended += 1
+            self._store(key, _Entry(params, timestamps, close, outputs))
+        return outputs
+
+    def _find_base(self, params: tuple, timestamps: np.ndarray,
+                   close: np.ndarray) -> Optional[Tuple[_Entry, int, int]]:
+        """
+        找到可以复用的缓存结果
+
+        Returns:
+            (缓存条目, 输入第一根K线在缓存中的下标, 可复用的行数)，没有时返回None
+        """
+        n = len(close)
+        if n == 0:
+            return None
+        for entry in reversed(self._entries.values()):
+            if entry.params != params or len(entry.timestamps) == 0:
+                continue
+            offset = int(np.searchsorted(entry.timestamps, timestamps[0]))
+            if offset >= len(entry.timestamps) or entry.timestamps[offset] != timestamps[0]:
+                continue
+            shared = min(len(entry.timestamps) - offset, n)
+            same = (entry.timestamps[offset:offset + shared] == timestamps[:shared]) & \
+                   (entry.close[offset:offset + shared] == close[:shared])
+            reuse = shared if same.all() else int(np.argmin(same))
+            if reuse >= max(1, n * MIN_REUSE_RATIO):
+                return entry, offset, reuse
+        return None
+
+    @staticmethod
+    def _extend(base: Tuple[_Entry, int, int], close: np.ndarray, params: tuple) -> Dict[str, np.ndarray]:
+        """复用未变化的行，重新计算变化的行和（窗口前移时）开头不足一个周期的行"""
+        entry, offset, reuse = base
+        boll_period, boll_std, rsi_period, _ = params
+        n = len(close)
+        outputs = {name: np.empty(n) for name in entry.outputs}
+        for name, values in entry.outputs.items():
+            outputs[name][:reuse] = values[offset:offset + reuse]
+
+        if n > reuse:
+            tail = compute_latest(close, boll_period, boll_std, rsi_period, last=n - reuse)
+            for name, values in tail.items():
+                outputs[name][reuse:] = values
+
+        # 窗口前移后，开头的行在新序列中数据不足一个周期（RSI的第一根涨跌也变为0），按新序列重新计算
+        if offset > 0:
+            warm = min(n, max(boll_period, rsi_period))
+            head = compute_indicator_arrays(close[:warm], boll_period, boll_std, rsi_period)
+            for name, values in head.items():
+                outputs[name][:warm] = values
+        return outputs
+
+    def _store(self, key: tuple, entry: _Entry) -> None:
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key).nbytes
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+
+    def calculate_all_indicators(self, df, boll_period: int = 20, boll_std: float = 2.0,
+                                 rsi_period: int = 14, wilder: bool = False):
+        """
+        带缓存的 calculate_all_indicators
+
+        Args:
+            df: 包含timestamp和close列的DataFrame，或K线环形缓冲区
+
+        Returns:
+            与 indicator.calculate_all_indicators 相同格式的结果
+        """
+        if isinstance(df, CandleBuffer):
+            outputs = self.compute(df.timestamp, df.close, boll_period, boll_std, rsi_period, wilder)
+            series = dict(outputs)
+            series.update({'timestamp': df.timestamp, 'close': df.close})
+            return series
+
+        timestamps = df['timestamp'].to_numpy().astype('datetime64[ms]').astype(np.int64)
+        outputs = self.compute(timestamps, df['close'].to_numpy(dtype=np.float64),
+                               boll_period, boll_std, rsi_period, wilder)
+        df = df.copy()
+        for name in ('boll_middle', 'boll_upper', 'boll_lower', 'rsi'):
+            df[name] = outputs[name].copy()
+        return df
@@ -0,0 +1,177 @@
+"""
+参数网格指标模块 - 一次计算整组 (BOLL周期, 标准差倍数, RSI周期) 组合的指标
+
+所有周期共用同一组前缀和（每个分块只做一次cumsum，各周期的窗口和只是不同下标的差），
+标准差倍数只是对 中轨 ± k·std 的广播，因此 50x20x20 的网格只比单次计算多几次数组运算
+"""
+from typing import Dict, Sequence
+
+import numpy as np
+
+from indicator import KERNEL_BLOCK, _gain_loss, _rsi_from_sums
+
+
+def _prefix(values: np.ndarray) -> np.ndarray:
+    prefix = np.empty(len(values) + 1)
+    prefix[0] = 0.0
+    np.cumsum(values, out=prefix[1:])
+    return prefix
+
+
+def _windowed(prefix: np.ndarray, ends: np.ndarray, periods: np.ndarray) -> np.ndarray:
+    """
+    各周期在各结束位置的窗口和，形状 (周期数, 位置数)
+
+    ends为分块内的结束下标；分块从序列开头算起时，窗口超出开头的位置为NaN（数据不足一个周期）
+    """
+    starts = ends[None, :] + 1 - periods[:, None]
+    valid = starts >= 0
+    sums = prefix[ends[None, :] + 1] - prefix[np.where(valid, starts, 0)]
+    sums[~valid] = np.nan
+    return sums
+
+
+class IndicatorGrid:
+    """
+    参数网格的计算结果
+
+    中轨、标准差和RSI在计算时生成；上/下轨和价格位置的3维张量 (P, S, n)
+    只是对标准差倍数的广播，第一次访问时才生成，只取单个组合或最新值时不会生成整个张量
+    """
+
+    def __init__(self, close: np.ndarray, boll_periods: np.ndarray, std_devs: np.ndarray,
+                 rsi_periods: np.ndarray, boll_middle: np.ndarray, boll_std: np.ndarray, rsi: np.ndarray):
+        self.close = close
+        self.boll_periods = boll_periods
+        self.std_devs = std_devs
+        self.rsi_periods = rsi_periods
+        self.boll_middle = boll_middle      # (P, n)
+        self.boll_std = boll_std            # (P, n) 样本标准差
+        self.rsi = rsi                      # (R, n)
+        self._tensors: Dict[str, np.ndarray] = {}
+
+    @property
+    def shape(self) -> tuple:
+        """(P, S, R, n)"""
+        return len(self.boll_periods), len(self.std_devs), len(self.rsi_periods), len(self.close)
+
+    @staticmethod
+    def _bands(close, middle, std, std_devs) -> Dict[str, np.ndarray]:
+        """按标准差倍数广播出上/下轨和价格位置，最后一维与输入的最后一维对齐"""
+        band = std_devs[:, None] * std[..., None, :]
+        middle = middle[..., None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # (close - lower) / (upper - lower) * 100，横盘（带宽为0）时为NaN（与 compute_indicator_arrays 一致）
+            position = (close - middle) / (2 * band) * 100 + 50
+        position[band == 0] = np.nan
+        return {'boll_upper': middle + band, 'boll_lower': middle - band, 'boll_position': position}
+
+    def _tensor(self, name: str) -> np.ndarray:
+        if name not in self._tensors:
+            self._tensors.update(self._bands(self.close, self.boll_middle, self.boll_std, self.std_devs))
+        return self._tensors[name]
+
+    @property
+    def boll_upper(self) -> np.ndarray:
+        """(P, S, n)"""
+        return self._tensor('boll_upper')
+
+    @property
+    def boll_lower(self) -> np.ndarray:
+        """(P, S, n)"""
+        return self._tensor('boll_lower')
+
+    @property
+    def boll_position(self) -> np.ndarray:
+        """(P, S, n) 价格在带内的位置百分比"""
+        return self._tensor('boll_position')
+
+    def select(self, boll_index: int, std_index: int, rsi_index: int) -> Dict[str, np.ndarray]:
+        """取出一个参数组合，格式与 compute_indicator_arrays 的返回值相同"""
+        bands = self._bands(self.close, self.boll_middle[boll_index], self.boll_std[boll_index],
+                            self.std_devs[std_index:std_index + 1])
+        return {
+            'boll_upper': bands['boll_upper'][0],
+            'boll_middle': self.boll_middle[boll_index],
+            'boll_lower': bands['boll_lower'][0],
+            'boll_position': bands['boll_position'][0],
+            'rsi': self.rsi[rsi_index]
+        }
+
+    def latest(self) -> Dict[str, np.ndarray]:
+        """
+        最后一根K线上的全部组合
+
+        Returns:
+            {'boll_upper'/'boll_lower'/'boll_position': (P, S), 'boll_middle': (P,), 'rsi': (R,)}
+        """
+        bands = self._bands(self.close[-1:], self.boll_middle[:, -1:], self.boll_std[:, -1:], self.std_devs)
+        latest = {name: values[..., 0] for name, values in bands.items()}
+        latest.update({'boll_middle': self.boll_middle[:, -1], 'rsi': self.rsi[:, -1]})
+        return latest
+
+
+def compute_indicator_grid(close: np.ndarray, boll_periods: Sequence[int], std_devs: Sequence[float],
+                           rsi_periods: Sequence[int]) -> IndicatorGrid:
+    """
+    计算参数网格上的全部指标
+
+    Args:
+        close: 收盘价数组，长度n
+        boll_periods: BOLL周期列表（P个）
+        std_devs: 标准差倍数列表（S个）
+        rsi_periods: RSI周期列表（R个）
+
+    Returns:
+        IndicatorGrid: boll_middle/boll_std 为 (P, n)，rsi 为 (R, n)，
+        boll_upper/boll_lower/boll_position 为 (P, S, n)；
+        与 compute_indicator_arrays 对每个组合单独计算的结果一致，数据不足一个周期的位置为NaN
+    """
+    close = np.asarray(close, dtype=np.float64)
+    boll_periods = np.asarray(boll_periods, dtype=np.int64)
+    std_devs = np.asarray(std_devs, dtype=np.float64)
+    rsi_periods = np.asarray(rsi_periods, dtype=np.int64)
+    n = len(close)
+
+    middle = np.full((len(boll_periods), n), np.nan)
+    std = np.full((len(boll_periods), n), np.nan)
+    rsi = np.full((len(rsi_periods), n), np.nan)
+
+    boll_reach = int(boll_periods.max()) - 1 if len(boll_periods) else 0
+    rsi_reach = int(rsi_periods.max()) - 1 if len(rsi_periods) else 0
+    for lo in range(0, n, KERNEL_BLOCK):
+        hi = min(n, lo + KERNEL_BLOCK)
+
+        # BOLL：分块内平移后的一阶、二阶前缀和，所有周期共用
+        if len(boll_periods):
+            start = max(0, lo - boll_reach)
+            segment = close[start:hi]
+            offsets = segment - segment[0]
+            ends = np.arange(lo - start, hi - start)
+            sums = _windowed(_prefix(offsets), ends, boll_periods)
+            sums_sq = _windowed(_prefix(offsets * offsets), ends, boll_periods)
+            periods = boll_periods[:, None]
+            mean_offset = sums / periods
+            with np.errstate(divide='ignore', invalid='ignore'):
+                variance = np.maximum((sums_sq - sums * mean_offset) / (periods - 1), 0.0)
+            block_middle = mean_offset + segment[0]
+            # 横盘窗口前缀和相减可能残留极小值，按窗口内价格变化次数置为精确的0（与 indicator._bollinger_block 一致）
+            changes = _windowed(_prefix(segment[1:] != segment[:-1]), ends - 1, boll_periods - 1)
+            flat = (changes == 0) & (periods > 1)
+            variance[flat] = 0.0
+            block_middle[flat] = np.broadcast_to(segment[ends], flat.shape)[flat]
+            middle[:, lo:hi] = block_middle
+            std[:, lo:hi] = np.sqrt(variance)
+
+        # RSI：涨跌幅和非0计数的前缀和，所有周期共用
+        if len(rsi_periods):
+            start = max(0, lo - rsi_reach)
+            gain, loss = _gain_loss(close, start, hi)
+            ends = np.arange(lo - start, hi - start)
+            gain_sum = _windowed(_prefix(gain), ends, rsi_periods)
+            loss_sum = _windowed(_prefix(loss), ends, rsi_periods)
+            gain_sum[_windowed(_prefix(gain > 0), ends, rsi_periods) == 0] = 0.0
+            loss_sum[_windowed(_prefix(loss > 0), ends, rsi_periods) == 0] = 0.0
+            rsi[:, lo:hi] = _rsi_from_sums(gain_sum, loss_sum)
+
+    return IndicatorGrid(close, boll_periods, std_devs, rsi_periods, middle, std, rsi)
@@ -0,0 +1,394 @@
+"""
+指标注册表 - 指标声明自己依赖的基础运算（SMA、滚动标准差、差分等），
+求值器把所有请求的指标展开为一张依赖图（DAG），相同的中间结果只计算一次
+
+新增指标只需用 @register_indicator 组合已有的基础运算，例如:
+
+    @register_indicator('momentum')
+    def momentum(period=10):
+        close = col('close')
+        return {f'momentum_{period}': close - shift(close, period)}
+
+计算量随不同基础运算的数量增长，而不是随指标数量增长
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, List, Mapping, Sequence, Tuple, Union
+
+import numpy as np
+
+from candle_buffer import CandleBuffer
+from indicator import KERNEL_BLOCK, _window_sums
+
+
+# ==================== 表达式 ====================
+
+class Expr:
+    """
+    依赖图中的一个节点
+
+    key 为 (运算名, 参数...)，参数中的子节点用其key表示，因此结构相同的表达式key相同，
+    在同一次求值中只计算一次
+    """
+
+    __slots__ = ('op', 'args', 'key')
+
+    def __init__(self, op: str, *args):
+        self.op = op
+        self.args = args
+        self.key = (op,) + tuple(arg.key if isinstance(arg, Expr) else arg for arg in args)
+
+    @property
+    def inputs(self) -> List[Expr]:
+        return [arg for arg in self.args if isinstance(arg, Expr)]
+
+    def __repr__(self) -> str:
+        return f'Expr{self.key}'
+
+    def __add__(self, other):
+        return Expr('add', self, other)
+
+    def __radd__(self, other):
+        return Expr('add', other, self)
+
+    def __sub__(self, other):
+        return Expr('sub', self, other)
+
+    def __rsub__(self, other):
+        return Expr('sub', other, self)
+
+    def __mul__(self, other):
+        return Expr('mul', self, other)
+
+    def __rmul__(self, other):
+        return Expr('mul', other, self)
+
+    def __truediv__(self, other):
+        return Expr('div', self, other)
+
+    def __rtruediv__(self, other):
+        return Expr('div', other, self)
+
+    def __neg__(self):
+        return Expr('mul', -1.0, self)
+
+
+def col(name: str) -> Expr:
+    """输入列，如 'close', 'high'"""
+    return Expr('col', name)
+
+
+def diff(x: Expr) -> Expr:
+    """一阶差分，第一项为0（与 calculate_rsi 一致）"""
+    return Expr('diff', x)
+
+
+def shift(x: Expr, periods: int = 1) -> Expr:
+    """向后平移periods项，开头补NaN"""
+    return Expr('shift', x, periods)
+
+
+def clip_lower(x: Expr, bound: float = 0.0) -> Expr:
+    return Expr('clip_lower', x, bound)
+
+
+def abs_(x: Expr) -> Expr:
+    return Expr('abs', x)
+
+
+def maximum(*xs: Expr) -> Expr:
+    """逐项取最大值（NaN视为缺失）"""
+    return Expr('maximum', *xs)
+
+
+def rolling_sum(x: Expr, period: int) -> Expr:
+    return Expr('rolling_sum', x, period)
+
+
+def rolling_mean(x: Expr, period: int) -> Expr:
+    """滚动均值，横盘窗口为精确的窗口值"""
+    return Expr('rolling_mean', x, period)
+
+
+def sma(x: Expr, period: int) -> Expr:
+    return rolling_mean(x, period)
+
+
+def rolling_std(x: Expr, period: int) -> Expr:
+    """滚动样本标准差（ddof=1），横盘窗口为精确的0"""
+    return Expr('rolling_std', x, period)
+
+
+def ema(x: Expr, span: int) -> Expr:
+    """指数移动平均，从第一个非NaN值开始"""
+    return Expr('ema', x, span)
+
+
+def wilder(x: Expr, period: int) -> Expr:
+    """Wilder平滑"""
+    return Expr('wilder', x, period)
+
+
+# ==================== 基础运算 ====================
+
+def _shifted_blocks(values: np.ndarray, period: int):
+    """
+    分块遍历：返回 (first, hi, 块内平移后的片段, 平移量, 窗口是否完整)，片段覆盖以 first ~ hi-1 结尾的窗口
+
+    非有限值（NaN/inf）在片段中置0并按窗口计数，只有包含非有限值的窗口结果为NaN（与pandas rolling一致），
+    不会影响同一块中的其他窗口
+    """
+    for lo in range(0, len(values), KERNEL_BLOCK):
+        hi = min(len(values), lo + KERNEL_BLOCK)
+        first = max(lo, period - 1)
+        if first < hi:
+            segment = values[first - period + 1:hi]
+            finite = np.isfinite(segment)
+            shift_value = segment[np.argmax(finite)] if finite.any() else 0.0
+            offsets = np.where(finite, segment - shift_value, 0.0)
+            full = _window_sums(finite, period) == period
+            yield first, hi, offsets, shift_value, full
+
+
+def _rolling_sum(values: np.ndarray, period: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    for first, hi, offsets, shift_value, full in _shifted_blocks(values, period):
+        sums = _window_sums(offsets, period) + shift_value * period
+        # 窗口内全为0时前缀和相减可能残留极小值，按计数置为精确的0
+        sums[_window_sums(values[first - period + 1:hi] != 0, period) == 0] = 0.0
+        result[first:hi] = np.where(full, sums, np.nan)
+    return result
+
+
+def _flat_windows(values: np.ndarray, first: int, hi: int, period: int) -> np.ndarray:
+    """以 first ~ hi-1 结尾的窗口内价格是否全部相同（按相邻值变化次数判断，与 indicator._bollinger_block 一致）"""
+    segment = values[first - period + 1:hi]
+    if period == 1:
+        return np.zeros(hi - first, dtype=bool)
+    return _window_sums(segment[1:] != segment[:-1], period - 1) == 0
+
+
+def _rolling_mean(values: np.ndarray, period: int) -> np.ndarray:
+    # 与 indicator._bollinger_block 的中轨逐位相同：块内平移后的均值加回平移量
+    result = np.full(len(values), np.nan)
+    for first, hi, offsets, shift_value, full in _shifted_blocks(values, period):
+        mean = _window_sums(offsets, period) / period + shift_value
+        flat = _flat_windows(values, first, hi, period)
+        mean[flat] = values[first:hi][flat]
+        result[first:hi] = np.where(full, mean, np.nan)
+    return result
+
+
+def _rolling_std(values: np.ndarray, period: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    for first, hi, offsets, _, full in _shifted_blocks(values, period):
+        sums = _window_sums(offsets, period)
+        sums_sq = _window_sums(offsets * offsets, period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = np.maximum((sums_sq - sums * (sums / period)) / (period - 1), 0.0)
+        # 横盘窗口前缀和相减可能残留极小值，按变化次数置为精确的0
+        variance[_flat_windows(values, first, hi, period)] = 0.0
+        result[first:hi] = np.where(full, np.sqrt(variance), np.nan)
+    return result
+
+
+def _diff(values: np.ndarray) -> np.ndarray:
+    result = np.empty(len(values))
+    if len(values):
+        result[0] = 0.0
+        np.subtract(values[1:], values[:-1], out=result[1:])
+    return result
+
+
+def _shift(values: np.ndarray, periods: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    if periods < len(values):
+        result[periods:] = values[:len(values) - periods]
+    return result
+
+
+def _ema(values: np.ndarray, span: int) -> np.ndarray:
+    from jit_kernels import ema as ema_kernel
+
+    result = np.full(len(values), np.nan)
+    finite = np.flatnonzero(np.isfinite(values))
+    if len(finite):
+        result[finite[0]:] = ema_kernel(values[finite[0]:], span)
+    return result
+
+
+def _wilder(values: np.ndarray, period: int) -> np.ndarray:
+    from jit_kernels import wilder_smooth
+
+    result = np.full(len(values), np.nan)
+    finite = np.flatnonzero(np.isfinite(values))
+    if len(finite):
+        result[finite[0]:] = wilder_smooth(values[finite[0]:], period)
+    return result
+
+
+def _errstate(fn: Callable) -> Callable:
+    def wrapper(*args):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return fn(*args)
+    return wrapper
+
+
+# 运算名 -> 函数(已求值的参数...)，子节点参数传入数组，其余参数原样传入
+PRIMITIVES: Dict[str, Callable] = {
+    'add': np.add,
+    'sub': np.subtract,
+    'mul': np.multiply,
+    'div': _errstate(np.divide),
+    'abs': np.abs,
+    'clip_lower': np.maximum,
+    'maximum': lambda *xs: np.fmax.reduce(np.broadcast_arrays(*xs)),
+    'diff': _diff,
+    'shift': _shift,
+    'rolling_sum': _rolling_sum,
+    'rolling_mean': _rolling_mean,
+    'rolling_std': _rolling_std,
+    'ema': _ema,
+    'wilder': _wilder,
+}
+
+
+# ==================== 指标注册 ====================
+
+INDICATORS: Dict[str, Callable[..., Dict[str, Expr]]] = {}
+
+
+def register_indicator(name: str):
+    """
+    注册指标
+
+    被装饰的函数接收指标参数，返回 输出名 -> 表达式 的字典
+    """
+    def decorator(builder):
+        INDICATORS[name] = builder
+        return builder
+    return decorator
+
+
+@register_indicator('boll')
+def boll(period: int = 20, std_dev: float = 2.0) -> Dict[str, Expr]:
+    close = col('close')
+    middle = sma(close, period)
+    band = rolling_std(close, period) * float(std_dev)
+    upper, lower = middle + band, middle - band
+    return {
+        'boll_upper': upper,
+        'boll_middle': middle,
+        'boll_lower': lower,
+        'boll_position': (close - lower) / (upper - lower) * 100.0
+    }
+
+
+@register_indicator('rsi')
+def rsi(period: int = 14, wilder_smoothing: bool = False) -> Dict[str, Expr]:
+    delta = diff(col('close'))
+    gain, loss = clip_lower(delta), clip_lower(-delta)
+    if wilder_smoothing:
+        avg_gain, avg_loss = wilder(gain, period), wilder(loss, period)
+    else:
+        avg_gain, avg_loss = sma(gain, period), sma(loss, period)
+    return {'rsi': 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)}
+
+
+@register_indicator('sma')
+def sma_indicator(period: int = 20) -> Dict[str, Expr]:
+    return {f'sma_{period}': sma(col('close'), period)}
+
+
+@register_indicator('ema')
+def ema_indicator(span: int = 20) -> Dict[str, Expr]:
+    return {f'ema_{span}': ema(col('close'), span)}
+
+
+@register_indicator('macd')
+def macd(fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, Expr]:
+    close = col('close')
+    line = ema(close, fast) - ema(close, slow)
+    signal_line = ema(line, signal)
+    return {'macd': line, 'macd_signal': signal_line, 'macd_hist': line - signal_line}
+
+
+@register_indicator('atr')
+def atr(period: int = 14) -> Dict[str, Expr]:
+    high, low = col('high'), col('low')
+    prev_close = shift(col('close'))
+    true_range = maximum(high - low, abs_(high - prev_close), abs_(low - prev_close))
+    return {'atr': wilder(true_range, period)}
+
+
+# ==================== 求值 ====================
+
+Spec = Union[str, Tuple[str, Mapping]]
+
+
+class Plan:
+    """
+    一组指标的求值计划：按拓扑顺序排列的去重节点
+
+    计划与数据无关，可以构造一次后每个周期重复执行
+    """
+
+    def __init__(self, specs: Sequence[Spec]):
+        """
+        Args:
+            specs: 指标列表，每项为指标名或 (指标名, 参数字典)，如
+                [('boll', {'period': 20, 'std_dev': 2.0}), ('rsi', {'period': 14}), 'macd']
+        """
+        self.outputs: Dict[str, Expr] = {}
+        for spec in specs:
+            name, params = (spec, {}) if isinstance(spec, str) else spec
+            if name not in INDICATORS:
+                raise KeyError(f'未注册的指标: {name}')
+            for output, expr in INDICATORS[name](**params).items():
+                if output in self.outputs and self.outputs[output].key != expr.key:
+                    raise ValueError(f'指标输出重名: {output}（同一指标不同参数请分开构造计划）')
+                self.outputs[output] = expr
+
+        self.nodes: List[Expr] = []
+        visited = set()
+
+        def visit(expr: Expr):
+            if expr.key in visited:
+                return
+            visited.add(expr.key)
+            for child in expr.inputs:
+                visit(child)
+            self.nodes.append(expr)
+
+        for expr in self.outputs.values():
+            visit(expr)
+
+    @property
+    def columns(self) -> List[str]:
+        """需要的输入列"""
+        return [node.args[0] for node in self.nodes if node.op == 'col']
+
+    def run(self, data: Union[Mapping[str, np.ndarray], CandleBuffer]) -> Dict[str, np.ndarray]:
+        """
+        执行计划
+
+        Args:
+            data: 列名 -> 数组，或K线环形缓冲区
+
+        Returns:
+            输出名 -> 数组
+        """
+        values: Dict[tuple, np.ndarray] = {}
+        for node in self.nodes:
+            if node.op == 'col':
+                column = data.column(node.args[0]) if isinstance(data, CandleBuffer) else data[node.args[0]]
+                values[node.key] = np.asarray(column, dtype=np.float64)
+                continue
+            args = [values[arg.key] if isinstance(arg, Expr) else arg for arg in node.args]
+            values[node.key] = PRIMITIVES[node.op](*args)
+        return {name: values[expr.key] for name, expr in self.outputs.items()}
+
+
+def evaluate(data: Union[Mapping[str, np.ndarray], CandleBuffer], specs: Sequence[Spec]) -> Dict[str, np.ndarray]:
+    """构造计划并立即执行"""
+    return Plan(specs).run(data)
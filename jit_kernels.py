@@ -0,0 +1,213 @@
+"""
+递推计算内核 - Wilder平滑、EMA和持仓状态机
+
+这些计算每一步都依赖上一步的结果，无法直接用NumPy向量化。安装了numba时使用JIT编译的
+逐根循环（cache=True，编译结果缓存到磁盘，只在第一次调用时编译；模块只在回测等需要时导入，
+不影响 run_once.py 的启动）；否则使用纯NumPy实现，结果一致
+（状态机完全相同，递推的浮点误差在1e-9以内）。
+
+环境变量 ETH_MONITOR_KERNELS=numpy 可强制使用纯NumPy实现。
+"""
+import os
+from typing import Tuple
+
+import numpy as np
+
+try:
+    if os.environ.get('ETH_MONITOR_KERNELS', '').lower() == 'numpy':
+        raise ImportError
+    import numba
+except ImportError:
+    numba = None
+
+BACKEND = 'numba' if numba is not None else 'numpy'
+
+# 状态机输出的信号编码
+SIGNAL_NEUTRAL = 0
+SIGNAL_LONG = 1
+SIGNAL_SHORT = 2
+SIGNAL_EXIT_LONG = 3
+SIGNAL_EXIT_SHORT = 4
+
+# 持仓状态（最近一次开仓信号的方向）
+POSITION_NONE = 0
+POSITION_LONG = 1
+POSITION_SHORT = -1
+
+
+# ==================== 逐根循环实现（numba编译的对象，也是测试中的参考实现） ====================
+
+def _linear_recurrence_loop(x, a, b, y0):
+    y = np.empty(len(x))
+    prev = y0
+    for k in range(len(x)):
+        prev = a * prev + b * x[k]
+        y[k] = prev
+    return y
+
+
+def _position_states_loop(close, upper, middle, lower, initial):
+    n = len(close)
+    codes = np.zeros(n, dtype=np.int8)
+    strength = np.zeros(n)
+    position = initial
+    for i in range(n):
+        price = close[i]
+        if price <= lower[i]:
+            codes[i] = SIGNAL_LONG
+            strength[i] = min(100.0, (lower[i] - price) / price * 100 * 20 + 50)
+            position = POSITION_LONG
+        elif price >= upper[i]:
+            codes[i] = SIGNAL_SHORT
+            strength[i] = min(100.0, (price - upper[i]) / price * 100 * 20 + 50)
+            position = POSITION_SHORT
+        elif position == POSITION_LONG and price >= middle[i]:
+            codes[i] = SIGNAL_EXIT_LONG
+            strength[i] = 50.0
+            position = POSITION_NONE
+        elif position == POSITION_SHORT and price <= middle[i]:
+            codes[i] = SIGNAL_EXIT_SHORT
+            strength[i] = 50.0
+            position = POSITION_NONE
+    return codes, strength, position
+
+
+if numba is not None:
+    _linear_recurrence_jit = numba.njit(cache=True)(_linear_recurrence_loop)
+    _position_states_jit = numba.njit(cache=True)(_position_states_loop)
+
+
+# ==================== 纯NumPy实现 ====================
+
+def _linear_recurrence_numpy(x: np.ndarray, a: float, b: float, y0: float) -> np.ndarray:
+    """
+    计算 y[k] = a * y[k-1] + b * x[k]（y[-1] = y0，0 <= a < 1）
+
+    分块求闭式解：块内 y[k] = a^(k+1) * y_prev + b * a^k * cumsum(x[j] * a^-j)，
+    块长按 a^-(B-1) <= 1e3 选取以保证精度，块之间只需逐块传递一个标量
+    """
+    if a == 0:
+        return b * x
+    n = len(x)
+    block = int(min(64, max(1, np.log(1e3) / -np.log(a) + 1)))
+    steps = np.arange(block)
+    blocks = -(-n // block)
+
+    padded = np.zeros(blocks * block)
+    padded[:n] = x
+    rows = padded.reshape(blocks, block)
+    local = b * a ** steps * np.cumsum(rows * a ** -steps, axis=1)
+
+    carry_powers = a ** (steps + 1)
+    carry = y0
+    for i in range(blocks):
+        rows[i] = local[i] + carry_powers * carry
+        carry = rows[i, -1]
+    return padded[:n]
+
+
+def _position_states_numpy(close, upper, middle, lower, initial):
+    """
+    向量化的持仓状态机
+
+    开仓信号与状态无关；两次开仓之间（一段）只可能出现一次平仓信号：
+    段内第一根满足该方向平仓条件的K线。段的方向由段首的开仓信号决定，
+    第一段的方向为初始持仓
+    """
+    n = len(close)
+    with np.errstate(invalid='ignore'):
+        is_long = close <= lower
+        is_short = ~is_long & (close >= upper)
+        above_middle = close >= middle
+        below_middle = close <= middle
+    opens = is_long | is_short
+
+    # 每根K线所在段的段首下标（-1表示尚未出现开仓信号）及该段的方向
+    index = np.where(opens, np.arange(n), -1)
+    segment = np.maximum.accumulate(index) if n else index
+    direction = np.where(segment >= 0,
+                         np.where(is_long[np.maximum(segment, 0)], POSITION_LONG, POSITION_SHORT),
+                         initial)
+
+    candidate = ~opens & (((direction == POSITION_LONG) & above_middle) |
+                          ((direction == POSITION_SHORT) & below_middle))
+    # 段内第一个候选：段内候选计数为1
+    counts = np.cumsum(candidate)
+    before_segment = np.where(segment >= 0, counts[np.maximum(segment, 0)], 0)
+    exits = candidate & (counts - before_segment == 1)
+
+    codes = np.zeros(n, dtype=np.int8)
+    codes[is_long] = SIGNAL_LONG
+    codes[is_short] = SIGNAL_SHORT
+    codes[exits & (direction == POSITION_LONG)] = SIGNAL_EXIT_LONG
+    codes[exits & (direction == POSITION_SHORT)] = SIGNAL_EXIT_SHORT
+
+    strength = np.zeros(n)
+    strength[is_long] = np.minimum(100.0, (lower[is_long] - close[is_long]) / close[is_long] * 100 * 20 + 50)
+    strength[is_short] = np.minimum(100.0, (close[is_short] - upper[is_short]) / close[is_short] * 100 * 20 + 50)
+    strength[exits] = 50.0
+
+    # 最终持仓：最后一段的方向，若该段已平仓则为空仓
+    if n == 0:
+        return codes, strength, initial
+    last_segment = segment[-1]
+    exited = exits[max(last_segment, 0):].any()
+    final = POSITION_NONE if exited else int(direction[-1])
+    return codes, strength, final
+
+
+# ==================== 对外接口 ====================
+
+def linear_recurrence(x: np.ndarray, a: float, b: float, y0: float) -> np.ndarray:
+    """y[k] = a * y[k-1] + b * x[k]，y[-1] = y0"""
+    x = np.ascontiguousarray(x, dtype=np.float64)
+    if numba is not None:
+        return _linear_recurrence_jit(x, float(a), float(b), float(y0))
+    return _linear_recurrence_numpy(x, a, b, y0)
+
+
+def wilder_smooth(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Wilder平滑：第period-1项为前period项的均值，之后 avg[i] = avg[i-1] + (x[i] - avg[i-1]) / period
+
+    Returns:
+        与values等长的数组，前period-1项为NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if len(values) < period:
+        return result
+    result[period - 1] = values[:period].mean()
+    result[period:] = linear_recurrence(values[period:], (period - 1) / period, 1 / period, result[period - 1])
+    return result
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """指数移动平均（alpha = 2 / (span + 1)，以第一个值为起点，与pandas ewm(adjust=False)一致）"""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty(len(values))
+    if len(values) == 0:
+        return result
+    alpha = 2 / (span + 1)
+    result[0] = values[0]
+    result[1:] = linear_recurrence(values[1:], 1 - alpha, alpha, values[0])
+    return result
+
+
+def position_states(close: np.ndarray, upper: np.ndarray, middle: np.ndarray, lower: np.ndarray,
+                    initial: int = POSITION_NONE) -> Tuple[np.ndarray, np.ndarray, int]:
+    """
+    按 SignalDetector.detect_signal 的规则逐根推进持仓状态
+
+    Args:
+        close, upper, middle, lower: 收盘价和布林带数组
+        initial: 第一根K线之前的持仓（POSITION_NONE/POSITION_LONG/POSITION_SHORT）
+
+    Returns:
+        (信号编码数组 int8, 信号强度数组（未四舍五入）, 最后的持仓)
+    """
+    arrays = [np.ascontiguousarray(values, dtype=np.float64) for values in (close, upper, middle, lower)]
+    if numba is not None:
+        codes, strength, final = _position_states_jit(*arrays, int(initial))
+        return codes, strength, int(final)
+    return _position_states_numpy(*arrays, int(initial))
@@ -0,0 +1,201 @@
+"""
+K线推送模块 - 通过交易所WebSocket订阅K线，实时维护内存中的K线窗口
+"""
+import asyncio
+import inspect
+import json
+import websockets
+from typing import Callable, List, Optional, Tuple
+
+from data_fetcher import DataFetcher
+
+
+class BinanceKlineProtocol:
+    """币安K线频道"""
+
+    url = 'wss://stream.binance.com:9443/ws'
+
+    def subscribe_message(self, symbol: str, timeframe: str) -> dict:
+        stream = f"{symbol.replace('/', '').lower()}@kline_{timeframe}"
+        return {'method': 'SUBSCRIBE', 'params': [stream], 'id': 1}
+
+    def parse(self, message: dict) -> Optional[Tuple[list, bool]]:
+        """
+        解析推送消息
+
+        Returns:
+            (ccxt格式K线, 是否已收盘)，非K线消息返回None
+        """
+        if message.get('e') != 'kline':
+            return None
+        k = message['k']
+        candle = [int(k['t']), float(k['o']), float(k['h']), float(k['l']), float(k['c']), float(k['v'])]
+        return candle, bool(k['x'])
+
+
+class OkxKlineProtocol:
+    """OKX K线频道"""
+
+    url = 'wss://ws.okx.com:8443/ws/v5/business'
+
+    def subscribe_message(self, symbol: str, timeframe: str) -> dict:
+        # OKX周期写法: 1m, 1H, 4H, 1D
+        unit = timeframe[-1]
+        channel = 'candle' + (timeframe if unit == 'm' else timeframe[:-1] + unit.upper())
+        return {'op': 'subscribe', 'args': [{'channel': channel, 'instId': symbol.replace('/', '-')}]}
+
+    def parse(self, message: dict) -> Optional[Tuple[list, bool]]:
+        data = message.get('data')
+        if not data or not message.get('arg', {}).get('channel', '').startswith('candle'):
+            return None
+        row = data[0]
+        candle = [int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5])]
+        return candle, row[8] == '1'
+
+
+PROTOCOLS = {
+    'binance': BinanceKlineProtocol,
+    'okx': OkxKlineProtocol
+}
+
+
+class KlineStream:
+    """
+    WebSocket K线流
+
+    连接后先订阅K线频道，再通过REST补齐断线期间缺失的K线，之后每收到一条推送
+    就更新内存窗口并调用 on_candle(candles, closed)。连接断开时按指数退避重连并重新订阅。
+    """
+
+    def __init__(self, symbol: str, timeframe: str, on_candle: Callable,
+                 data_fetcher: DataFetcher = None, exchange_id: str = 'binance',
+                 window: int = 100, url: str = None, proxy_url: str = None,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        """
+        初始化K线流
+
+        Args:
+            symbol: 交易对，如 'ETH/USDT'
+            timeframe: 时间周期，如 '1m', '15m', '1h'
+            on_candle: 回调 on_candle(candles, closed)，可以是普通函数或协程函数
+            data_fetcher: 用于补齐缺口的REST数据获取器，为None时不补齐
+            exchange_id: 交易所ID，决定订阅消息和推送格式（见 PROTOCOLS，不支持时抛出ValueError）
+            window: 内存中保留的K线数量
+            url: WebSocket地址，默认使用交易所公共地址（测试时可指向本地服务）
+            proxy_url: 代理地址
+            reconnect_delay: 首次重连等待秒数
+            max_reconnect_delay: 最大重连等待秒数
+        """
+        self.symbol = symbol
+        self.timeframe = timeframe
+        self.on_candle = on_candle
+        self.data_fetcher = data_fetcher
+        if exchange_id not in PROTOCOLS:
+            raise ValueError(f"不支持 {exchange_id} 的K线推送，可用: {', '.join(PROTOCOLS)}")
+        self.protocol = PROTOCOLS[exchange_id]()
+        self.window = window
+        self.url = url or self.protocol.url
+        self.proxy_url = proxy_url
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.candles: List[list] = []
+        self.connections = 0
+        self._stopped = False
+
+    def stop(self) -> None:
+        """停止推送（当前连接处理完正在接收的消息后退出）"""
+        self._stopped = True
+
+    def apply(self, candle: list) -> bool:
+        """
+        把一根K线合并进窗口
+
+        Returns:
+            窗口是否发生变化（早于窗口的旧K线会被忽略）
+        """
+        if self.candles and candle[0] < self.candles[0][0]:
+            return False
+        if self.candles and candle[0] <= self.candles[-1][0]:
+            for i in range(len(self.candles) - 1, -1, -1):
+                if self.candles[i][0] == candle[0]:
+                    self.candles[i] = candle
+                    return True
+            return False
+        self.candles.append(candle)
+        del self.candles[:-self.window]
+        return True
+
+    async def _emit(self, closed: bool) -> None:
+        """调用回调；回调出错只记录日志，不中断推送"""
+        try:
+            result = self.on_candle(self.candles, closed)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"❌ K线回调出错: {e}")
+
+    def _parse(self, raw) -> Optional[Tuple[list, bool]]:
+        """解析一条推送；非JSON的帧（如OKX的文本pong）和格式不符的消息返回None"""
+        try:
+            message = json.loads(raw)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(message, dict):
+            return None
+        try:
+            return self.protocol.parse(message)
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            print(f"⚠️ 忽略无法解析的K线消息: {e}")
+            return None
+
+    async def _backfill(self) -> None:
+        """通过REST补齐缺失的K线（在线程池中执行同步请求）"""
+        if self.data_fetcher is None:
+            return
+        loop = asyncio.get_running_loop()
+        ohlcv = await loop.run_in_executor(
+            None,
+            lambda: self.data_fetcher.fetch_ohlcv(self.symbol, self.timeframe,
+                                                  limit=self.window, incremental=True)
+        )
+        if not ohlcv:
+            return
+        for candle in ohlcv:
+            self.apply(list(candle))
+        await self._emit(False)
+
+    async def run(self) -> None:
+        """运行推送循环，直到调用 stop()"""
+        delay = self.reconnect_delay
+        while not self._stopped:
+            try:
+                connect_kwargs = {'ping_interval': 20}
+                if self.proxy_url:
+                    connect_kwargs['proxy'] = self.proxy_url
+                async with websockets.connect(self.url, **connect_kwargs) as ws:
+                    self.connections += 1
+                    await ws.send(json.dumps(self.protocol.subscribe_message(self.symbol, self.timeframe)))
+                    print(f"✅ 已订阅 {self.symbol} {self.timeframe} K线推送")
+
+                    # 订阅后再补齐，期间到达的推送会缓存在连接中，不会丢失
+                    await self._backfill()
+                    delay = self.reconnect_delay
+
+                    async for raw in ws:
+                        parsed = self._parse(raw)
+                        if parsed is None:
+                            continue
+                        candle, closed = parsed
+                        if self.apply(candle):
+                            await self._emit(closed)
+                        if self._stopped:
+                            break
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                print(f"⚠️ K线推送连接断开: {e}")
+
+            if self._stopped:
+                break
+            print(f"🔄 {delay:g}秒后重连...")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
@@ -7,6 +7,10 @@ import time
 import sys
 from datetime import datetime
 
+from candle_buffer import CandleBuffer
+from candle_store import CandleStore
+from markets_cache import MarketsCache
+from rate_limiter import PRIORITY_CRITICAL, RateLimitScheduler
 from data_fetcher import DataFetcher
 from indicator import calculate_all_indicators, get_latest_indicators
 from signal_detector import SignalDetector
@@ -87,6 +91,89 @@ def print_status(symbol: str, indicators: dict, signal: dict):
     print("-" * 80)
 
 
+def evaluate(config: dict, candles: CandleBuffer, signal_detector: SignalDetector) -> tuple:
+    """计算指标并检测信号，返回 (最新指标, 信号)"""
+    # 计算指标（只需要最新一根K线）
+    series = calculate_all_indicators(
+        candles,
+        boll_period=config['boll']['period'],
+        boll_std=config['boll']['std_dev'],
+        rsi_period=config['rsi']['period'],
+        tail=1
+    )
+    
+    # 获取最新指标
+    indicators = get_latest_indicators(series)
+    
+    # 检测信号
+    signal = signal_detector.detect_signal(indicators)
+    
+    return indicators, signal
+
+
+def report(config: dict, indicators: dict, signal: dict, signal_detector: SignalDetector):
+    """打印状态、发送告警并记录信号"""
+    # 打印状态
+    print_status(config['symbol'], indicators, signal)
+    
+    # 发送告警(仅在有信号时)
+    signal_detector.send_alert(
+        symbol=config['symbol'],
+        signal=signal,
+        via_telegram=True,
+        via_console=False  # 已经在上面打印了
+    )
+    
+    # 记录信号到历史(包括中性信号)
+    signal_detector.record_signal(
+        symbol=config['symbol'],
+        signal=signal
+    )
+
+
+def run_stream_monitor(config: dict, data_fetcher: DataFetcher, signal_detector: SignalDetector):
+    """
+    WebSocket推送模式: 每收到一次K线更新就检测信号
+    
+    每次更新都会推进信号状态，但只在信号类型变化或K线收盘时输出和记录，
+    同一根K线上相同类型的信号只告警一次，避免推送刷屏。
+    指标增量计算，每次推送的开销与窗口长度无关
+    """
+    import asyncio
+    from incremental_indicator import IncrementalIndicators
+    from kline_stream import KlineStream
+    
+    last_reported = {}
+    tracker = IncrementalIndicators(
+        boll_period=config['boll']['period'],
+        boll_std=config['boll']['std_dev'],
+        rsi_period=config['rsi']['period']
+    )
+    
+    def on_candle(candles, closed):
+        try:
+            candle_ts = candles[-1][0]
+            indicators = tracker.extend(candles)
+            signal = signal_detector.detect_signal(indicators)
+            if closed or last_reported.get(candle_ts) != signal['signal_type']:
+                last_reported.clear()
+                last_reported[candle_ts] = signal['signal_type']
+                report(config, indicators, signal, signal_detector)
+                signal_detector.save_history()
+        except Exception as e:
+            print(f"❌ 发生错误: {e}")
+    
+    stream = KlineStream(
+        symbol=config['symbol'],
+        timeframe=config['timeframe'],
+        on_candle=on_candle,
+        data_fetcher=data_fetcher,
+        exchange_id=data_fetcher.exchange_id,
+        proxy_url=config['proxy'] or None
+    )
+    asyncio.run(stream.run())
+
+
 def run_monitor():
     """运行监控主循环"""
     # 加载配置
@@ -96,13 +183,21 @@ def run_monitor():
     print_header(config)
     
     # 初始化模块
-    data_fetcher = DataFetcher(proxy_url=config['proxy'])
+    data_fetcher = DataFetcher(
+        proxy_url=config['proxy'],
+        exchange_id=config.get('exchanges', 'binance'),
+        candle_store=CandleStore(config.get('candle_store_dir', 'data/candles')),
+        markets_cache=MarketsCache(config.get('markets_cache_dir', 'data/markets')),
+        rate_limiter=RateLimitScheduler(config.get('rate_limit_dir', 'data/ratelimit')),
+        priority=PRIORITY_CRITICAL
+    )
     signal_detector = SignalDetector(
         rsi_overbought=config['rsi']['overbought'],
         rsi_oversold=config['rsi']['oversold'],
         telegram_token=config['telegram'].get('bot_token'),
         telegram_chat_id=config['telegram'].get('chat_id'),
-        proxy_url=config['proxy']
+        proxy_url=config['proxy'],
+        default_symbol=config['symbol']
     )
     
     # 加载历史信号(恢复持仓状态)
@@ -116,55 +211,49 @@ def run_monitor():
     
     print("✅ 连接成功,开始监控...\n")
     
-    # 主循环
+    # WebSocket推送模式（交易所不支持K线推送时退回轮询）
+    stream = config.get('stream')
+    if stream:
+        from kline_stream import PROTOCOLS
+        if data_fetcher.exchange_id not in PROTOCOLS:
+            print(f"⚠️ {data_fetcher.exchange_id} 不支持K线推送（支持: {', '.join(PROTOCOLS)}），改为轮询模式\n")
+            stream = False
+    if stream:
+        try:
+            run_stream_monitor(config, data_fetcher, signal_detector)
+        except KeyboardInterrupt:
+            print("\n\n👋 监控已停止")
+            signal_detector.save_history()
+            print("💾 信号历史已保存到 signals_history.json")
+        return
+    
+    # 主循环（K线保存在定长缓冲区中，每轮只追加或更新变化的K线）
     loop_count = 0
+    buffer = CandleBuffer(capacity=100)
     try:
         while True:
             loop_count += 1
             
             try:
                 # 获取K线数据
-                df = data_fetcher.fetch_kline_data(
+                ohlcv = data_fetcher.fetch_ohlcv(
                     symbol=config['symbol'],
                     timeframe=config['timeframe'],
-                    limit=100  # 获取足够的数据来计算指标
+                    limit=100,  # 获取足够的数据来计算指标
+                    incremental=True  # 只拉取上次之后变化的K线
                 )
                 
-                if df is None:
+                if ohlcv is None:
                     print("⚠️ 获取数据失败,等待下次刷新...")
                     time.sleep(config['check_interval'])
                     continue
                 
-                # 计算指标
-                df = calculate_all_indicators(
-                    df,
-                    boll_period=config['boll']['period'],
-                    boll_std=config['boll']['std_dev'],
-                    rsi_period=config['rsi']['period']
-                )
-                
-                # 获取最新指标
-                indicators = get_latest_indicators(df)
-                
-                # 检测信号
-                signal = signal_detector.detect_signal(indicators)
-                
-                # 打印状态
-                print_status(config['symbol'], indicators, signal)
-                
-                # 发送告警(仅在有信号时)
-                signal_detector.send_alert(
-                    symbol=config['symbol'],
-                    signal=signal,
-                    via_telegram=True,
-                    via_console=False  # 已经在上面打印了
-                )
+                # 计算指标、检测信号
+                buffer.extend(ohlcv)
+                indicators, signal = evaluate(config, buffer, signal_detector)
                 
-                # 记录信号到历史(包括中性信号)
-                signal_detector.record_signal(
-                    symbol=config['symbol'],
-                    signal=signal
-                )
+                # 打印状态、告警并记录
+                report(config, indicators, signal, signal_detector)
                 
                 # 每10次循环保存一次历史
                 if loop_count % 10 == 0:
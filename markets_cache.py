@@ -0,0 +1,72 @@
+"""
+市场信息缓存模块 - 把交易所的 markets/currencies 保存到本地，避免每次启动都执行 load_markets
+"""
+import json
+import os
+import time
+
+from ccxt_loader import ccxt_version
+
+
+# 缓存文件格式版本，格式变化时递增使旧缓存失效
+CACHE_FORMAT_VERSION = 1
+
+
+class MarketsCache:
+    """
+    交易所市场信息缓存
+
+    每个交易所一个JSON文件: <cache_dir>/<交易所>.json，
+    文件中记录格式版本和ccxt版本，任一不一致或超过有效期都视为失效
+    """
+
+    def __init__(self, cache_dir: str = 'data/markets', ttl: float = 24 * 3600):
+        """
+        初始化市场信息缓存
+
+        Args:
+            cache_dir: 缓存目录
+            ttl: 有效期（秒），默认1天
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, exchange_id: str) -> str:
+        return os.path.join(self.cache_dir, f'{exchange_id}.json')
+
+    def load(self, exchange_id: str, exchange) -> bool:
+        """
+        从缓存加载市场信息到ccxt交易所对象
+
+        Returns:
+            加载成功返回True；缓存不存在、失效或损坏返回False
+        """
+        try:
+            with open(self._path(exchange_id), 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if (cached.get('version') != CACHE_FORMAT_VERSION
+                or cached.get('ccxt_version') != ccxt_version()
+                or time.time() - cached.get('saved_at', 0) > self.ttl
+                or not cached.get('markets')):
+            return False
+
+        exchange.set_markets(cached['markets'], cached.get('currencies'))
+        return True
+
+    def save(self, exchange_id: str, exchange) -> None:
+        """把ccxt交易所对象中已加载的市场信息写入缓存（先写临时文件再替换，避免读到半个文件）"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(exchange_id)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': CACHE_FORMAT_VERSION,
+                'ccxt_version': ccxt_version(),
+                'saved_at': time.time(),
+                'markets': exchange.markets,
+                'currencies': exchange.currencies
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,450 @@
+"""
+参数优化工具 - 用多进程在历史K线上扫描BOLL参数网格，支持滚动(walk-forward)训练/测试切分，可断点续跑
+
+时间戳和收盘价只写入一次共享内存，工作进程按名称映射为NumPy数组（不复制），任务只传递区间和参数的小元组；
+每个任务负责一个 (切分, 训练/测试, BOLL周期, 一组标准差倍数)，该周期下的所有标准差倍数由
+compute_indicator_grid 一次算出。完成的任务写入进度文件，中断后重新运行同样的命令只计算剩余任务。
+
+RSI在当前策略中只作为参考、不影响信号，所以 rsi 的周期和超买/超卖阈值不参与扫描
+
+用法示例:
+    python optimizer.py --symbol ETH/USDT --timeframe 1m --resample 15m \\
+        --periods 10:60:5 --std-devs 1.5:3.0:0.25 --folds 4 --train-ratio 0.75 --workers 32
+    python optimizer.py --csv eth_1m.csv --folds 0 --metric calmar --output ranked.csv
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backtest import DEFAULT_FEE_RATE, add_data_arguments, load_candles, simulate
+from indicator_grid import compute_indicator_grid
+
+METRICS = ('total_return', 'calmar', 'hit_rate', 'profit_factor')
+ROW_FIELDS = ('boll_period', 'boll_std', 'trades', 'wins', 'hit_rate', 'total_return', 'max_drawdown',
+              'profit_factor', 'exposure')
+# 任务数少于 工作进程数 × TASKS_PER_WORKER 时把标准差倍数拆成多组，保证每个进程都有活干
+TASKS_PER_WORKER = 4
+# 进度文件最短保存间隔（秒）
+SAVE_INTERVAL = 2.0
+
+# 工作进程中映射好的共享数组: 名称 -> 数组
+_SHARED: Dict[str, np.ndarray] = {}
+_SHARED_BLOCKS: List[shared_memory.SharedMemory] = []
+
+
+# ==================== 参数和切分 ====================
+
+def parse_grid(value: str) -> List[float]:
+    """
+    解析参数网格: 'start:stop:step'（包含stop）或逗号分隔的列表，如 '10:60:5'、'1.5,2,2.5'
+    """
+    try:
+        if ':' in value:
+            start, stop, step = (float(part) for part in value.split(':'))
+            if step <= 0:
+                raise ValueError
+            count = int(math.floor((stop - start) / step + 1e-9)) + 1
+            values = [round(start + i * step, 10) for i in range(max(count, 0))]
+        else:
+            values = [float(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'无法解析参数网格: {value}') from None
+    if not values:
+        raise argparse.ArgumentTypeError(f'参数网格为空: {value}')
+    return values
+
+
+def walk_forward_splits(n: int, folds: int, train_ratio: float = 0.75) -> List[Tuple[int, int, int, int]]:
+    """
+    滚动训练/测试切分
+
+    每个切分的窗口长度相同，训练段占 train_ratio，测试段紧跟在训练段之后；
+    各切分的测试段首尾相接，最后一个测试段结束于最后一根K线。folds <= 0 时只有一个覆盖全部K线的训练段
+
+    Returns:
+        [(train_lo, train_hi, test_lo, test_hi), ...]
+    """
+    if folds <= 0:
+        return [(0, n, n, n)]
+    if not 0 < train_ratio < 1:
+        raise ValueError(f'train_ratio 必须在0和1之间: {train_ratio}')
+    window = n / (1 + (folds - 1) * (1 - train_ratio))
+    test_len = window * (1 - train_ratio)
+    splits = []
+    for fold in range(folds):
+        train_lo = int(round(fold * test_len))
+        test_lo = int(round(fold * test_len + window * train_ratio))
+        test_hi = n if fold == folds - 1 else int(round(fold * test_len + window))
+        splits.append((train_lo, test_lo, test_lo, test_hi))
+    return splits
+
+
+def plan_tasks(splits: Sequence[Tuple[int, int, int, int]], periods: Sequence[int], std_devs: Sequence[float],
+               fee_rate: float, workers: int = 1) -> List[tuple]:
+    """
+    生成任务列表，每个任务为 (键, lo, hi, warm, BOLL周期, 标准差倍数元组, 手续费率)
+
+    测试段向前多取 warm 根K线预热指标（只在 lo 之后交易）；长的任务排在前面，减少最后的等待
+    """
+    segments = [(fold, name, lo, hi) for fold, split in enumerate(splits)
+                for name, lo, hi in (('train', split[0], split[1]), ('test', split[2], split[3])) if hi > lo]
+    groups = min(len(std_devs), max(1, math.ceil(workers * TASKS_PER_WORKER / max(len(segments) * len(periods), 1))))
+    chunks = [tuple(chunk.tolist()) for chunk in np.array_split(np.asarray(std_devs, dtype=np.float64), groups)]
+
+    tasks = []
+    for fold, name, lo, hi in segments:
+        for period in periods:
+            warm = min(lo, int(period) - 1) if name == 'test' else 0
+            for chunk in chunks:
+                key = f"{fold}|{name}|{int(period)}|{','.join(repr(value) for value in chunk)}"
+                tasks.append((key, lo, hi, warm, int(period), chunk, fee_rate))
+    tasks.sort(key=lambda task: task[2] - task[1] + task[3], reverse=True)
+    return tasks
+
+
+# ==================== 共享内存和工作进程 ====================
+
+class SharedArrays:
+    """
+    把一组数组复制到共享内存（每个数组一块），工作进程用 spec 按名称映射
+
+    创建者负责 close()（释放并删除共享内存），可用作上下文管理器
+    """
+
+    def __init__(self, arrays: Mapping[str, np.ndarray]):
+        self._blocks: List[shared_memory.SharedMemory] = []
+        self.spec: Dict[str, tuple] = {}
+        try:
+            for name, values in arrays.items():
+                values = np.ascontiguousarray(values)
+                block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(values.shape, values.dtype, buffer=block.buf)[...] = values
+                self.spec[name] = (block.name, values.shape, values.dtype.str)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self) -> 'SharedArrays':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _attach_shared(spec: Mapping[str, tuple]) -> None:
+    """
+    工作进程初始化：映射共享内存中的数组（只读）
+
+    进程池的子进程与创建者共用同一个resource_tracker，这里打开时的登记不会重复，删除仍由创建者负责
+    """
+    for name, (block_name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _SHARED_BLOCKS.append(block)
+        values = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        values.setflags(write=False)
+        _SHARED[name] = values
+
+
+def evaluate_task(task: tuple) -> Tuple[str, List[Dict]]:
+    """
+    工作进程执行的任务：在 [lo, hi) 上回测一个BOLL周期下的一组标准差倍数
+
+    Returns:
+        (任务键, 每个标准差倍数一行统计)
+    """
+    key, lo, hi, warm, period, std_devs, fee_rate = task
+    timestamps = _SHARED['timestamp'][lo:hi]
+    close = _SHARED['close'][lo - warm:hi]
+    grid = compute_indicator_grid(close, [period], std_devs, [14])
+
+    rows = []
+    for index, std_dev in enumerate(std_devs):
+        series = {name: values[warm:] for name, values in grid.select(0, index, 0).items()}
+        series['close'] = close[warm:]
+        stats = simulate(timestamps, series, fee_rate).stats
+        row = {name: stats[name] for name in ROW_FIELDS[2:]}
+        row.update(boll_period=period, boll_std=std_dev)
+        rows.append(row)
+    return key, rows
+
+
+# ==================== 进度文件 ====================
+
+class ResultCheckpoint:
+    """优化进度文件: {'config': 数据和设置, 'tasks': 任务键 -> 结果行}；设置不同时从头开始"""
+
+    def __init__(self, path: Optional[str], config: Dict):
+        self.path = path
+        self.config = config
+        self.tasks: Dict[str, List[Dict]] = {}
+        self._saved_at = 0.0
+        if not path:
+            return
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        if saved.get('config') == config:
+            self.tasks = saved.get('tasks', {})
+        else:
+            print(f"⚠️  {path} 中的进度来自不同的K线或设置，重新开始")
+
+    def add(self, key: str, rows: List[Dict]) -> None:
+        self.tasks[key] = rows
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'config': self.config, 'tasks': self.tasks}, f)
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.monotonic()
+
+
+# ==================== 汇总 ====================
+
+def score(row: Mapping, metric: str) -> float:
+    """按指标给一行统计打分（越大越好）；calmar = 收益 / 最大回撤"""
+    if metric == 'calmar':
+        if row['max_drawdown'] > 0:
+            return row['total_return'] / row['max_drawdown']
+        return math.inf if row['total_return'] > 0 else 0.0
+    return row[metric]
+
+
+def summarize(tasks: Mapping[str, List[Dict]], folds: int, metric: str = 'total_return',
+              min_trades: int = 10) -> Dict:
+    """
+    汇总全部任务结果
+
+    Returns:
+        {'table': 按样本外平均得分（没有测试段时按训练段）降序排列的参数表，
+                  训练段平均每个切分不足 min_trades 笔交易的参数排在最后,
+         'picks': 每个切分在训练段上得分最高的参数及其测试段表现,
+         'walk_forward_return': 按各切分选出的参数依次交易测试段的复合收益}
+    """
+    # (周期, 倍数) -> {'train': {fold: row}, 'test': {fold: row}}
+    by_params: Dict[tuple, Dict[str, Dict[int, Dict]]] = {}
+    for key, rows in tasks.items():
+        fold, segment = key.split('|')[:2]
+        for row in rows:
+            params = (row['boll_period'], row['boll_std'])
+            by_params.setdefault(params, {'train': {}, 'test': {}})[segment][int(fold)] = row
+
+    has_test = any(entry['test'] for entry in by_params.values())
+    table = []
+    for (period, std_dev), entry in by_params.items():
+        train, test = list(entry['train'].values()), list(entry['test'].values())
+        summary = {
+            'boll_period': period,
+            'boll_std': std_dev,
+            'train_score': float(np.mean([score(row, metric) for row in train])) if train else math.nan,
+            'train_return': float(np.mean([row['total_return'] for row in train])) if train else math.nan,
+            'train_trades': sum(row['trades'] for row in train)
+        }
+        if has_test:
+            trades = sum(row['trades'] for row in test)
+            summary.update({
+                'test_score': float(np.mean([score(row, metric) for row in test])) if test else math.nan,
+                'test_return': float(np.prod([1 + row['total_return'] for row in test]) - 1) if test else math.nan,
+                'test_max_drawdown': max((row['max_drawdown'] for row in test), default=math.nan),
+                'test_hit_rate': sum(row['wins'] for row in test) / trades if trades else 0.0,
+                'test_trades': trades
+            })
+        table.append(summary)
+    # 训练段交易太少的参数排在后面（例如倍数过大、从不开仓的组合）
+    rank_key = 'test_score' if has_test else 'train_score'
+    train_folds = max(folds, 1)
+    table.sort(key=lambda summary: (summary['train_trades'] >= min_trades * train_folds,
+                                    -math.inf if math.isnan(summary[rank_key]) else summary[rank_key]),
+               reverse=True)
+
+    picks = []
+    walk_forward_equity = 1.0
+    for fold in range(folds if has_test else 0):
+        candidates = [(params, entry) for params, entry in by_params.items()
+                      if fold in entry['train'] and fold in entry['test']]
+        eligible = [item for item in candidates if item[1]['train'][fold]['trades'] >= min_trades] or candidates
+        if not eligible:
+            continue
+        params, entry = max(eligible, key=lambda item: score(item[1]['train'][fold], metric))
+        test_row = entry['test'][fold]
+        walk_forward_equity *= 1 + test_row['total_return']
+        picks.append({'fold': fold, 'boll_period': params[0], 'boll_std': params[1],
+                      'train_score': score(entry['train'][fold], metric),
+                      'test_return': test_row['total_return'], 'test_max_drawdown': test_row['max_drawdown'],
+                      'test_trades': test_row['trades']})
+    return {'table': table, 'picks': picks, 'walk_forward_return': walk_forward_equity - 1 if picks else math.nan}
+
+
+# ==================== 优化入口 ====================
+
+def run_optimizer(candles: Mapping[str, np.ndarray], periods: Sequence[int], std_devs: Sequence[float],
+                  folds: int = 4, train_ratio: float = 0.75, fee_rate: float = DEFAULT_FEE_RATE,
+                  workers: int = None, checkpoint: Optional[str] = None, metric: str = 'total_return',
+                  min_trades: int = 10, progress: bool = True) -> Dict:
+    """
+    扫描参数网格
+
+    Args:
+        candles: 至少包含 timestamp 和 close 的列数组
+        periods: BOLL周期网格
+        std_devs: 标准差倍数网格
+        folds: 滚动切分数，0表示只在全部K线上扫描（没有测试段）
+        train_ratio: 每个切分中训练段所占比例
+        fee_rate: 单边手续费率
+        workers: 工作进程数，默认CPU核数；1 时在当前进程中计算
+        checkpoint: 进度文件路径，None 不保存
+        metric: 排名指标（见 METRICS）
+        min_trades: 选参时训练段至少需要的交易次数
+        progress: 打印进度
+
+    Returns:
+        summarize 的结果，另含 'splits' 和 'evaluated'（本次实际计算的任务数）
+    """
+    if metric not in METRICS:
+        raise ValueError(f'不支持的排名指标: {metric}')
+    timestamps = np.ascontiguousarray(candles['timestamp'], dtype=np.int64)
+    close = np.ascontiguousarray(candles['close'], dtype=np.float64)
+    workers = workers or os.cpu_count() or 1
+    splits = walk_forward_splits(len(close), folds, train_ratio)
+
+    config = {
+        'data': [len(close), int(timestamps[0]) if len(close) else None,
+                 int(timestamps[-1]) if len(close) else None, zlib.crc32(close.tobytes())],
+        'splits': [list(split) for split in splits],
+        'fee_rate': fee_rate
+    }
+    results = ResultCheckpoint(checkpoint, config)
+    tasks = plan_tasks(splits, [int(period) for period in periods], std_devs, fee_rate, workers)
+    pending = [task for task in tasks if task[0] not in results.tasks]
+    if progress:
+        print(f"🧮 {len(periods)} 个周期 × {len(std_devs)} 个倍数，{len(splits)} 个切分，"
+              f"{len(tasks)} 个任务（已完成 {len(tasks) - len(pending)}），{workers} 个进程")
+
+    started = time.perf_counter()
+    done = 0
+    try:
+        if workers <= 1 or len(pending) <= 1:
+            _SHARED.update(timestamp=timestamps, close=close)
+            for task in pending:
+                results.add(*evaluate_task(task))
+                done += 1
+        else:
+            with SharedArrays({'timestamp': timestamps, 'close': close}) as shared, \
+                    ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared,
+                                        initargs=(shared.spec,)) as pool:
+                futures = [pool.submit(evaluate_task, task) for task in pending]
+                for future in as_completed(futures):
+                    results.add(*future.result())
+                    done += 1
+                    if progress and (done % max(1, len(pending) // 20) == 0 or done == len(pending)):
+                        print(f"  ⏳ {done}/{len(pending)} 个任务，{time.perf_counter() - started:.1f}秒")
+    finally:
+        results.save()
+
+    wanted = {task[0] for task in tasks}
+    summary = summarize({key: rows for key, rows in results.tasks.items() if key in wanted},
+                        len(splits) if folds > 0 else 0, metric, min_trades)
+    summary.update(splits=splits, evaluated=done)
+    return summary
+
+
+def print_summary(summary: Dict, metric: str, top: int = 20) -> None:
+    """打印排名表和每个切分选出的参数"""
+    table = summary['table']
+    has_test = bool(table) and 'test_score' in table[0]
+    print("=" * 100)
+    print(f"🏆 参数排名（按{'样本外' if has_test else '全样本'} {metric}）")
+    print("=" * 100)
+    header = f"{'#':>3} {'周期':>4} {'倍数':>5} {'训练得分':>9} {'训练收益':>9} {'训练笔数':>8}"
+    if has_test:
+        header += f" {'测试得分':>9} {'测试收益':>9} {'测试回撤':>8} {'测试胜率':>8} {'测试笔数':>8}"
+    print(header)
+    for rank, row in enumerate(table[:top], 1):
+        line = (f"{rank:>3} {row['boll_period']:>6} {row['boll_std']:>7.2f} {row['train_score']:>13.3f} "
+                f"{row['train_return'] * 100:>12.2f}% {row['train_trades']:>11}")
+        if has_test:
+            line += (f" {row['test_score']:>13.3f} {row['test_return'] * 100:>12.2f}% "
+                     f"{row['test_max_drawdown'] * 100:>11.2f}% {row['test_hit_rate'] * 100:>11.1f}% "
+                     f"{row['test_trades']:>11}")
+        print(line)
+
+    if summary['picks']:
+        print("-" * 100)
+        print("🔁 滚动验证（每个切分用训练段最优参数交易测试段）:")
+        for pick in summary['picks']:
+            print(f"  切分 {pick['fold'] + 1}: BOLL({pick['boll_period']}, {pick['boll_std']:.2f}) "
+                  f"训练得分 {pick['train_score']:.3f} → 测试收益 {pick['test_return'] * 100:+.2f}% "
+                  f"回撤 {pick['test_max_drawdown'] * 100:.2f}% ({pick['test_trades']} 笔)")
+        print(f"  📈 样本外复合收益: {summary['walk_forward_return'] * 100:+.2f}%")
+    print("=" * 100)
+
+
+def write_table(path: str, table: List[Dict]) -> None:
+    """把完整排名表写入CSV"""
+    if not table:
+        return
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['rank'] + list(table[0]))
+        writer.writeheader()
+        for rank, row in enumerate(table, 1):
+            writer.writerow({'rank': rank, **row})
+
+
+def main(argv: List[str] = None):
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='BOLL策略参数优化（多进程网格扫描 + 滚动验证）')
+    add_data_arguments(parser)
+    parser.add_argument('--periods', type=parse_grid, default=parse_grid('10:50:5'), help='BOLL周期网格')
+    parser.add_argument('--std-devs', type=parse_grid, default=parse_grid('1.5:3.0:0.25'), help='标准差倍数网格')
+    parser.add_argument('--folds', type=int, default=4, help='滚动切分数，0表示只做全样本扫描')
+    parser.add_argument('--train-ratio', type=float, default=0.75, help='每个切分中训练段的比例')
+    parser.add_argument('--fee', type=float, default=DEFAULT_FEE_RATE, help='单边手续费率')
+    parser.add_argument('--metric', choices=METRICS, default='total_return', help='排名指标')
+    parser.add_argument('--min-trades', type=int, default=10, help='选参时训练段至少需要的交易次数')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认CPU核数')
+    parser.add_argument('--checkpoint', default='data/optimizer_checkpoint.json', help='进度文件（断点续跑）')
+    parser.add_argument('--output', default=None, help='把完整排名表写入CSV')
+    parser.add_argument('--top', type=int, default=20, help='显示前几名')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    candles = load_candles(args)
+    summary = run_optimizer(candles, [int(period) for period in args.periods], args.std_devs, args.folds,
+                            args.train_ratio, args.fee, args.workers, args.checkpoint, args.metric,
+                            args.min_trades)
+    print_summary(summary, args.metric, args.top)
+    if args.output:
+        write_table(args.output, summary['table'])
+        print(f"💾 排名表已写入 {args.output}")
+    print(f"⚡ 耗时 {time.perf_counter() - started:.1f}秒")
+
+
+if __name__ == '__main__':
+    sys.stdout.reconfigure(encoding='utf-8')
+    main()
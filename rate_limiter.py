@@ -0,0 +1,155 @@
+"""
+限频调度模块 - 按交易所请求权重的令牌桶，通过文件锁在多个线程和进程之间共享额度
+
+main.py、run_once.py、streamlit_app.py 同时运行时共用同一份额度，避免各自按满额请求导致429或IP封禁
+"""
+import json
+import os
+import threading
+import time
+from typing import Dict
+
+try:
+    import fcntl
+
+    def _lock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+except ImportError:  # Windows
+    import msvcrt
+
+    def _lock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock_file(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# 请求优先级
+PRIORITY_CRITICAL = 0   # 信号检测相关请求，可以用完全部额度
+PRIORITY_LOW = 1        # 看板刷新、历史回补等，需要为关键请求保留额度
+
+# 各交易所的额度：桶容量、每秒恢复量和各方法的请求权重（未列出的方法权重为1）
+EXCHANGE_LIMITS = {
+    'binance': {
+        'capacity': 6000,
+        'refill_per_sec': 100,
+        'weights': {'fetch_ohlcv': 2, 'fetch_ticker': 2, 'fetch_tickers': 80,
+                    'load_markets': 20, 'fetch_time': 1}
+    },
+    'okx': {
+        'capacity': 20,
+        'refill_per_sec': 10,
+        'weights': {'load_markets': 5}
+    },
+    'bybit': {
+        'capacity': 120,
+        'refill_per_sec': 20,
+        'weights': {'load_markets': 5}
+    }
+}
+DEFAULT_LIMIT = {'capacity': 10, 'refill_per_sec': 5, 'weights': {}}
+
+
+class RateLimitScheduler:
+    """
+    跨进程共享的令牌桶限频器
+
+    每个交易所一个状态文件 <state_dir>/<交易所>.json，记录剩余令牌和更新时间，
+    读写时持有文件锁；同一进程内的线程再用线程锁串行化。
+    低优先级请求只能使用超出保留比例的额度，关键请求不受影响。
+    """
+
+    def __init__(self, state_dir: str = 'data/ratelimit', low_priority_reserve: float = 0.3,
+                 limits: Dict[str, dict] = None):
+        """
+        初始化限频器
+
+        Args:
+            state_dir: 状态文件目录，共享额度的进程需使用同一目录
+            low_priority_reserve: 为关键请求保留的额度比例
+            limits: 覆盖默认的交易所额度配置
+        """
+        self.state_dir = state_dir
+        self.low_priority_reserve = low_priority_reserve
+        self.limits = dict(EXCHANGE_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self._thread_lock = threading.Lock()
+        os.makedirs(state_dir, exist_ok=True)
+
+    def _limit(self, exchange_id: str) -> dict:
+        return self.limits.get(exchange_id, DEFAULT_LIMIT)
+
+    def weight(self, exchange_id: str, method: str) -> float:
+        """某个方法的请求权重"""
+        return self._limit(exchange_id)['weights'].get(method, 1)
+
+    def _update(self, exchange_id: str, cost: float, floor: float) -> tuple:
+        """
+        在锁内恢复令牌并尝试扣除cost，要求扣除后不低于floor
+
+        Returns:
+            (剩余令牌, 还需等待的秒数)，等待0秒表示已扣除
+        """
+        limit = self._limit(exchange_id)
+        path = os.path.join(self.state_dir, f'{exchange_id}.json')
+        with self._thread_lock:
+            with open(path, 'a+', encoding='utf-8') as f:
+                _lock_file(f)
+                try:
+                    f.seek(0)
+                    try:
+                        state = json.loads(f.read() or '{}')
+                    except ValueError:
+                        state = {}
+                    now = time.time()
+                    tokens = state.get('tokens', limit['capacity'])
+                    elapsed = max(0.0, now - state.get('updated', now))
+                    tokens = min(limit['capacity'], tokens + elapsed * limit['refill_per_sec'])
+
+                    wait_for = 0.0
+                    if tokens - cost >= floor:
+                        tokens -= cost
+                    else:
+                        wait_for = (cost + floor - tokens) / limit['refill_per_sec']
+
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps({'tokens': tokens, 'updated': now}))
+                    f.flush()
+                finally:
+                    _unlock_file(f)
+        return tokens, wait_for
+
+    def acquire(self, exchange_id: str, method: str, priority: int = PRIORITY_CRITICAL,
+                cost: float = None) -> None:
+        """
+        阻塞直到获得一次请求的额度
+
+        Args:
+            exchange_id: 交易所ID
+            method: ccxt方法名，用于查询权重
+            priority: PRIORITY_CRITICAL 或 PRIORITY_LOW
+            cost: 指定权重（默认按方法查表）
+        """
+        if cost is None:
+            cost = self.weight(exchange_id, method)
+        capacity = self._limit(exchange_id)['capacity']
+        floor = capacity * self.low_priority_reserve if priority >= PRIORITY_LOW else 0.0
+        # 权重超过可用额度时按可用额度计，避免永远等不到
+        cost = min(cost, capacity - floor)
+
+        while True:
+            _, wait_for = self._update(exchange_id, cost, floor)
+            if wait_for <= 0:
+                return
+            time.sleep(wait_for)
+
+    def remaining(self, exchange_id: str) -> float:
+        """当前剩余额度（权重）"""
+        return self._update(exchange_id, 0, 0.0)[0]
@@ -0,0 +1,250 @@
+"""
+K线周期合成模块 - 每个交易对只维护一条1分钟基础K线，本地合成5m/15m/1h/4h/1d等周期
+
+切换周期或同时关注多个周期时不再分别向交易所请求，基础K线到来时只重算受影响的最后一根合成K线
+"""
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+from data_fetcher import DataFetcher
+
+
+TIMEFRAME_UNITS = {'m': 60_000, 'h': 3_600_000, 'd': 86_400_000}
+DAY_MS = 86_400_000
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """把 '1m', '4h', '1d' 这类周期转换为毫秒"""
+    try:
+        return int(timeframe[:-1]) * TIMEFRAME_UNITS[timeframe[-1]]
+    except (KeyError, ValueError):
+        raise ValueError(f'不支持的时间周期: {timeframe}') from None
+
+
+def resample_ohlcv(candles: List[list], timeframe_ms: int, drop_partial_head: bool = True) -> List[list]:
+    """
+    把升序的基础K线合成为更大周期的K线（按UTC整点对齐，与交易所一致）
+
+    Args:
+        candles: [[timestamp, open, high, low, close, volume], ...]
+        timeframe_ms: 目标周期毫秒数
+        drop_partial_head: 第一根基础K线不在周期起点时丢弃第一根合成K线（数据不完整）
+
+    Returns:
+        合成后的K线列表，最后一根可能是尚未收盘的K线
+    """
+    result = []
+    for ts, open_, high, low, close, volume in candles:
+        bucket = ts - ts % timeframe_ms
+        if result and result[-1][0] == bucket:
+            current = result[-1]
+            current[2] = max(current[2], high)
+            current[3] = min(current[3], low)
+            current[4] = close
+            current[5] += volume
+        else:
+            result.append([bucket, open_, high, low, close, volume])
+
+    if drop_partial_head and result and candles[0][0] != result[0][0]:
+        del result[0]
+    return result
+
+
+class TimeframeResampler:
+    """
+    多周期K线合成器
+
+    每个交易对保存一条基础K线（默认1m）；合成周期在第一次读取时从基础K线生成，
+    之后每次基础K线更新只从第一根变化的基础K线所在周期开始重算，
+    通常只有最后一根（未收盘）合成K线需要更新
+    """
+
+    def __init__(self, data_fetcher: DataFetcher = None, base_timeframe: str = '1m',
+                 max_base_candles: int = 20000, fetch_limit: int = 500):
+        """
+        初始化合成器
+
+        Args:
+            data_fetcher: 用于拉取基础K线的数据获取器（只调用 update 时可不传）
+            base_timeframe: 基础周期
+            max_base_candles: 每个交易对最多保留的基础K线数量
+            fetch_limit: sync 时每次增量请求的基础K线数量
+        """
+        self.data_fetcher = data_fetcher
+        self.base_timeframe = base_timeframe
+        self.base_ms = timeframe_to_ms(base_timeframe)
+        self.max_base_candles = max_base_candles
+        self.fetch_limit = fetch_limit
+
+        # 交易对 -> 基础K线 / 对应的时间戳（用于二分查找）
+        self._base: Dict[str, List[list]] = {}
+        self._times: Dict[str, List[int]] = {}
+        # (交易对, 周期) -> 合成K线 / 对应的时间戳
+        self._derived: Dict[Tuple[str, str], List[list]] = {}
+        self._derived_times: Dict[Tuple[str, str], List[int]] = {}
+
+    def _check_timeframe(self, timeframe: str) -> int:
+        timeframe_ms = timeframe_to_ms(timeframe)
+        # 周期需是基础周期的整数倍，且能整除一天（保证按UTC对齐后与交易所的K线一致）
+        if timeframe_ms % self.base_ms or DAY_MS % timeframe_ms:
+            raise ValueError(f'无法从 {self.base_timeframe} 合成 {timeframe}')
+        return timeframe_ms
+
+    def sync(self, symbol: str) -> bool:
+        """
+        从交易所增量拉取基础K线并更新所有合成周期
+
+        第一次同步时先从数据获取器的本地K线存储读取更长的历史（可用 backfill.py 预先回补）
+
+        Returns:
+            拉取成功返回True
+        """
+        fetcher = self.data_fetcher
+        if symbol not in self._base and fetcher.candle_store is not None:
+            history = fetcher.candle_store.load(fetcher.exchange_id, symbol, self.base_timeframe,
+                                                limit=self.max_base_candles)
+            if history:
+                self.update(symbol, history)
+
+        ohlcv = fetcher.fetch_ohlcv(symbol, self.base_timeframe, limit=self.fetch_limit, incremental=True)
+        if ohlcv is None:
+            return False
+        self.update(symbol, ohlcv)
+        return True
+
+    def update(self, symbol: str, candles: List[list]) -> None:
+        """
+        合并新到的基础K线（可以包含对未收盘K线的更新），并增量更新已生成的合成周期
+
+        Args:
+            symbol: 交易对
+            candles: 升序的基础K线，与已有数据重叠的部分会覆盖已有数据；
+                     与已有数据之间或内部有缺口时只保留最后一个缺口之后的连续K线
+        """
+        if not candles:
+            return
+        base = self._base.setdefault(symbol, [])
+        times = self._times.setdefault(symbol, [])
+        fresh = DataFetcher._merge_ohlcv([], candles)
+
+        # 跳过与已有数据完全相同的部分，从第一根变化的K线开始替换
+        start = bisect.bisect_left(times, fresh[0][0])
+        same = 0
+        while same < len(fresh) and start + same < len(base) and base[start + same] == list(fresh[same]):
+            same += 1
+        if same == len(fresh):
+            return
+
+        changed_ts = fresh[same][0]
+        del base[start + same:]
+        del times[start + same:]
+        base.extend(list(candle) for candle in fresh[same:])
+        times.extend(candle[0] for candle in fresh[same:])
+
+        # 基础K线出现缺口（如停机后重新拉取）时丢弃缺口之前的数据，合成K线不跨缺口合并
+        gap = self._last_gap(times, max(start + same, 1))
+        if gap:
+            del base[:gap]
+            del times[:gap]
+
+        excess = len(base) - self.max_base_candles
+        if excess > 0:
+            del base[:excess]
+            del times[:excess]
+
+        for key in [key for key in self._derived if key[0] == symbol]:
+            if gap:
+                # 缺口之前的合成K线全部作废，下次读取时重新合成
+                del self._derived[key]
+                del self._derived_times[key]
+            else:
+                self._refresh(key, changed_ts)
+
+    def _last_gap(self, times: List[int], first: int) -> int:
+        """在times[first:]中查找最后一处缺口，返回缺口之后第一根K线的位置，没有缺口返回0"""
+        for i in range(len(times) - 1, first - 1, -1):
+            if times[i] - times[i - 1] != self.base_ms:
+                return i
+        return 0
+
+    def _refresh(self, key: Tuple[str, str], changed_ts: int) -> None:
+        """从changed_ts所在的周期开始重算合成K线"""
+        symbol, timeframe = key
+        timeframe_ms = timeframe_to_ms(timeframe)
+        base, times = self._base[symbol], self._times[symbol]
+        derived, derived_times = self._derived[key], self._derived_times[key]
+
+        bucket = changed_ts - changed_ts % timeframe_ms
+        cut = bisect.bisect_left(derived_times, bucket)
+        del derived[cut:]
+        del derived_times[cut:]
+
+        first = bisect.bisect_left(times, bucket)
+        rebuilt = resample_ohlcv(base[first:], timeframe_ms, drop_partial_head=(first == 0))
+        derived.extend(rebuilt)
+        derived_times.extend(candle[0] for candle in rebuilt)
+
+        excess = len(derived) - self.max_base_candles
+        if excess > 0:
+            del derived[:excess]
+            del derived_times[:excess]
+
+    def get(self, symbol: str, timeframe: str, limit: int = 100) -> List[list]:
+        """
+        获取合成周期的最近limit根K线（最后一根为当前未收盘的K线）
+
+        Args:
+            symbol: 交易对
+            timeframe: 目标周期，如 '15m', '1h'
+            limit: K线数量
+
+        Returns:
+            [[timestamp, open, high, low, close, volume], ...]，可能少于limit根
+        """
+        if symbol not in self._base:
+            return []
+        if timeframe == self.base_timeframe:
+            return [list(candle) for candle in self._base[symbol][-limit:]]
+
+        key = (symbol, timeframe)
+        if key not in self._derived:
+            timeframe_ms = self._check_timeframe(timeframe)
+            derived = resample_ohlcv(self._base[symbol], timeframe_ms)
+            self._derived[key] = derived
+            self._derived_times[key] = [candle[0] for candle in derived]
+        return [list(candle) for candle in self._derived[key][-limit:]]
+
+    def covers(self, symbol: str, timeframe: str, limit: int) -> bool:
+        """本地数据是否足够合成limit根该周期的K线"""
+        return len(self.get(symbol, timeframe, limit)) >= limit
+
+    def _reachable_base(self, symbol: str) -> int:
+        """同步之后最多能有多少根基础K线：已有的（第一次为存储中的）加上一次增量请求，不超过上限"""
+        fetcher = self.data_fetcher
+        if symbol in self._base:
+            available = len(self._base[symbol])
+        elif fetcher.candle_store is not None:
+            available = fetcher.candle_store.count(fetcher.exchange_id, symbol, self.base_timeframe)
+        else:
+            available = 0
+        return min(self.max_base_candles, available + self.fetch_limit)
+
+    def fetch(self, symbol: str, timeframe: str, limit: int = 100) -> Optional[List[list]]:
+        """
+        获取某个周期的最近limit根K线
+
+        先同步基础K线（第一次从本地K线存储读取历史），本地数据足够时直接合成，
+        否则退回按该周期向交易所请求；无法合成的周期（如 1w、7m），或同步后基础K线
+        也不可能够用时（如存储为空时的 1h×100 需要6000根1分钟K线），不做同步直接按周期请求
+
+        Returns:
+            [[timestamp, open, high, low, close, volume], ...]，失败返回None
+        """
+        try:
+            timeframe_ms = self.base_ms if timeframe == self.base_timeframe else self._check_timeframe(timeframe)
+        except ValueError:
+            timeframe_ms = None
+        if timeframe_ms is not None and limit * (timeframe_ms // self.base_ms) <= self._reachable_base(symbol):
+            if self.sync(symbol) and self.covers(symbol, timeframe, limit):
+                return self.get(symbol, timeframe, limit)
+        return self.data_fetcher.fetch_ohlcv(symbol, timeframe, limit=limit)
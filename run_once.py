@@ -6,6 +6,10 @@ import json
 import sys
 from datetime import datetime
 
+from candle_buffer import CandleBuffer
+from candle_store import CandleStore
+from markets_cache import MarketsCache
+from rate_limiter import PRIORITY_CRITICAL, RateLimitScheduler
 from data_fetcher import DataFetcher
 from indicator import calculate_all_indicators, get_latest_indicators
 from signal_detector import SignalDetector
@@ -44,14 +48,23 @@ def run_once():
     print()
     
     # 初始化模块（GitHub Actions服务器在国外，不需要代理）
-    # 使用OKX交易所，避免币安的地理限制
-    data_fetcher = DataFetcher(proxy_url=None, exchange_id='okx')
+    # 默认使用OKX交易所，避免币安的地理限制；配置多个交易所时自动对冲和故障切换
+    # 本地K线存储由workflow缓存在多次运行之间保留，热启动时只需补齐最新K线
+    data_fetcher = DataFetcher(
+        proxy_url=None,
+        exchange_id=config.get('exchanges', ['okx']),
+        candle_store=CandleStore(config.get('candle_store_dir', 'data/candles')),
+        markets_cache=MarketsCache(config.get('markets_cache_dir', 'data/markets')),
+        rate_limiter=RateLimitScheduler(config.get('rate_limit_dir', 'data/ratelimit')),
+        priority=PRIORITY_CRITICAL
+    )
     signal_detector = SignalDetector(
         rsi_overbought=config['rsi']['overbought'],
         rsi_oversold=config['rsi']['oversold'],
         telegram_token=config['telegram'].get('bot_token'),
         telegram_chat_id=config['telegram'].get('chat_id'),
-        proxy_url=None  # 不使用代理
+        proxy_url=None,  # 不使用代理
+        default_symbol=config['symbol']
     )
     
     # 加载历史信号
@@ -67,29 +80,32 @@ def run_once():
     try:
         # 获取K线数据
         print(f"📡 正在获取 {config['symbol']} 的K线数据...")
-        df = data_fetcher.fetch_kline_data(
+        ohlcv = data_fetcher.fetch_ohlcv(
             symbol=config['symbol'],
             timeframe=config['timeframe'],
-            limit=100
+            limit=100,
+            incremental=True
         )
         
-        if df is None:
+        if ohlcv is None:
             print("❌ 获取数据失败")
             sys.exit(1)
         
-        print(f"✅ 获取到 {len(df)} 条K线数据")
+        candles = CandleBuffer.from_ohlcv(ohlcv)
+        print(f"✅ 获取到 {len(candles)} 条K线数据")
         
-        # 计算指标
+        # 计算指标（只需要最新一根K线）
         print("\n📊 计算技术指标...")
-        df = calculate_all_indicators(
-            df,
+        series = calculate_all_indicators(
+            candles,
             boll_period=config['boll']['period'],
             boll_std=config['boll']['std_dev'],
-            rsi_period=config['rsi']['period']
+            rsi_period=config['rsi']['period'],
+            tail=1
         )
         
         # 获取最新指标
-        indicators = get_latest_indicators(df)
+        indicators = get_latest_indicators(series)
         
         print(f"💰 当前价格: ${indicators['close']:,.2f}")
         print(f"📈 RSI: {indicators['rsi']:.2f}")
@@ -2,9 +2,9 @@
 信号检测与告警模块 - 基于BOLL+RSI策略生成交易信号
 """
 import json
-import requests
+import threading
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Mapping, Optional
 from enum import Enum
 
 
@@ -17,12 +17,52 @@ class SignalType(Enum):
     NEUTRAL = "中性"  # 无信号
 
 
+# detect_signals_batch 输出的信号编码 -> 信号类型（编码与 jit_kernels.SIGNAL_* 相同）
+BATCH_SIGNAL_TYPES = (SignalType.NEUTRAL, SignalType.LONG, SignalType.SHORT,
+                      SignalType.EXIT_LONG, SignalType.EXIT_SHORT)
+
+
+class PositionState:
+    """
+    单个交易对的持仓状态
+
+    只为有持仓的交易对保存一条，平仓后删除；__slots__ 让每条记录只占固定的几个字段
+    """
+    __slots__ = ('side', 'entry_price', 'entry_bar', 'signal')
+
+    def __init__(self, side: SignalType, entry_price: Optional[float], entry_bar=None, signal: Dict = None):
+        """
+        Args:
+            side: SignalType.LONG 或 SignalType.SHORT
+            entry_price: 开仓价格
+            entry_bar: 开仓K线（指标字典中的timestamp，没有时为None）
+            signal: 开仓信号字典（即 last_signal）
+        """
+        self.side = side
+        self.entry_price = entry_price
+        self.entry_bar = entry_bar
+        self.signal = signal
+
+    @classmethod
+    def from_signal(cls, signal: Dict, entry_bar=None) -> 'PositionState':
+        return cls(signal['signal_type'], signal.get('indicators', {}).get('price'), entry_bar, signal)
+
+    def __repr__(self) -> str:
+        return f"PositionState({self.side.value} @ {self.entry_price}, bar={self.entry_bar})"
+
+
 class SignalDetector:
-    """交易信号检测器"""
+    """
+    交易信号检测器
+    
+    每个交易对的持仓状态单独保存（见 PositionState），一个检测器可以同时跟踪多个交易对；
+    不指定交易对的调用使用 default_symbol 的状态，last_signal 属性与单交易对时的用法相同
+    """
     
     def __init__(self, rsi_overbought: float = 70, rsi_oversold: float = 30,
                  telegram_token: str = None, telegram_chat_id: str = None,
-                 proxy_url: str = None):
+                 proxy_url: str = None, band_prefix: str = 'boll',
+                 default_symbol: str = None, max_history: int = None):
         """
         初始化信号检测器
         
@@ -32,9 +72,14 @@ class SignalDetector:
             telegram_token: Telegram Bot Token
             telegram_chat_id: Telegram Chat ID
             proxy_url: 代理地址
+            band_prefix: 通道指标的前缀，默认 'boll'（布林带）；'qband' 使用分位数通道
+                （读取 qband_upper/qband_middle/qband_lower，规则不变）
+            default_symbol: 不指定交易对时使用的交易对
+            max_history: 信号历史最多保留的条数，默认不限制（监控大量交易对时建议设置）
         """
         self.rsi_overbought = rsi_overbought
         self.rsi_oversold = rsi_oversold
+        self.band_prefix = band_prefix
         self.telegram_token = telegram_token
         self.telegram_chat_id = telegram_chat_id
         
@@ -47,9 +92,54 @@ class SignalDetector:
         
         # 信号历史
         self.signals_history = []
-        self.last_signal = None
+        self.max_history = max_history
+        
+        # 交易对 -> 持仓状态（只包含有持仓的交易对）
+        self.default_symbol = default_symbol
+        self.positions: Dict[Optional[str], PositionState] = {}
+        self._lock = threading.RLock()
+    
+    @property
+    def last_signal(self) -> Optional[Dict]:
+        """默认交易对最后一个未平仓的开仓信号，没有持仓时为None"""
+        state = self.positions.get(self.default_symbol)
+        return state.signal if state else None
+    
+    @last_signal.setter
+    def last_signal(self, signal: Optional[Dict]) -> None:
+        self.set_position(self.default_symbol, signal)
+    
+    def _key(self, symbol: Optional[str]) -> Optional[str]:
+        return self.default_symbol if symbol is None else symbol
+    
+    def get_position(self, symbol: str = None) -> Optional[PositionState]:
+        """交易对当前的持仓状态，没有持仓时为None"""
+        return self.positions.get(self._key(symbol))
+    
+    def set_position(self, symbol: Optional[str], signal: Optional[Dict], entry_bar=None) -> None:
+        """按开仓信号设置交易对的持仓状态，signal为None时清除"""
+        key = self._key(symbol)
+        with self._lock:
+            if signal is None:
+                self.positions.pop(key, None)
+            else:
+                self.positions[key] = PositionState.from_signal(signal, entry_bar)
     
-    def detect_signal(self, indicators: Dict) -> Dict:
+    def detect_many(self, indicators_by_symbol: Mapping[str, Dict]) -> Dict[str, Dict]:
+        """
+        一次检测多个交易对的信号（整批只加一次锁）
+        
+        Args:
+            indicators_by_symbol: 交易对 -> 指标字典（与 detect_signal 相同）
+        
+        Returns:
+            交易对 -> 信号字典
+        """
+        with self._lock:
+            return {symbol: self.detect_signal(indicators, symbol)
+                    for symbol, indicators in indicators_by_symbol.items()}
+    
+    def detect_signal(self, indicators: Dict, symbol: str = None) -> Dict:
         """
         检测交易信号
         
@@ -62,15 +152,22 @@ class SignalDetector:
         
         Args:
             indicators: 指标字典，包含close, rsi, boll_upper, boll_middle, boll_lower
+                （band_prefix='qband' 时为 qband_upper, qband_middle, qband_lower）
+            symbol: 交易对，按该交易对的持仓状态判断平仓信号；默认为 default_symbol
             
         Returns:
             信号字典，包含signal_type, strength, reason等信息
         """
+        with self._lock:
+            return self._detect_signal(indicators, self._key(symbol))
+    
+    def _detect_signal(self, indicators: Dict, key: Optional[str]) -> Dict:
+        """检测信号并更新 key 对应交易对的持仓状态（调用方持有锁）"""
         close = indicators.get('close')
         rsi = indicators.get('rsi')
-        boll_upper = indicators.get('boll_upper')
-        boll_middle = indicators.get('boll_middle')
-        boll_lower = indicators.get('boll_lower')
+        boll_upper = indicators.get(f'{self.band_prefix}_upper')
+        boll_middle = indicators.get(f'{self.band_prefix}_middle')
+        boll_lower = indicators.get(f'{self.band_prefix}_lower')
         
         # 数据验证
         if None in [close, rsi, boll_upper, boll_middle, boll_lower]:
@@ -103,8 +200,9 @@ class SignalDetector:
             reasons.append(f"RSI参考: {rsi:.1f}")
         
         # 检测平仓信号（基于上一个信号）
-        elif self.last_signal:
-            if self.last_signal['signal_type'] == SignalType.LONG:
+        elif key in self.positions:
+            position = self.positions[key]
+            if position.side == SignalType.LONG:
                 # 平多：价格回到中轨或以上
                 if close >= boll_middle:
                     signal_type = SignalType.EXIT_LONG
@@ -112,7 +210,7 @@ class SignalDetector:
                     reasons.append(f"价格回到中轨(${close:.2f} >= ${boll_middle:.2f})")
                     reasons.append(f"RSI参考: {rsi:.1f}")
             
-            elif self.last_signal['signal_type'] == SignalType.SHORT:
+            elif position.side == SignalType.SHORT:
                 # 平空：价格回到中轨或以下
                 if close <= boll_middle:
                     signal_type = SignalType.EXIT_SHORT
@@ -135,14 +233,75 @@ class SignalDetector:
             }
         }
         
-        # 更新最后信号（仅记录开仓信号）
+        # 更新持仓状态（开仓信号记录持仓，平仓信号清除）
         if signal_type in [SignalType.LONG, SignalType.SHORT]:
-            self.last_signal = signal
+            self.positions[key] = PositionState(signal_type, close, indicators.get('timestamp'), signal)
         elif signal_type in [SignalType.EXIT_LONG, SignalType.EXIT_SHORT]:
-            self.last_signal = None
+            self.positions.pop(key, None)
         
         return signal
     
+    def detect_signals_batch(self, data, update_state: bool = True, symbol: str = None) -> Dict:
+        """
+        对整段历史一次检测信号，结果与逐根调用 detect_signal 完全相同
+        
+        持仓状态的传递由 jit_kernels.position_states 完成（安装numba时JIT编译，否则为向量化实现），
+        不为每根K线构建字典
+        
+        Args:
+            data: 包含 close, rsi 和通道列（见 band_prefix）的DataFrame或 列名 -> 数组 的字典
+            update_state: 是否像逐根调用一样更新持仓状态（从该交易对当前的持仓开始推进）
+            symbol: 交易对，默认为 default_symbol
+            
+        Returns:
+            {'signal': 信号编码数组(int8，见 BATCH_SIGNAL_TYPES),
+             'strength': 信号强度数组（与 detect_signal 相同地保留2位小数）,
+             'position': 每根K线之后的持仓数组(int8，1多/-1空/0无)}
+        """
+        import numpy as np
+        from jit_kernels import (POSITION_LONG, POSITION_NONE, POSITION_SHORT, SIGNAL_LONG, SIGNAL_NEUTRAL,
+                                 SIGNAL_SHORT, position_states)
+        
+        prefix = self.band_prefix
+        close, upper, middle, lower = (np.asarray(data[name], dtype=np.float64) for name in
+                                       ('close', f'{prefix}_upper', f'{prefix}_middle', f'{prefix}_lower'))
+        rsi = np.asarray(data['rsi'], dtype=np.float64)
+        
+        state = self.get_position(symbol)
+        initial = POSITION_NONE
+        if state and state.side == SignalType.LONG:
+            initial = POSITION_LONG
+        elif state and state.side == SignalType.SHORT:
+            initial = POSITION_SHORT
+        codes, strength, final = position_states(close, upper, middle, lower, initial)
+        
+        # 与 detect_signal 相同地用Python的round保留2位小数（与np.round的舍入结果可能不同）
+        nonzero = np.flatnonzero(strength)
+        strength[nonzero] = [round(value, 2) for value in strength[nonzero].tolist()]
+        
+        # 每根K线之后的持仓：由最近一次开仓/平仓信号决定
+        event_position = np.array([POSITION_NONE, POSITION_LONG, POSITION_SHORT, POSITION_NONE, POSITION_NONE],
+                                  dtype=np.int8)[codes]
+        last_event = np.maximum.accumulate(np.where(codes != SIGNAL_NEUTRAL, np.arange(len(codes)), -1))
+        position = np.where(last_event >= 0, event_position[np.maximum(last_event, 0)], initial).astype(np.int8)
+        
+        if update_state:
+            opens = np.flatnonzero((codes == SIGNAL_LONG) | (codes == SIGNAL_SHORT))
+            if final == POSITION_NONE:
+                self.set_position(symbol, None)
+            elif len(opens):
+                # 在最后一次开仓的K线上重新检测一次，生成与逐根调用相同的持仓状态
+                i = opens[-1]
+                bar = {}
+                if 'timestamp' in data:
+                    # 按位置取值：DataFrame的索引不一定是从0开始的RangeIndex
+                    timestamps = data['timestamp']
+                    bar['timestamp'] = timestamps.iloc[i] if hasattr(timestamps, 'iloc') else np.asarray(timestamps)[i]
+                self.detect_signal({'close': close[i], 'rsi': rsi[i], f'{prefix}_upper': upper[i],
+                                    f'{prefix}_middle': middle[i], f'{prefix}_lower': lower[i], **bar}, symbol)
+        
+        return {'signal': codes, 'strength': strength, 'position': position}
+    
     def send_alert(self, symbol: str, signal: Dict, via_telegram: bool = True, 
                    via_console: bool = True) -> None:
         """
@@ -203,10 +362,14 @@ class SignalDetector:
             signal: 信号字典
         """
         # 保存到历史（包括中性信号，用于调试和状态追踪）
-        self.signals_history.append({
-            'symbol': symbol,
-            **signal
-        })
+        with self._lock:
+            self.signals_history.append({
+                'symbol': symbol,
+                **signal
+            })
+            # 超过上限时丢弃最旧的记录
+            if self.max_history is not None and len(self.signals_history) > self.max_history:
+                del self.signals_history[:len(self.signals_history) - self.max_history]
     
     def _send_telegram(self, message: str) -> bool:
         """
@@ -222,6 +385,8 @@ class SignalDetector:
             print("[Telegram配置缺失] bot_token 或 chat_id 未设置")
             return False
         
+        import requests
+        
         url = f"https://api.telegram.org/bot{self.telegram_token}/sendMessage"
         
         try:
@@ -279,7 +444,11 @@ class SignalDetector:
     
     def load_history(self, filepath: str = 'signals_history.json') -> None:
         """
-        从文件加载信号历史，并恢复最后一个开仓信号状态
+        从文件加载信号历史，并恢复每个交易对的持仓状态
+        
+        每个交易对最近一次开仓/平仓信号决定其状态：最近为开仓信号时恢复为持仓，为平仓信号时为空仓。
+        未指定 default_symbol 且历史中只有一个交易对（单交易对监控的历史文件）时，
+        把它作为 default_symbol，不指定交易对的调用沿用它的状态
         
         Args:
             filepath: 文件路径
@@ -287,23 +456,34 @@ class SignalDetector:
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
                 history_data = json.load(f)
+            
+            opens = {'做多': SignalType.LONG, '做空': SignalType.SHORT}
+            exits = {'平多', '平空'}
+            restored = {}
+            settled = set()
+            # 从最新到最旧遍历，每个交易对只看最近一次开仓/平仓信号
+            for signal in reversed(history_data):
+                key = self._key(signal.get('symbol'))
+                signal_type_str = signal.get('signal_type')
+                if key in settled or (signal_type_str not in opens and signal_type_str not in exits):
+                    continue
+                settled.add(key)
+                if signal_type_str in opens:
+                    # 恢复信号，将字符串类型转换回Enum
+                    restored[key] = PositionState.from_signal(dict(signal, signal_type=opens[signal_type_str]))
+            
+            with self._lock:
                 self.signals_history = history_data
-                
-                # 恢复最后一个开仓信号状态（从最新到最旧遍历）
-                for signal in reversed(history_data):
-                    signal_type_str = signal.get('signal_type')
-                    # 查找最后一个开仓信号（LONG或SHORT）
-                    if signal_type_str in ['做多', '做空']:
-                        # 恢复信号，将字符串类型转换回Enum
-                        signal_copy = signal.copy()
-                        if signal_type_str == '做多':
-                            signal_copy['signal_type'] = SignalType.LONG
-                        elif signal_type_str == '做空':
-                            signal_copy['signal_type'] = SignalType.SHORT
-                        
-                        self.last_signal = signal_copy
-                        print(f"✅ 已从历史恢复持仓状态: {signal_type_str} @ {signal.get('timestamp', 'N/A')}")
-                        break
+                if self.max_history is not None:
+                    del self.signals_history[:max(0, len(history_data) - self.max_history)]
+                symbols = {signal.get('symbol') for signal in history_data}
+                if self.default_symbol is None and len(symbols) == 1:
+                    self.default_symbol = symbols.pop()
+                self.positions = restored
+            
+            for key, state in restored.items():
+                label = f"{key} " if key else ''
+                print(f"✅ 已从历史恢复持仓状态: {label}{state.side.value} @ {state.signal.get('timestamp', 'N/A')}")
                 
         except FileNotFoundError:
             self.signals_history = []
@@ -10,8 +10,12 @@ import json
 import time
 from datetime import datetime
 
-from data_fetcher import DataFetcher
-from indicator import calculate_all_indicators, get_latest_indicators
+from candle_store import CandleStore
+from data_fetcher import DataFetcher, ohlcv_to_dataframe
+from resampler import TimeframeResampler
+from rate_limiter import PRIORITY_LOW, RateLimitScheduler
+from indicator import get_latest_indicators
+from indicator_cache import IndicatorCache
 from signal_detector import SignalDetector, SignalType
 
 
@@ -84,7 +88,13 @@ def load_config():
 @st.cache_resource
 def init_modules(_config):
     """初始化模块（使用下划线前缀避免缓存配置对象）"""
-    data_fetcher = DataFetcher(proxy_url=_config['proxy'])
+    # 看板刷新使用低优先级，与监控进程共享限频额度时为信号检测保留余量
+    data_fetcher = DataFetcher(
+        proxy_url=_config['proxy'],
+        rate_limiter=RateLimitScheduler(_config.get('rate_limit_dir', 'data/ratelimit')),
+        priority=PRIORITY_LOW,
+        candle_store=CandleStore(_config.get('candle_store_dir', 'data/candles'))
+    )
     signal_detector = SignalDetector(
         rsi_overbought=_config['rsi']['overbought'],
         rsi_oversold=_config['rsi']['oversold'],
@@ -92,7 +102,15 @@ def init_modules(_config):
         telegram_chat_id=_config['telegram'].get('chat_id'),
         proxy_url=_config['proxy']
     )
-    return data_fetcher, signal_detector
+    # 每个交易对只拉取1分钟K线，切换周期时在本地合成（首次从本地K线存储读取历史）
+    resampler = TimeframeResampler(data_fetcher)
+    return data_fetcher, signal_detector, resampler
+
+
+@st.cache_resource
+def init_indicator_cache():
+    """指标结果缓存，所有会话共享：参数和K线未变化的重跑直接命中，只有最新K线变化时只计算变化的行"""
+    return IndicatorCache()
 
 
 def create_candlestick_chart(df, config):
@@ -305,22 +323,19 @@ def main():
             st.rerun()
     
     # 初始化模块
-    data_fetcher, signal_detector = init_modules(config)
+    data_fetcher, signal_detector, resampler = init_modules(config)
     
-    # 获取数据
+    # 获取数据：本地1分钟K线足够时直接合成所选周期，否则单独请求该周期
     with st.spinner('📡 正在获取数据...'):
-        df = data_fetcher.fetch_kline_data(
-            symbol=config['symbol'],
-            timeframe=config['timeframe'],
-            limit=100
-        )
+        ohlcv = resampler.fetch(config['symbol'], config['timeframe'], limit=100)
+        df = ohlcv_to_dataframe(ohlcv) if ohlcv is not None else None
     
     if df is None:
         st.error("❌ 无法获取数据，请检查网络连接和代理设置")
         return
     
-    # 计算指标
-    df = calculate_all_indicators(
+    # 计算指标（带缓存）
+    df = init_indicator_cache().calculate_all_indicators(
         df,
         boll_period=config['boll']['period'],
         boll_std=config['boll']['std_dev'],
@@ -330,8 +345,8 @@ def main():
     # 获取最新指标
     indicators = get_latest_indicators(df)
     
-    # 检测信号
-    signal = signal_detector.detect_signal(indicators)
+    # 检测信号（检测器在会话间共享，按交易对分别保存持仓状态）
+    signal = signal_detector.detect_signal(indicators, symbol=config['symbol'])
     
     # === 显示指标面板 ===
     col1, col2, col3, col4 = st.columns(4)
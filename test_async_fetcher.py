@@ -0,0 +1,73 @@
+"""
+测试异步并发数据获取
+验证 fetch_many 并发执行、遵守并发上限，并按交易对返回结果或异常
+"""
+import asyncio
+import sys
+import time
+
+from async_data_fetcher import AsyncDataFetcher
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+REQUEST_DELAY = 0.05
+
+
+class SlowExchange:
+    """模拟异步交易所：每个请求耗时固定，并统计同时进行的请求数"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def fetch_ohlcv(self, symbol, timeframe, limit=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(REQUEST_DELAY)
+            if symbol.startswith('BAD'):
+                raise ValueError(f'unknown symbol {symbol}')
+            return [[i * 60_000, 1.0, 2.0, 0.5, 1.5, 10.0] for i in range(limit)]
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        pass
+
+
+async def _run():
+    fetcher = AsyncDataFetcher(exchange_id='binance', max_concurrency=20)
+    await fetcher.exchange.close()
+    fetcher.exchange = SlowExchange()
+
+    symbols = [f'COIN{i}/USDT' for i in range(39)] + ['BAD/USDT']
+    started = time.perf_counter()
+    results = await fetcher.fetch_many(symbols, ['1m', '1h'], limit=30)
+    elapsed = time.perf_counter() - started
+    await fetcher.close()
+    return fetcher.exchange, results, elapsed
+
+
+def test_async_fetch_many():
+    """测试并发获取"""
+    print("=" * 80)
+    print("🧪 异步并发获取测试")
+    print("=" * 80)
+
+    exchange, results, elapsed = asyncio.run(_run())
+
+    # 80个请求，并发上限20 -> 约4轮，远小于串行的80轮
+    assert len(results) == 80
+    assert exchange.max_in_flight == 20
+    assert elapsed < REQUEST_DELAY * 80 / 4
+    print(f"✅ 80个请求耗时 {elapsed:.2f}s，最大并发 {exchange.max_in_flight}")
+
+    assert isinstance(results[('BAD/USDT', '1m')], ValueError)
+    assert len(results[('COIN0/USDT', '1h')]) == 30
+    print("✅ 失败请求以异常返回，不影响其他交易对")
+
+
+if __name__ == '__main__':
+    test_async_fetch_many()
+    print("\n🎉 所有测试通过！")
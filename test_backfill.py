@@ -0,0 +1,94 @@
+"""
+测试历史K线回补
+验证分页并发下载、按顺序写入存储、中断后从进度文件续传，以及已有较新数据时中断不丢数据
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+from backfill import Backfiller, Checkpoint, split_windows
+from candle_store import CandleStore
+from testkit import MINUTE, FakeExchange
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+def test_backfill():
+    """测试回补与续传"""
+    print("=" * 80)
+    print("🧪 历史K线回补测试")
+    print("=" * 80)
+
+    assert split_windows(0, 1000 * MINUTE, MINUTE, 300) == [0, 300 * MINUTE, 600 * MINUTE, 900 * MINUTE]
+
+    root = tempfile.mkdtemp()
+    try:
+        store = CandleStore(os.path.join(root, 'candles'))
+        checkpoint_path = os.path.join(root, 'checkpoint.json')
+        start, end = 0, 1000 * MINUTE
+
+        # 1. 第600分钟之后的请求失败，模拟任务中途被杀
+        exchange = FakeExchange(fail_after_since=600 * MINUTE)
+        backfiller = Backfiller(exchange, 'fake', store, Checkpoint(checkpoint_path),
+                                workers=4, page_size=100)
+        try:
+            backfiller.run(['ETH/USDT'], ['1m'], start, end)
+            assert False, '应当抛出异常'
+        except RuntimeError:
+            pass
+        assert store.count('fake', 'ETH/USDT', '1m') == 600
+        print("✅ 中断前已完成的页面按顺序落盘")
+
+        # 2. 重新运行：从进度文件继续，只请求剩余页面
+        exchange = FakeExchange()
+        backfiller = Backfiller(exchange, 'fake', store, Checkpoint(checkpoint_path),
+                                workers=4, page_size=100)
+        backfiller.run(['ETH/USDT'], ['1m'], start, end)
+        assert sorted(call['since'] for call in exchange.calls) == [i * 100 * MINUTE for i in range(6, 10)]
+        timestamps = store.open_arrays('fake', 'ETH/USDT', '1m')['timestamp']
+        assert len(timestamps) == 1000
+        assert list(timestamps[:3]) == [0, MINUTE, 2 * MINUTE]
+        assert (timestamps[1:] - timestamps[:-1] == MINUTE).all()
+        del timestamps
+        print("✅ 续传只下载剩余页面，数据完整连续")
+
+        # 3. 已完成的任务再次运行不会发出请求
+        exchange = FakeExchange()
+        Backfiller(exchange, 'fake', store, Checkpoint(checkpoint_path), page_size=100).run(
+            ['ETH/USDT'], ['1m'], start, end)
+        assert exchange.calls == []
+        print("✅ 已完成的区间不会重复下载")
+
+        # 4. 存储中已有更新的数据（第600分钟起）时从start回补，中途被杀不会丢掉已有的K线
+        store.write('fake', 'BTC/USDT', '1m', FakeExchange().fetch_ohlcv('BTC/USDT', '1m', 600 * MINUTE, 400))
+        exchange = FakeExchange(fail_after_since=300 * MINUTE)
+        backfiller = Backfiller(exchange, 'fake', store, Checkpoint(checkpoint_path),
+                                workers=4, page_size=100)
+        try:
+            backfiller.run(['BTC/USDT'], ['1m'], start, end)
+            assert False, '应当抛出异常'
+        except RuntimeError:
+            pass
+        assert all(call['since'] < 600 * MINUTE for call in exchange.calls)
+        timestamps = store.open_arrays('fake', 'BTC/USDT', '1m')['timestamp']
+        assert len(timestamps) == 700 and timestamps[299] == 299 * MINUTE and timestamps[300] == 600 * MINUTE
+        del timestamps
+        assert Checkpoint(checkpoint_path).resume_from('fake|BTC/USDT|1m', start, end) == (300 * MINUTE, 600 * MINUTE)
+
+        exchange = FakeExchange()
+        Backfiller(exchange, 'fake', store, Checkpoint(checkpoint_path), workers=4, page_size=100).run(
+            ['BTC/USDT'], ['1m'], start, end)
+        assert sorted(call['since'] for call in exchange.calls) == [300 * MINUTE, 400 * MINUTE, 500 * MINUTE]
+        timestamps = store.open_arrays('fake', 'BTC/USDT', '1m')['timestamp']
+        assert len(timestamps) == 1000 and timestamps[-1] == 999 * MINUTE
+        assert (timestamps[1:] - timestamps[:-1] == MINUTE).all()
+        del timestamps
+        print("✅ 已有较新数据时只补齐头部，中断续传后数据完整")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_backfill()
+    print("\n🎉 所有测试通过！")
@@ -0,0 +1,156 @@
+"""
+测试回测模块
+验证交易与逐根回放信号的结果一致、资金曲线和统计正确、CSV导入和K线存储读取、一年1分钟K线的耗时
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from backtest import (EXIT_END, EXIT_REVERSE, EXIT_SIGNAL, load_csv, resample_arrays, run_backtest,
+                      slice_range, to_ohlcv)
+from candle_store import CandleStore
+from indicator import compute_indicator_arrays
+from resampler import resample_ohlcv
+from signal_detector import SignalDetector, SignalType
+from testkit import MINUTE, random_walk_arrays
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+def replay_trades(close, fee_rate):
+    """逐根调用 detect_signal，按持仓变化手工记录交易"""
+    data = compute_indicator_arrays(close)
+    detector = SignalDetector()
+    trades, open_trade = [], None
+    for i in range(len(close)):
+        detector.detect_signal({'close': close[i], 'rsi': data['rsi'][i], 'boll_upper': data['boll_upper'][i],
+                                'boll_middle': data['boll_middle'][i], 'boll_lower': data['boll_lower'][i]})
+        last = detector.last_signal
+        position = {SignalType.LONG: 1, SignalType.SHORT: -1}[last['signal_type']] if last else 0
+        if open_trade and open_trade[0] != position:
+            direction, entry = open_trade
+            trades.append((entry, i, direction, direction * (close[i] / close[entry] - 1) - 2 * fee_rate))
+            open_trade = None
+        if position and open_trade is None:
+            open_trade = (position, i)
+    if open_trade:
+        direction, entry = open_trade
+        trades.append((entry, len(close) - 1, direction,
+                       direction * (close[-1] / close[entry] - 1) - 2 * fee_rate))
+    return trades
+
+
+def test_backtest():
+    """测试回测"""
+    print("=" * 80)
+    print("🧪 回测测试")
+    print("=" * 80)
+
+    # 1. 交易与逐根回放完全一致
+    candles = random_walk_arrays(20000)
+    result = run_backtest(candles, fee_rate=0.0004)
+    expected = replay_trades(candles['close'], 0.0004)
+    trades = result.trades
+    assert len(result) == len(expected) > 20
+    assert trades['entry_index'].tolist() == [trade[0] for trade in expected]
+    assert trades['exit_index'].tolist() == [trade[1] for trade in expected]
+    assert trades['direction'].tolist() == [trade[2] for trade in expected]
+    assert np.allclose(trades['return'], [trade[3] for trade in expected], rtol=0, atol=1e-12)
+    reasons = set(trades['exit_reason'].tolist())
+    assert EXIT_SIGNAL in reasons and reasons <= {EXIT_SIGNAL, EXIT_REVERSE, EXIT_END}
+    print(f"✅ {len(result)} 笔交易与逐根回放信号的结果完全一致")
+
+    # 2. 资金曲线：平仓后等于逐笔收益连乘（反向开仓时再扣新仓的开仓手续费），空仓期间不变
+    equity = result.equity
+    compounded = np.cumprod(1 + trades['return'])
+    for reason, factor in ((EXIT_SIGNAL, 1.0), (EXIT_REVERSE, 1 - 0.0004)):
+        exited = trades['exit_reason'] == reason
+        assert np.allclose(equity[trades['exit_index'][exited]], compounded[exited] * factor)
+    assert np.isclose(equity[-1], compounded[-1])
+    flat = result.signals['position'] == 0
+    flat[trades['exit_index']] = False
+    flat[:int(trades['entry_index'][0])] = False
+    assert np.allclose(equity[1:][flat[1:]], equity[:-1][flat[1:]])
+    print("✅ 资金曲线与逐笔收益连乘一致，空仓期间净值不变")
+
+    # 3. 统计
+    stats = result.stats
+    returns = trades['return']
+    assert stats['trades'] == stats['long_trades'] + stats['short_trades'] == len(returns)
+    assert stats['hit_rate'] == (returns > 0).mean()
+    assert np.isclose(stats['total_return'], compounded[-1] - 1)
+    peak = np.maximum.accumulate(equity)
+    assert np.isclose(stats['max_drawdown'], (1 - equity / peak).max()) and 0 < stats['max_drawdown'] < 1
+    assert 0 < stats['exposure'] < 1
+    no_fee = run_backtest(candles, fee_rate=0.0)
+    assert np.allclose(no_fee.trades['return'] - returns, 0.0008)
+    assert no_fee.stats['total_return'] > stats['total_return']
+    qband = run_backtest(candles, band='qband')
+    assert len(qband) > 0
+    print(f"✅ 统计正确: 胜率 {stats['hit_rate'] * 100:.1f}%，最大回撤 {stats['max_drawdown'] * 100:.2f}%")
+
+    # 4. 没有交易或没有K线
+    quiet = run_backtest(slice_range(candles, None, int(candles['timestamp'][15])))
+    assert len(quiet) == 0 and quiet.stats['total_return'] == 0 and np.all(quiet.equity == 1)
+    empty = run_backtest({name: values[:0] for name, values in candles.items()})
+    assert empty.stats['bars'] == 0 and len(empty) == 0
+    print("✅ 没有交易/没有K线时结果为空")
+
+    # 5. CSV读取（毫秒时间戳和日期字符串、乱序和重复）→ 写入K线存储 → 读取回测
+    directory = tempfile.mkdtemp()
+    try:
+        small = {name: values[:3000] for name, values in candles.items()}
+        path = os.path.join(directory, 'eth.csv')
+        rows = to_ohlcv(small)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('Timestamp,Open,High,Low,Close,Volume\n')
+            for row in rows[1500:] + rows[:1500] + rows[10:11]:
+                f.write(','.join(repr(value) for value in row) + '\n')
+        loaded = load_csv(path)
+        for name, values in small.items():
+            assert np.array_equal(loaded[name], values), name
+
+        dated = os.path.join(directory, 'dated.csv')
+        with open(dated, 'w', encoding='utf-8') as f:
+            for row in rows[:100]:
+                stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(row[0] / 1000))
+                f.write(','.join([stamp] + [repr(value) for value in row[1:]]) + '\n')
+        assert np.array_equal(load_csv(dated)['timestamp'], small['timestamp'][:100])
+
+        store = CandleStore(os.path.join(directory, 'candles'))
+        store.write('binance', 'ETH/USDT', '1m', to_ohlcv(loaded))
+        stored = store.open_arrays('binance', 'ETH/USDT', '1m')
+        from_store = run_backtest(stored)
+        from_memory = run_backtest(small)
+        assert from_store.trades['entry_index'].tolist() == from_memory.trades['entry_index'].tolist()
+        assert from_store.stats == from_memory.stats
+        print("✅ CSV读取、写入K线存储后回测结果相同")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    # 6. 向量化合成大周期与 resample_ohlcv 相同
+    resampled = resample_arrays(small, 15 * MINUTE)
+    expected_rows = resample_ohlcv(to_ohlcv(small), 15 * MINUTE)
+    assert resampled['timestamp'].tolist() == [row[0] for row in expected_rows]
+    assert np.allclose(np.array(to_ohlcv(resampled)), np.array(expected_rows))
+    print(f"✅ 合成15分钟K线与 resample_ohlcv 相同 ({len(expected_rows)} 根)")
+
+    # 7. 一年的1分钟K线几秒内完成
+    year = random_walk_arrays(365 * 24 * 60, seed=7)
+    started = time.perf_counter()
+    yearly = run_backtest(year)
+    elapsed = time.perf_counter() - started
+    print(f"⚡ {yearly.stats['bars']} 根1分钟K线，{yearly.stats['trades']} 笔交易，耗时 {elapsed:.2f}秒")
+    assert elapsed < 10
+    yearly.print_report(show_trades=3)
+
+    print("\n🎉 回测测试通过！")
+
+
+if __name__ == '__main__':
+    test_backtest()
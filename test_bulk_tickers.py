@@ -0,0 +1,73 @@
+"""
+测试批量获取实时价格
+验证优先使用 fetch_tickers 批量请求、不支持时退回逐个请求，以及TTL缓存共享
+"""
+import sys
+import time
+
+from data_fetcher import DataFetcher
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+class FakeExchange:
+    """模拟交易所，统计批量和单个请求次数"""
+
+    def __init__(self, bulk=True):
+        self.has = {'fetchTickers': bulk}
+        self.bulk_calls = 0
+        self.single_calls = 0
+
+    def fetch_tickers(self, symbols):
+        self.bulk_calls += 1
+        return {symbol: {'last': 100.0 + i} for i, symbol in enumerate(symbols)}
+
+    def fetch_ticker(self, symbol):
+        self.single_calls += 1
+        if symbol == 'BAD/USDT':
+            raise ValueError('bad symbol')
+        return {'last': 1.0}
+
+
+def test_bulk_tickers():
+    """测试批量价格获取"""
+    print("=" * 80)
+    print("🧪 批量实时价格测试")
+    print("=" * 80)
+
+    symbols = [f'COIN{i}/USDT' for i in range(200)]
+
+    # 1. 支持批量接口：200个交易对只发一次请求
+    fetcher = DataFetcher(exchange_id='binance', ticker_ttl=60)
+    fetcher.exchange = FakeExchange(bulk=True)
+    prices = fetcher.fetch_realtime_prices(symbols)
+    assert len(prices) == 200 and prices['COIN0/USDT'] == 100.0
+    assert fetcher.exchange.bulk_calls == 1 and fetcher.exchange.single_calls == 0
+    print("✅ 200个交易对只发出1次批量请求")
+
+    # 2. TTL内的再次查询（批量或单个）直接命中缓存
+    fetcher.fetch_realtime_prices(symbols[:50])
+    assert fetcher.fetch_realtime_price('COIN3/USDT') == 103.0
+    assert fetcher.exchange.bulk_calls == 1 and fetcher.exchange.single_calls == 0
+    print("✅ 同一周期内的其他调用共享缓存")
+
+    # 3. 过期后重新请求
+    fetcher.ticker_ttl = 0.01
+    time.sleep(0.02)
+    fetcher.fetch_realtime_prices(symbols)
+    assert fetcher.exchange.bulk_calls == 2
+    print("✅ 缓存过期后重新请求")
+
+    # 4. 不支持批量接口：逐个请求，失败的交易对为None
+    fetcher = DataFetcher(exchange_id='binance', ticker_ttl=60)
+    fetcher.exchange = FakeExchange(bulk=False)
+    prices = fetcher.fetch_realtime_prices(['ETH/USDT', 'BTC/USDT', 'BAD/USDT'])
+    assert prices == {'ETH/USDT': 1.0, 'BTC/USDT': 1.0, 'BAD/USDT': None}
+    assert fetcher.exchange.single_calls == 3
+    print("✅ 不支持批量接口时退回逐个请求")
+
+
+if __name__ == '__main__':
+    test_bulk_tickers()
+    print("\n🎉 所有测试通过！")
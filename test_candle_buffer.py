@@ -0,0 +1,76 @@
+"""
+测试K线环形缓冲区
+验证追加/更新/覆盖语义、列视图不复制数据，以及基于缓冲区的指标与DataFrame版本一致
+"""
+import math
+import sys
+
+import numpy as np
+
+from candle_buffer import CandleBuffer
+from data_fetcher import ohlcv_to_dataframe
+from indicator import calculate_all_indicators, get_latest_indicators
+from testkit import random_walk_candles
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+def test_candle_buffer():
+    """测试环形缓冲区"""
+    print("=" * 80)
+    print("🧪 K线环形缓冲区测试")
+    print("=" * 80)
+
+    candles = random_walk_candles(1764230400000, 250, seed=3)
+
+    # 1. 超过容量后只保留最近的K线，列视图按时间升序
+    buffer = CandleBuffer(capacity=100)
+    buffer.extend(candles[:180])
+    assert len(buffer) == 100
+    assert buffer.timestamp.dtype == np.int64 and buffer.close.dtype == np.float64
+    assert buffer.timestamp.tolist() == [c[0] for c in candles[80:180]]
+    assert buffer.to_ohlcv() == candles[80:180]
+    print("✅ 覆盖最早的K线，按时间升序读取")
+
+    # 2. 视图不复制数据且只读
+    close = buffer.close
+    assert np.shares_memory(close, buffer.close)
+    assert close.flags['C_CONTIGUOUS'] and not close.flags['WRITEABLE']
+    print("✅ 列视图连续、只读、零拷贝")
+
+    # 3. 增量合并：重叠部分跳过，最后一根更新，新的追加
+    partial = list(candles[180])
+    partial[4] = 1.0
+    assert buffer.extend(candles[150:180] + [partial]) == 1
+    assert buffer.last()[4] == 1.0
+    assert buffer.extend(candles[170:182]) == 1
+    assert buffer.last() == candles[181]
+    assert buffer.to_ohlcv() == candles[82:182]
+    print("✅ 增量合并只追加新K线并更新未收盘K线")
+
+    # 4. 指标与DataFrame版本一致
+    buffer.extend(candles[182:])
+    for boll_period, rsi_period in ((20, 14), (10, 6)):
+        series = calculate_all_indicators(buffer, boll_period=boll_period, rsi_period=rsi_period)
+        df = calculate_all_indicators(ohlcv_to_dataframe(buffer.to_ohlcv()),
+                                      boll_period=boll_period, rsi_period=rsi_period)
+        for name in ('boll_upper', 'boll_middle', 'boll_lower', 'rsi'):
+            assert np.allclose(series[name], df[name].to_numpy(), equal_nan=True), name
+
+        latest = get_latest_indicators(series)
+        expected = get_latest_indicators(df)
+        assert latest['timestamp'] == expected['timestamp'].to_pydatetime()
+        for name in ('close', 'boll_upper', 'boll_middle', 'boll_lower', 'rsi', 'boll_position'):
+            assert math.isclose(latest[name], expected[name], rel_tol=1e-9), name
+    print("✅ 基于缓冲区的指标与DataFrame版本一致")
+
+    # 5. 转换为DataFrame（看板使用）
+    df = buffer.to_dataframe()
+    assert len(df) == 100 and str(df['timestamp'].dtype).startswith('datetime64')
+    print("✅ 转换为DataFrame")
+
+
+if __name__ == '__main__':
+    test_candle_buffer()
+    print("\n🎉 所有测试通过！")
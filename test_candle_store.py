@@ -0,0 +1,98 @@
+"""
+测试本地K线存储
+验证追加写入、尾部覆盖、较早数据按时间戳合并、多线程同时写入不丢数据，以及DataFetcher在存储已预热时只做增量请求
+"""
+import shutil
+import sys
+import tempfile
+import threading
+
+from candle_store import CandleStore
+from data_fetcher import DataFetcher
+from testkit import FakeExchange, linear_candles
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+def test_candle_store():
+    """测试K线存储"""
+    print("=" * 80)
+    print("🧪 本地K线存储测试")
+    print("=" * 80)
+
+    root = tempfile.mkdtemp()
+    try:
+        store = CandleStore(root)
+
+        # 1. 追加写入与读取
+        store.write('okx', 'ETH/USDT', '1m', linear_candles(0, 50))
+        store.write('okx', 'ETH/USDT', '1m', linear_candles(50 * 60_000, 10))
+        assert store.count('okx', 'ETH/USDT', '1m') == 60
+        assert store.last_timestamp('okx', 'ETH/USDT', '1m') == 59 * 60_000
+        print("✅ 追加写入正常")
+
+        # 2. 重叠部分覆盖尾部（未收盘K线更新）
+        store.write('okx', 'ETH/USDT', '1m', linear_candles(58 * 60_000, 3, price=5000.0))
+        rows = store.load('okx', 'ETH/USDT', '1m', limit=5)
+        assert [row[0] for row in rows] == [i * 60_000 for i in range(56, 61)]
+        assert rows[-1][4] == 5002.0 and rows[-3][4] == 5000.0
+        arrays = store.open_arrays('okx', 'ETH/USDT', '1m')
+        assert len(arrays['close']) == 61
+        del arrays
+        print("✅ 尾部覆盖正常，无重复K线")
+
+        # 2b. 写入比尾部更早的数据（回补、导入部分CSV）：按时间戳合并，之后的K线不丢失
+        store.write('okx', 'ETH/USDT', '1m', linear_candles(10 * 60_000, 11, price=7000.0))
+        rows = store.load('okx', 'ETH/USDT', '1m')
+        assert [row[0] for row in rows] == [i * 60_000 for i in range(61)]
+        assert rows[10][4] == 7000.0 and rows[20][4] == 7010.0 and rows[21][4] == 3021.0
+        assert rows[-1][4] == 5002.0
+        # 带空缺的旧数据：只替换相同时间戳，插入缺失的K线
+        store.write('SIM', 'ETH/USDT', '1m', linear_candles(0, 5) + linear_candles(10 * 60_000, 5))
+        total = store.write('SIM', 'ETH/USDT', '1m', linear_candles(3 * 60_000, 4, price=9000.0)[::-1])
+        rows = store.load('SIM', 'ETH/USDT', '1m')
+        assert total == 12 and len(rows) == 12
+        assert [row[0] // 60_000 for row in rows] == [0, 1, 2, 3, 4, 5, 6, 10, 11, 12, 13, 14]
+        assert [row[4] for row in rows[3:7]] == [9000.0, 9001.0, 9002.0, 9003.0]
+        assert rows[-1][4] == 3004.0
+        print("✅ 较早的数据按时间戳合并，之后的K线保留")
+
+        # 2c. 多个线程同时写入同一序列（各自写入交错的时间戳，每次都要与已存储的K线合并）
+        def writer(offset):
+            for start in range(offset, 400, 40):
+                store.write('SIM', 'BTC/USDT', '1m', linear_candles(start * 60_000, 5, price=start))
+
+        threads = [threading.Thread(target=writer, args=(offset,)) for offset in range(0, 40, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rows = store.load('SIM', 'BTC/USDT', '1m')
+        assert [row[0] for row in rows] == [i * 60_000 for i in range(400)]
+        assert all(row[4] == row[0] // 60_000 for row in rows)
+        print("✅ 多线程同时写入按文件锁依次合并，没有丢失K线")
+
+        # 3. 预热的存储 -> DataFetcher首次调用即为增量请求
+        now_ms = 60 * 60_000 + 5_000
+        fetcher = DataFetcher(exchange_id='okx', candle_store=store)
+        fetcher.exchange = FakeExchange(now_ms)
+        df = fetcher.fetch_kline_data('ETH/USDT', '1m', limit=50, incremental=True)
+        assert [call['since'] for call in fetcher.exchange.calls] == [60 * 60_000]
+        assert len(df) == 50
+        print("✅ 热启动只补齐最新K线")
+
+        # 4. 冷启动 -> 全量获取并写回存储
+        fetcher = DataFetcher(exchange_id='okx', candle_store=store)
+        fetcher.exchange = FakeExchange(now_ms)
+        fetcher.fetch_kline_data('BTC/USDT', '1m', limit=30, incremental=True)
+        assert [call['since'] for call in fetcher.exchange.calls] == [None]
+        assert store.count('okx', 'BTC/USDT', '1m') == 30
+        print("✅ 冷启动数据已写入存储")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_candle_store()
+    print("\n🎉 所有测试通过！")
@@ -0,0 +1,76 @@
+"""
+测试多交易所对冲请求
+验证主交易所变慢或失败时会切换到备用交易所，并根据统计动态调整交易所顺序
+"""
+import sys
+import time
+
+from data_fetcher import DataFetcher
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+class FakeExchange:
+    """模拟交易所，可设置延迟和失败"""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def fetch_ticker(self, symbol):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError(f'{self.name} unavailable')
+        return {'last': 3000.0 if self.name == 'binance' else 3001.0}
+
+
+def test_hedged_fetch():
+    """测试对冲请求"""
+    print("=" * 80)
+    print("🧪 多交易所对冲请求测试")
+    print("=" * 80)
+
+    fetcher = DataFetcher(exchange_id=['binance', 'okx'], hedge_deadline=0.05, ticker_ttl=0)
+
+    # 1. 主交易所正常：不会请求备用交易所
+    fetcher.exchanges = {'binance': FakeExchange('binance'), 'okx': FakeExchange('okx')}
+    assert fetcher.fetch_realtime_price('ETH/USDT') == 3000.0
+    assert fetcher.exchanges['okx'].calls == 0
+    print("✅ 主交易所正常时只发出一个请求")
+
+    # 2. 主交易所变慢：超过等待时间后对冲到备用交易所
+    fetcher.exchanges['binance'].delay = 0.5
+    started = time.perf_counter()
+    assert fetcher.fetch_realtime_price('ETH/USDT') == 3001.0
+    elapsed = time.perf_counter() - started
+    assert elapsed < 0.3
+    print(f"✅ 主交易所变慢时 {elapsed:.2f}s 内由备用交易所返回")
+
+    # 3. 主交易所直接失败：立即切换
+    fetcher = DataFetcher(exchange_id=['binance', 'okx'], hedge_deadline=5.0, ticker_ttl=0)
+    fetcher.exchanges = {'binance': FakeExchange('binance', fail=True), 'okx': FakeExchange('okx')}
+    started = time.perf_counter()
+    assert fetcher.fetch_realtime_price('ETH/USDT') == 3001.0
+    assert time.perf_counter() - started < 1.0
+    print("✅ 主交易所失败时立即切换")
+
+    # 4. 统计后备用交易所排到前面
+    for _ in range(3):
+        fetcher.fetch_realtime_price('ETH/USDT')
+    assert fetcher.ranked_exchanges() == ['okx', 'binance']
+    assert fetcher.stats['binance'].errors >= 1
+    print("✅ 根据错误率和耗时动态调整交易所顺序")
+
+    # 5. 全部失败返回None
+    fetcher.exchanges['okx'].fail = True
+    assert fetcher.fetch_realtime_price('ETH/USDT') is None
+    print("✅ 全部交易所失败时返回None")
+
+
+if __name__ == '__main__':
+    test_hedged_fetch()
+    print("\n🎉 所有测试通过！")
@@ -0,0 +1,69 @@
+"""
+测试入口脚本的延迟加载
+验证导入 run_once 时不加载 ccxt/pandas/requests，创建DataFetcher/AsyncDataFetcher时只加载所选交易所
+"""
+import subprocess
+import sys
+
+from import_budget import DEFERRED_PACKAGES, analyze, measure
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+def test_entry_points_defer_heavy_imports():
+    """测试入口模块导入阶段不加载重量级依赖"""
+    print("=" * 80)
+    print("🧪 入口脚本延迟加载测试")
+    print("=" * 80)
+
+    for module in ('run_once', 'main'):
+        report = analyze(module, measure(module))
+        loaded = {name.split('.')[0] for name in report['modules']}
+        assert not loaded & set(DEFERRED_PACKAGES), loaded & set(DEFERRED_PACKAGES)
+        print(f"✅ {module}: 导入耗时 {report['total_ms']:.1f}ms，未加载重量级依赖")
+
+
+def test_only_selected_exchange_is_imported():
+    """测试只加载所选的ccxt交易所模块"""
+    code = (
+        "import sys\n"
+        "from data_fetcher import DataFetcher\n"
+        "DataFetcher(exchange_id='okx')\n"
+        "exchanges = [m for m in sys.modules if m in ('ccxt.okx', 'ccxt.binance', 'ccxt.bybit')]\n"
+        "print(','.join(exchanges))\n"
+        "import ccxt\n"
+        "print(ccxt.binance.__name__)\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            check=True).stdout.split()
+    assert output[0] == 'ccxt.okx'
+    # 访问其他包级属性时自动完成完整加载
+    assert output[1] == 'binance'
+    print("✅ 只加载了 ccxt.okx，访问 ccxt.binance 时自动完整加载")
+
+
+def test_only_selected_async_exchange_is_imported():
+    """测试异步获取器只加载所选的ccxt异步交易所模块"""
+    code = (
+        "import asyncio, sys\n"
+        "from async_data_fetcher import AsyncDataFetcher\n"
+        "fetcher = AsyncDataFetcher(exchange_id='okx')\n"
+        "names = [prefix + exchange for prefix in ('ccxt.', 'ccxt.async_support.') for exchange in ('okx', 'binance')]\n"
+        "print(','.join(m for m in sys.modules if m in names))\n"
+        "asyncio.run(fetcher.close())\n"
+        "import ccxt.async_support\n"
+        "print(ccxt.async_support.binance.__name__)\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            check=True).stdout.split()
+    assert output[0] == 'ccxt.async_support.okx'
+    assert output[1] == 'binance'
+    print("✅ 异步获取器只加载了 ccxt.async_support.okx，访问其他交易所时自动完整加载")
+
+
+if __name__ == '__main__':
+    test_entry_points_defer_heavy_imports()
+    test_only_selected_exchange_is_imported()
+    test_only_selected_async_exchange_is_imported()
+    print("\n🎉 所有测试通过！")
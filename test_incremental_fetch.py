@@ -0,0 +1,64 @@
+"""
+测试增量K线获取功能
+验证缓存命中时只拉取最新K线，并正确更新未收盘K线、去除重叠，返回值不与缓存共享
+"""
+import sys
+from data_fetcher import DataFetcher
+from testkit import MINUTE, FakeExchange
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+def test_incremental_fetch():
+    """测试增量获取"""
+    print("=" * 80)
+    print("🧪 增量K线获取测试")
+    print("=" * 80)
+
+    fetcher = DataFetcher(exchange_id='binance')
+    exchange = FakeExchange(now_ms=1_700_000_030_000)
+    fetcher.exchange = exchange
+
+    # 1. 首次获取：全量
+    df = fetcher.fetch_kline_data('ETH/USDT', '1m', limit=100, incremental=True)
+    assert len(df) == 100
+    assert exchange.calls[-1]['since'] is None
+    print("✅ 首次全量获取 100 条")
+
+    # 2. 同一根K线内再次获取：since=最后一根，未收盘K线原地更新
+    first_close = df['close'].iloc[-1]
+    exchange.now_ms += 20_000
+    df = fetcher.fetch_kline_data('ETH/USDT', '1m', limit=100, incremental=True)
+    assert exchange.calls[-1]['since'] is not None
+    assert len(df) == 100
+    assert df['timestamp'].is_unique
+    assert df['close'].iloc[-1] != first_close
+    print("✅ 未收盘K线已原地更新")
+
+    # 3. 跨越两根K线：新增K线追加，窗口保持100条且时间连续
+    exchange.now_ms += 2 * MINUTE
+    df = fetcher.fetch_kline_data('ETH/USDT', '1m', limit=100, incremental=True)
+    diffs = df['timestamp'].diff().dropna().dt.total_seconds().unique()
+    assert len(df) == 100 and list(diffs) == [60.0]
+    print("✅ 新K线追加后无重复、无缺口")
+
+    # 3b. 修改返回的K线列表不影响缓存
+    ohlcv = fetcher.fetch_ohlcv('ETH/USDT', '1m', limit=100, incremental=True)
+    expected = [list(candle) for candle in ohlcv]
+    ohlcv[-1][4] = -1.0
+    del ohlcv[:50]
+    exchange.now_ms += 1_000
+    again = fetcher.fetch_ohlcv('ETH/USDT', '1m', limit=100, incremental=True)
+    assert len(again) == 100 and again[:-1] == expected[:-1] and again[-1][4] > 0
+    print("✅ 返回值是缓存的副本")
+
+    # 4. 长时间中断后退回全量获取
+    exchange.now_ms += 500 * MINUTE
+    fetcher.fetch_kline_data('ETH/USDT', '1m', limit=100, incremental=True)
+    assert exchange.calls[-1]['since'] is None
+    print("✅ 间隔过长时退回全量获取")
+
+
+if __name__ == '__main__':
+    test_incremental_fetch()
+    print("\n🎉 所有测试通过！")
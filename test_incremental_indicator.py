@@ -0,0 +1,115 @@
+"""
+测试增量指标
+验证逐根更新（含未收盘K线的多次替换）得到的BOLL和RSI与批量计算结果一致，横盘窗口的触轨判断与完整计算相同
+"""
+import math
+import random
+import sys
+
+import numpy as np
+import pandas as pd
+
+from incremental_indicator import IncrementalBollinger, IncrementalIndicators, IncrementalRSI
+from indicator import (calculate_all_indicators, calculate_bollinger_bands, calculate_rsi, compute_indicator_arrays,
+                       get_latest_indicators)
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+def random_walk(count, seed=11, start=3000.0):
+    rng = random.Random(seed)
+    closes = [start]
+    for _ in range(count - 1):
+        closes.append(closes[-1] + rng.uniform(-6, 6))
+    return closes
+
+
+def close_enough(a, b, tol=1e-7):
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return math.isclose(a, b, rel_tol=tol, abs_tol=tol)
+
+
+def test_incremental_indicator():
+    """测试增量指标与批量计算一致"""
+    print("=" * 80)
+    print("🧪 增量BOLL/RSI测试")
+    print("=" * 80)
+
+    closes = random_walk(3000)
+    df = pd.DataFrame({'close': closes})
+    batch = calculate_rsi(calculate_bollinger_bands(df, period=20, std_dev=2.0), period=14)
+
+    # 1. 逐根更新，每根K线先经历几次未收盘的替换；较小的重算间隔也覆盖定期同步
+    rng = random.Random(5)
+    for resync_every in (1000, 37):
+        boll = IncrementalBollinger(20, 2.0, resync_every=resync_every)
+        rsi = IncrementalRSI(14, resync_every=resync_every)
+        for i, close in enumerate(closes):
+            boll.update(close + rng.uniform(-3, 3))
+            rsi.update(close + rng.uniform(-3, 3))
+            for _ in range(rng.randint(0, 3)):
+                boll.replace_last(close + rng.uniform(-3, 3))
+                rsi.replace_last(close + rng.uniform(-3, 3))
+            upper, middle, lower = boll.replace_last(close)
+            value = rsi.replace_last(close)
+
+            row = batch.iloc[i]
+            assert close_enough(upper, row['boll_upper']), (i, upper, row['boll_upper'])
+            assert close_enough(middle, row['boll_middle']), i
+            assert close_enough(lower, row['boll_lower']), i
+            assert close_enough(value, row['rsi']), (i, value, row['rsi'])
+    print("✅ 3000根K线逐根结果与批量计算一致（含未收盘替换和定期同步）")
+
+    # 2. 边界：单边上涨时RSI为100，横盘时为NaN（与批量计算相同）
+    for series in ([100.0 + i for i in range(30)], [100.0] * 30,
+                   [100.0] * 10 + [101.0] + [100.0] * 19):
+        rsi = IncrementalRSI(14)
+        for close in series:
+            value = rsi.update(close)
+        expected = calculate_rsi(pd.DataFrame({'close': series}), 14)['rsi'].iloc[-1]
+        assert close_enough(value, expected), (value, expected)
+    print("✅ 单边行情和横盘行情的RSI一致")
+
+    # 3. 按K线处理：与 get_latest_indicators 输出相同的字典
+    start_ts = 1764230400000
+    ohlcv = [[start_ts + i * 60_000, c, c + 1, c - 1, c, 1.0] for i, c in enumerate(closes[:200])]
+    tracker = IncrementalIndicators(20, 2.0, 14)
+    for end in range(1, len(ohlcv) + 1, 7):
+        latest = tracker.extend(ohlcv[:end])
+    latest = tracker.extend(ohlcv)
+    frame = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='ms')
+    expected = get_latest_indicators(calculate_all_indicators(frame))
+    assert latest['timestamp'] == expected['timestamp'].to_pydatetime()
+    for name in ('close', 'boll_upper', 'boll_middle', 'boll_lower', 'rsi', 'boll_position'):
+        assert close_enough(latest[name], expected[name]), name
+    print("✅ 指标字典与 get_latest_indicators 一致")
+
+    # 4. 含横盘的阶梯行情：逐根推送的布林带与 compute_indicator_arrays 完全一致（横盘时下轨等于收盘价）
+    rng = random.Random(13)
+    steps = []
+    level = 3123.45
+    while len(steps) < 3000:
+        level = round(level + rng.choice([-0.05, 0.05]), 2)
+        steps.extend([level] * rng.randint(5, 40))
+    ohlcv = [[start_ts + i * 60_000, c, c, c, c, 1.0] for i, c in enumerate(steps[:3000])]
+    arrays = compute_indicator_arrays(np.array(steps[:3000]))
+    tracker = IncrementalIndicators(20, 2.0, 14)
+    flat = 0
+    for i in range(len(ohlcv)):
+        latest = tracker.extend(ohlcv[max(0, i - 99):i + 1])
+        for name in ('boll_upper', 'boll_middle', 'boll_lower'):
+            assert close_enough(latest[name], arrays[name][i]), (i, name)
+        assert (latest['close'] <= latest['boll_lower']) == (steps[i] <= arrays['boll_lower'][i]), i
+        if i >= 19 and len(set(steps[i - 19:i + 1])) == 1:
+            flat += 1
+            assert latest['boll_lower'] == latest['close'] == arrays['boll_lower'][i]
+    assert flat > 500
+    print(f"✅ {flat} 个横盘窗口的逐根布林带与完整计算一致")
+
+
+if __name__ == '__main__':
+    test_incremental_indicator()
+    print("\n🎉 所有测试通过！")
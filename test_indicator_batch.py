@@ -0,0 +1,86 @@
+"""
+测试批量指标计算
+验证 (交易对数 × K线数) 的批量结果与逐个交易对计算一致，包括开头补NaN的不等长历史
+"""
+import sys
+import time
+
+import numpy as np
+
+import indicator_batch
+from indicator import compute_indicator_arrays
+from indicator_batch import (BATCH_OUTPUTS, compute_indicator_batch, latest_indicator_batch, scan_symbols,
+                             stack_closes)
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+def test_indicator_batch():
+    """测试批量指标计算"""
+    print("=" * 80)
+    print("🧪 批量指标计算测试")
+    print("=" * 80)
+
+    rng = np.random.default_rng(18)
+    lengths = [100, 100, 60, 21, 20, 19, 5, 0, 300]
+    histories = [rng.uniform(0.1, 5000) + np.cumsum(rng.normal(0, 1, size)) for size in lengths]
+    histories.append(np.r_[np.full(30, 100.0), 101.0, np.full(30, 100.0)])
+
+    # 1. 右对齐、开头补NaN
+    closes = stack_closes(histories)
+    assert closes.shape == (len(histories), 300)
+    assert np.isnan(closes[2, :240]).all() and np.array_equal(closes[2, 240:], histories[2])
+    assert np.isnan(closes[7]).all()
+    assert stack_closes(histories, length=50).shape == (len(histories), 50)
+    print("✅ 不等长历史右对齐补NaN")
+
+    # 2. 每一行与单独计算一致（小分块覆盖跨块窗口）
+    original_block = indicator_batch.KERNEL_BLOCK
+    try:
+        for block in (original_block, 64):
+            indicator_batch.KERNEL_BLOCK = block
+            result = compute_indicator_batch(closes, 20, 2.0, 14)
+            for i, history in enumerate(histories):
+                expected = compute_indicator_arrays(history, 20, 2.0, 14)
+                pad = closes.shape[1] - len(history)
+                for name in BATCH_OUTPUTS:
+                    assert np.isnan(result[name][i, :pad]).all(), (i, name)
+                    assert np.allclose(result[name][i, pad:], expected[name], rtol=1e-9, atol=1e-6,
+                                       equal_nan=True), (block, i, name)
+                assert np.array_equal(np.isnan(result['rsi'][i, pad:]), np.isnan(expected['rsi'])), i
+    finally:
+        indicator_batch.KERNEL_BLOCK = original_block
+    print("✅ 批量结果与逐个交易对计算一致（含横盘RSI为NaN的情况）")
+
+    # 3. 每个交易对的最新值
+    latest = latest_indicator_batch(closes)
+    for i, history in enumerate(histories):
+        if len(history) == 0:
+            assert np.isnan(latest['close'][i]) and np.isnan(latest['rsi'][i])
+            continue
+        expected = compute_indicator_arrays(history)
+        assert latest['close'][i] == history[-1]
+        for name in BATCH_OUTPUTS:
+            assert np.allclose(latest[name][i], expected[name][-1], rtol=1e-9, atol=1e-6, equal_nan=True)
+    scanned = scan_symbols({'ETH/USDT': histories[0], 'BTC/USDT': histories[8]})
+    assert list(scanned) == ['ETH/USDT', 'BTC/USDT']
+    assert scanned['BTC/USDT']['close'] == histories[8][-1]
+    assert latest_indicator_batch(np.empty((3, 0)))['rsi'].shape == (3,)
+    print("✅ 每个交易对的最新指标正确")
+
+    # 4. 批量计算比逐个计算快
+    closes = 3000 + np.cumsum(rng.normal(0, 3, (500, 100)), axis=1)
+    start = time.perf_counter()
+    for row in closes:
+        compute_indicator_arrays(row)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    latest_indicator_batch(closes)
+    batch_time = time.perf_counter() - start
+    print(f"✅ 500个交易对: 逐个 {loop_time * 1000:.1f}ms, 批量 {batch_time * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    test_indicator_batch()
+    print("\n🎉 所有测试通过！")
@@ -0,0 +1,98 @@
+"""
+测试指标结果缓存
+验证命中/增量扩展/淘汰，以及扩展得到的结果与完整计算一致
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from candle_buffer import CandleBuffer
+from indicator import calculate_all_indicators, compute_indicator_arrays
+from indicator_cache import IndicatorCache
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+MINUTE = 60000
+
+
+def assert_matches(outputs, close, **params):
+    expected = compute_indicator_arrays(close, **params)
+    for name, values in expected.items():
+        assert np.allclose(outputs[name], values, rtol=1e-9, atol=1e-6, equal_nan=True), name
+        assert np.array_equal(np.isnan(outputs[name]), np.isnan(values)), name
+
+
+def test_indicator_cache():
+    """测试指标缓存"""
+    print("=" * 80)
+    print("🧪 指标结果缓存测试")
+    print("=" * 80)
+
+    rng = np.random.default_rng(20)
+    close = 3000 + np.cumsum(rng.normal(0, 4, 400))
+    timestamps = np.arange(len(close)) * MINUTE
+    cache = IndicatorCache()
+
+    # 1. 相同输入和参数命中缓存，参数不同则重新计算
+    first = cache.compute(timestamps[:100], close[:100])
+    assert cache.compute(timestamps[:100], close[:100].copy()) is first
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    assert not first['rsi'].flags.writeable
+    cache.compute(timestamps[:100], close[:100], boll_period=30)
+    assert cache.stats()['misses'] == 2
+    print("✅ 相同输入命中缓存，参数不同时重新计算")
+
+    # 2. 当前K线价格更新、新K线收盘（窗口前移）时增量扩展，结果与完整计算一致
+    updated = close[:100].copy()
+    updated[-1] += 7.5
+    assert_matches(cache.compute(timestamps[:100], updated), updated)
+    for end in range(101, 130):
+        assert_matches(cache.compute(timestamps[end - 100:end], close[end - 100:end]), close[end - 100:end])
+    assert_matches(cache.compute(timestamps[130:230], close[130:230], rsi_period=6), close[130:230], rsi_period=6)
+    stats = cache.stats()
+    assert stats['extended'] == 30, stats
+    print(f"✅ 最新K线变化时增量扩展（{stats['extended']} 次），结果与完整计算一致")
+
+    # 3. 内容不同（校验和不同）不会误命中；差异太大时完整计算
+    changed = close[200:300].copy()
+    changed[10] += 1.0
+    before = cache.stats()['misses']
+    assert_matches(cache.compute(timestamps[200:300], close[200:300]), close[200:300])
+    assert_matches(cache.compute(timestamps[200:300], changed), changed)
+    assert cache.stats()['misses'] == before + 2
+    wilder = cache.compute(timestamps[201:301], close[201:301], wilder=True)
+    assert_matches(wilder, close[201:301], wilder=True)
+    print("✅ 内容变化重新计算，Wilder RSI不做增量扩展")
+
+    # 4. 按条目数和字节数淘汰
+    small = IndicatorCache(max_entries=3)
+    for i in range(5):
+        small.compute(timestamps[i * 50:i * 50 + 50], close[i * 50:i * 50 + 50] * (i + 2))
+    assert len(small) == 3 and small.stats()['evictions'] == 2
+    small.compute(timestamps[100:150], close[100:150] * 4)
+    assert small.stats()['hits'] == 1
+    tiny = IndicatorCache(max_bytes=10000)
+    for i in range(4):
+        tiny.compute(timestamps[:100], close[:100] + i * 100)
+    assert len(tiny) == 1 and tiny.nbytes <= 10000
+    print("✅ LRU按条目数和字节数淘汰")
+
+    # 5. DataFrame和K线缓冲区输入
+    ohlcv = [[int(t), c, c + 1, c - 1, c, 1.0] for t, c in zip(timestamps[:100], close[:100])]
+    frame = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'], unit='ms')
+    result = IndicatorCache().calculate_all_indicators(frame)
+    expected = calculate_all_indicators(frame)
+    for name in ('boll_upper', 'boll_middle', 'boll_lower', 'rsi'):
+        assert np.allclose(result[name], expected[name], rtol=1e-9, atol=1e-7, equal_nan=True)
+    series = cache.calculate_all_indicators(CandleBuffer.from_ohlcv(ohlcv))
+    assert np.array_equal(series['timestamp'], timestamps[:100])
+    assert_matches(series, close[:100])
+    print("✅ DataFrame和K线缓冲区输入与 calculate_all_indicators 一致")
+
+
+if __name__ == '__main__':
+    test_indicator_cache()
+    print("\n🎉 所有测试通过！")
@@ -0,0 +1,104 @@
+"""
+测试参数网格指标
+验证网格中每个组合的结果（包括横盘窗口）与单独计算一致，并对比逐个组合计算的耗时
+"""
+import sys
+import time
+
+import numpy as np
+
+import indicator_grid
+from indicator import compute_indicator_arrays
+from indicator_grid import compute_indicator_grid
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+def test_indicator_grid():
+    """测试参数网格"""
+    print("=" * 80)
+    print("🧪 参数网格指标测试")
+    print("=" * 80)
+
+    rng = np.random.default_rng(9)
+    close = 3000 + np.cumsum(rng.normal(0, 3, 700))
+    boll_periods = [2, 10, 20, 33]
+    std_devs = [1.0, 1.5, 2.0, 2.7]
+    rsi_periods = [3, 14, 30]
+
+    # 1. 每个组合都与单独计算一致（较小的分块覆盖跨块窗口）
+    original_block = indicator_grid.KERNEL_BLOCK
+    try:
+        indicator_grid.KERNEL_BLOCK = 128
+        grid = compute_indicator_grid(close, boll_periods, std_devs, rsi_periods)
+    finally:
+        indicator_grid.KERNEL_BLOCK = original_block
+
+    assert grid.shape == (4, 4, 3, 700)
+    assert grid.boll_upper.shape == (4, 4, 700) and grid.rsi.shape == (3, 700)
+    for i, period in enumerate(boll_periods):
+        for j, std_dev in enumerate(std_devs):
+            for k, rsi_period in enumerate(rsi_periods):
+                expected = compute_indicator_arrays(close, period, std_dev, rsi_period)
+                selected = grid.select(i, j, k)
+                assert np.array_equal(selected['boll_upper'], grid.boll_upper[i, j], equal_nan=True)
+                for name, values in selected.items():
+                    # 带宽很窄时价格位置对误差敏感，放宽绝对误差
+                    atol = 1e-4 if name == 'boll_position' else 1e-7
+                    assert np.allclose(values, expected[name], rtol=1e-9, atol=atol, equal_nan=True), \
+                        (period, std_dev, rsi_period, name)
+    print("✅ 网格中每个组合与单独计算一致")
+
+    latest = grid.latest()
+    assert latest['boll_position'].shape == (4, 4) and latest['rsi'].shape == (3,)
+    assert np.allclose(latest['boll_position'], grid.boll_position[:, :, -1])
+    assert np.array_equal(latest['rsi'], grid.rsi[:, -1])
+    print("✅ 最新值不生成整个张量")
+
+    # 2. 横盘窗口：标准差为精确的0，上/下轨等于收盘价，价格位置为NaN，触轨判断与单独计算一致
+    levels = np.round(3123.45 + np.cumsum(rng.choice([-0.05, 0.05], 200)), 2)
+    close = np.repeat(levels, rng.integers(5, 40, 200))
+    grid = compute_indicator_grid(close, boll_periods, std_devs, rsi_periods)
+    flat_windows = 0
+    for i, period in enumerate(boll_periods):
+        windows = np.lib.stride_tricks.sliding_window_view(close, period)
+        flat = np.r_[np.zeros(period - 1, dtype=bool), (windows == windows[:, :1]).all(axis=1)]
+        flat_windows += flat.sum()
+        for j, std_dev in enumerate(std_devs):
+            expected = compute_indicator_arrays(close, period, std_dev, 14)
+            for name in ('boll_upper', 'boll_middle', 'boll_lower'):
+                values = grid.boll_middle[i] if name == 'boll_middle' else getattr(grid, name)[i, j]
+                assert np.allclose(values, expected[name], rtol=1e-9, atol=1e-7, equal_nan=True), (period, name)
+            assert np.array_equal(np.isnan(grid.boll_position[i, j]), np.isnan(expected['boll_position']))
+            # 横盘窗口逐位精确一致（非横盘窗口中恰好落在轨道上的价格只能保证在浮点误差内一致）
+            for name in ('boll_upper', 'boll_middle', 'boll_lower'):
+                values = grid.boll_middle[i] if name == 'boll_middle' else getattr(grid, name)[i, j]
+                assert (values[flat] == close[flat]).all() and (expected[name][flat] == close[flat]).all()
+            assert np.isnan(grid.boll_position[i, j][flat]).all()
+    assert flat_windows > 500
+    print(f"✅ {flat_windows} 个横盘窗口的结果与单独计算一致")
+
+    # 3. 50x20x20 的网格与逐个组合计算的耗时对比
+    close = 3000 + np.cumsum(rng.normal(0, 3, 2000))
+    boll_periods = list(range(10, 60))
+    std_devs = list(np.linspace(1.0, 3.0, 20))
+    rsi_periods = list(range(5, 25))
+
+    started = time.perf_counter()
+    compute_indicator_grid(close, boll_periods, std_devs, rsi_periods).latest()
+    grid_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for period in boll_periods[:5]:
+        for std_dev in std_devs[:2]:
+            compute_indicator_arrays(close, period, std_dev, 14)
+    single_time = (time.perf_counter() - started) / 10
+    print(f"✅ 20000个组合耗时 {grid_time * 1000:.1f}ms，"
+          f"约等于 {grid_time / single_time:.0f} 次单独计算")
+    assert grid_time < single_time * 200
+
+
+if __name__ == '__main__':
+    test_indicator_grid()
+    print("\n🎉 所有测试通过！")
@@ -0,0 +1,129 @@
+"""
+测试NumPy指标内核
+验证分块前缀和计算的BOLL/RSI与pandas实现一致，Wilder平滑与逐根递推一致，
+横盘窗口的触轨判断在完整计算、只算最后几根和批量计算之间一致
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+import indicator
+from candle_buffer import CandleBuffer
+from indicator import (calculate_all_indicators, calculate_rsi, compute_indicator_arrays, compute_latest,
+                       get_latest_indicators)
+from indicator_batch import compute_indicator_batch
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+def wilder_reference(close, period):
+    """逐根递推的Wilder RSI（种子为前period个涨跌幅的均值，第一根涨跌计为0）"""
+    rsi = np.full(len(close), np.nan)
+    if len(close) < period:
+        return rsi
+    delta = np.concatenate(([0.0], np.diff(close)))
+    gains, losses = np.maximum(delta, 0), np.maximum(-delta, 0)
+    avg_gain, avg_loss = gains[:period].mean(), losses[:period].mean()
+    for i in range(period - 1, len(close)):
+        if i >= period:
+            avg_gain += (gains[i] - avg_gain) / period
+            avg_loss += (losses[i] - avg_loss) / period
+        rsi[i] = np.nan if avg_gain == avg_loss == 0 else 100.0 if avg_loss == 0 else \
+            100 - 100 / (1 + avg_gain / avg_loss)
+    return rsi
+
+
+def test_indicator_kernels():
+    """测试指标内核"""
+    print("=" * 80)
+    print("🧪 NumPy指标内核测试")
+    print("=" * 80)
+
+    rng = np.random.default_rng(42)
+    original_block = indicator.KERNEL_BLOCK
+    try:
+        # 1. 与pandas实现一致（用较小的分块覆盖跨块窗口）
+        indicator.KERNEL_BLOCK = 64
+        for size in (5, 19, 20, 21, 100, 5000):
+            close = 3000 + np.cumsum(rng.normal(0, 3, size))
+            expected = calculate_rsi(pd.DataFrame({'close': close}))
+            rolling = expected['close'].rolling(20)
+            expected['boll_middle'] = rolling.mean()
+            expected['boll_upper'] = rolling.mean() + 2 * rolling.std()
+            expected['boll_lower'] = rolling.mean() - 2 * rolling.std()
+            result = compute_indicator_arrays(close)
+            for name in ('boll_upper', 'boll_middle', 'boll_lower', 'rsi'):
+                assert np.allclose(result[name], expected[name].to_numpy(), rtol=1e-9, atol=1e-7,
+                                   equal_nan=True), (size, name)
+            position = (close - expected['boll_lower']) / (expected['boll_upper'] - expected['boll_lower']) * 100
+            assert np.allclose(result['boll_position'], position.to_numpy(), atol=1e-6, equal_nan=True)
+        print("✅ BOLL、价格位置、RSI与pandas一致")
+
+        # 2. 横盘和单边行情：RSI为NaN/100，与pandas相同
+        for close in (np.full(40, 100.0), np.arange(40, dtype=float) + 100,
+                      np.r_[np.full(15, 100.0), 101.0, np.full(30, 100.0)]):
+            expected = calculate_rsi(pd.DataFrame({'close': close}))['rsi'].to_numpy()
+            assert np.array_equal(compute_indicator_arrays(close)['rsi'], expected, equal_nan=True)
+        print("✅ 横盘和单边行情的RSI精确一致")
+
+        # 3. Wilder平滑与逐根递推一致
+        for period in (2, 14, 30):
+            close = 3000 + np.cumsum(rng.normal(0, 3, 3000))
+            result = compute_indicator_arrays(close, rsi_period=period, wilder=True)['rsi']
+            assert np.allclose(result, wilder_reference(close, period), rtol=1e-9, atol=1e-9, equal_nan=True)
+        frame = calculate_rsi(pd.DataFrame({'close': close}), 30, wilder=True)
+        assert np.allclose(frame['rsi'].to_numpy(), wilder_reference(close, 30), equal_nan=True)
+        print("✅ Wilder平滑RSI与逐根递推一致")
+
+        # 4. 只计算最后几根K线，与完整计算一致
+        indicator.KERNEL_BLOCK = original_block
+        close = 3000 + np.cumsum(rng.normal(0, 3, 500))
+        flat = np.r_[close[:100], np.full(40, close[99])]
+        for values in (close, flat, close[:25], close[:14], close[:3], close[:0]):
+            for wilder in (False, True):
+                full = compute_indicator_arrays(values, 20, 2.0, 14, wilder)
+                for last in (1, 5, 30, 1000):
+                    tail = compute_latest(values, 20, 2.0, 14, wilder, last=last)
+                    rows = min(last, len(values))
+                    for name, series in full.items():
+                        expected = series[len(values) - rows:]
+                        assert len(tail[name]) == rows
+                        assert np.array_equal(np.isnan(tail[name]), np.isnan(expected)), (len(values), name, last)
+                        assert np.allclose(tail[name], expected, rtol=1e-9, atol=1e-6, equal_nan=True), \
+                            (len(values), name, last, tail[name][-3:], expected[-3:])
+        assert compute_latest(flat)['rsi'][0] != compute_latest(flat)['rsi'][0]
+        assert compute_latest(np.arange(40.0))['rsi'][0] == 100.0
+
+        candles = CandleBuffer.from_ohlcv([[i * 60000, c, c + 1, c - 1, c, 1.0] for i, c in enumerate(close)])
+        latest = get_latest_indicators(calculate_all_indicators(candles, tail=1))
+        expected = get_latest_indicators(calculate_all_indicators(candles))
+        assert latest['timestamp'] == expected['timestamp'] and latest['close'] == expected['close']
+        for name in ('boll_upper', 'boll_middle', 'boll_lower', 'boll_position', 'rsi'):
+            assert np.isclose(latest[name], expected[name], rtol=1e-9)
+        print("✅ 只计算最后几根K线的结果与完整计算一致")
+
+        # 5. 横盘窗口的触轨判断：完整计算、只算最后几根和批量计算一致（标准差为精确的0，下轨等于收盘价）
+        levels = np.round(3123.45 + np.cumsum(rng.choice([-0.05, 0.05], 400)), 2)
+        close = np.repeat(levels, rng.integers(5, 40, 400))
+        windows = np.lib.stride_tricks.sliding_window_view(close, 20)
+        flat = np.r_[np.zeros(19, dtype=bool), (windows == windows[:, :1]).all(axis=1)]
+        assert flat.sum() > 100
+        full = compute_indicator_arrays(close)
+        tail = compute_latest(close, last=len(close))
+        batch = compute_indicator_batch(close[None, :])
+        for result in (tail, {name: values[0] for name, values in batch.items()}):
+            with np.errstate(invalid='ignore'):
+                assert np.array_equal(close <= result['boll_lower'], close <= full['boll_lower'])
+                assert np.array_equal(close >= result['boll_upper'], close >= full['boll_upper'])
+        assert (full['boll_lower'][flat] == close[flat]).all() and (full['boll_upper'][flat] == close[flat]).all()
+        assert np.isnan(full['boll_position'][flat]).all()
+        print(f"✅ {flat.sum()} 个横盘窗口的触轨判断在各计算路径间一致")
+    finally:
+        indicator.KERNEL_BLOCK = original_block
+
+
+if __name__ == '__main__':
+    test_indicator_kernels()
+    print("\n🎉 所有测试通过！")
@@ -0,0 +1,148 @@
+"""
+测试指标注册表
+验证依赖图中共用的中间结果只计算一次，各指标与现有实现/pandas参考一致（BOLL包括横盘窗口逐位相同），滚动运算中的NaN只影响所在窗口
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+import indicator_registry
+from candle_buffer import CandleBuffer
+from indicator import calculate_all_indicators, compute_indicator_arrays
+from indicator_registry import Plan, col, evaluate, register_indicator, rolling_std, shift, sma
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+def test_indicator_registry():
+    """测试指标注册表"""
+    print("=" * 80)
+    print("🧪 指标注册表测试")
+    print("=" * 80)
+
+    rng = np.random.default_rng(17)
+    close = 3000 + np.cumsum(rng.normal(0, 5, 3000))
+    high = close + rng.uniform(0, 4, len(close))
+    low = close - rng.uniform(0, 4, len(close))
+    data = {'close': close, 'high': high, 'low': low}
+
+    # 1. BOLL/RSI与 compute_indicator_arrays 一致
+    result = evaluate(data, [('boll', {'period': 20, 'std_dev': 2.0}), ('rsi', {'period': 14})])
+    expected = compute_indicator_arrays(close, 20, 2.0, 14)
+    for name in ('boll_upper', 'boll_middle', 'boll_lower', 'boll_position', 'rsi'):
+        assert np.allclose(result[name], expected[name], rtol=1e-9, atol=1e-6, equal_nan=True), name
+    wilder = evaluate(data, [('rsi', {'period': 14, 'wilder_smoothing': True})])['rsi']
+    assert np.allclose(wilder, compute_indicator_arrays(close, rsi_period=14, wilder=True)['rsi'],
+                       rtol=1e-9, atol=1e-9, equal_nan=True)
+    flat = evaluate({'close': np.full(40, 100.0)}, ['rsi'])['rsi']
+    assert np.isnan(flat).all()
+
+    # 横盘较多的行情：上/中/下轨与 compute_indicator_arrays、calculate_all_indicators 逐位相同
+    levels = np.round(3123.45 + np.cumsum(rng.choice([-0.05, 0.05], 400)), 2)
+    stepped = np.repeat(levels, rng.integers(5, 40, 400))
+    windows = np.lib.stride_tricks.sliding_window_view(stepped, 20)
+    flat = np.r_[np.zeros(19, dtype=bool), (windows == windows[:, :1]).all(axis=1)]
+    assert flat.sum() > 500
+    result = evaluate({'close': stepped}, [('boll', {'period': 20, 'std_dev': 2.0})])
+    expected = compute_indicator_arrays(stepped, 20, 2.0, 14)
+    frame = calculate_all_indicators(pd.DataFrame({'close': stepped}))
+    for name in ('boll_upper', 'boll_middle', 'boll_lower'):
+        assert np.array_equal(result[name], expected[name], equal_nan=True), name
+        assert np.array_equal(frame[name].to_numpy(), expected[name], equal_nan=True), name
+    assert (result['boll_lower'][flat] == stepped[flat]).all()
+    assert np.isnan(result['boll_position'][flat]).all()
+    assert np.allclose(result['boll_position'], expected['boll_position'], atol=1e-6, equal_nan=True)
+    assert np.array_equal(np.isnan(result['boll_position']), np.isnan(expected['boll_position']))
+    print(f"✅ BOLL、RSI与现有实现一致，{flat.sum()} 个横盘窗口逐位相同")
+
+    # 2. EMA、MACD、ATR与pandas参考一致
+    series = pd.Series(close)
+    result = evaluate(data, [('ema', {'span': 20}), 'macd', ('atr', {'period': 14})])
+    assert np.allclose(result['ema_20'], series.ewm(span=20, adjust=False).mean(), rtol=1e-9)
+    line = series.ewm(span=12, adjust=False).mean() - series.ewm(span=26, adjust=False).mean()
+    signal = line.ewm(span=9, adjust=False).mean()
+    assert np.allclose(result['macd'], line, rtol=1e-9, atol=1e-9)
+    assert np.allclose(result['macd_signal'], signal, rtol=1e-9, atol=1e-9)
+    assert np.allclose(result['macd_hist'], line - signal, rtol=1e-9, atol=1e-9)
+
+    prev_close = series.shift(1)
+    true_range = pd.concat([pd.Series(high - low), (pd.Series(high) - prev_close).abs(),
+                            (pd.Series(low) - prev_close).abs()], axis=1).max(axis=1).to_numpy()
+    atr = np.full(len(close), np.nan)
+    atr[13] = true_range[:14].mean()
+    for i in range(14, len(close)):
+        atr[i] = atr[i - 1] + (true_range[i] - atr[i - 1]) / 14
+    assert np.allclose(result['atr'], atr, rtol=1e-9, equal_nan=True)
+    print("✅ EMA、MACD、ATR与pandas参考一致")
+
+    # 3. 共用中间结果只计算一次，只计算请求的指标
+    boll_only = Plan([('boll', {'period': 20})])
+    both = Plan([('boll', {'period': 20}), ('sma', {'period': 20}), 'macd', ('ema', {'span': 12}),
+                 ('ema', {'span': 26})])
+    keys = [node.key for node in both.nodes]
+    assert len(keys) == len(set(keys))
+    assert sum(node.op == 'rolling_mean' for node in both.nodes) == 1
+    assert sum(node.op == 'rolling_std' for node in both.nodes) == 1
+    assert sum(node.op == 'ema' for node in both.nodes) == 3
+    assert boll_only.columns == ['close']
+    assert not any(node.op in ('ema', 'wilder', 'diff') for node in boll_only.nodes)
+    try:
+        Plan([('boll', {'period': 20}), ('boll', {'period': 30})])
+        assert False
+    except ValueError:
+        pass
+
+    calls = []
+    original = indicator_registry.PRIMITIVES['rolling_std']
+    indicator_registry.PRIMITIVES['rolling_std'] = lambda *args: calls.append(args) or original(*args)
+    try:
+        both.run(data)
+    finally:
+        indicator_registry.PRIMITIVES['rolling_std'] = original
+    assert len(calls) == 1
+    print(f"✅ 5个指标共 {len(both.nodes)} 个节点（单独BOLL {len(boll_only.nodes)} 个），共用的SMA/EMA只计算一次")
+
+    # 4. 注册新指标，并直接使用K线缓冲区
+    @register_indicator('momentum')
+    def momentum(period=10):
+        close = col('close')
+        return {f'momentum_{period}': close - shift(close, period)}
+
+    buffer = CandleBuffer.from_ohlcv([[i * 60000, c, h, l, c, 1.0] for i, (c, h, l)
+                                      in enumerate(zip(close, high, low))], capacity=len(close))
+    result = evaluate(buffer, [('momentum', {'period': 5}), 'atr'])
+    assert np.allclose(result['momentum_5'][5:], close[5:] - close[:-5])
+    assert np.isnan(result['momentum_5'][:5]).all()
+    assert np.allclose(result['atr'], atr, rtol=1e-9, equal_nan=True)
+    del indicator_registry.INDICATORS['momentum']
+
+    # 5. 滚动运算的输入含NaN（shift的预热、缺失的收盘价）时，只有包含NaN的窗口为NaN
+    @register_indicator('smooth_momentum')
+    def smooth_momentum(period=10, window=5):
+        change = col('close') - shift(col('close'), period)
+        return {'smooth_momentum': sma(change, window), 'momentum_std': rolling_std(change, window)}
+
+    gappy = close.copy()
+    gappy[[1500, 2200, 2201]] = np.nan
+    result = evaluate({'close': gappy}, ['smooth_momentum'])
+    change = pd.Series(gappy) - pd.Series(gappy).shift(10)
+    for name, expected in (('smooth_momentum', change.rolling(5).mean()), ('momentum_std', change.rolling(5).std())):
+        expected = expected.to_numpy()
+        assert np.array_equal(np.isnan(result[name]), np.isnan(expected)), name
+        assert np.allclose(result[name], expected, rtol=1e-9, atol=1e-9, equal_nan=True), name
+    assert np.isfinite(result['smooth_momentum'][1515:2200]).all() and np.isfinite(result['smooth_momentum'][2216:]).all()
+    del indicator_registry.INDICATORS['smooth_momentum']
+
+    try:
+        Plan(['unknown'])
+        assert False
+    except KeyError:
+        pass
+    print("✅ 自定义指标、K线缓冲区输入和含NaN的滚动运算正常")
+
+
+if __name__ == '__main__':
+    test_indicator_registry()
+    print("\n🎉 所有测试通过！")
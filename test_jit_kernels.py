@@ -0,0 +1,87 @@
+"""
+测试递推计算内核
+验证当前后端（numba或纯NumPy）与逐根循环的结果一致，持仓状态机与 SignalDetector.detect_signal 一致
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+import jit_kernels
+from indicator import compute_indicator_arrays
+from jit_kernels import (POSITION_LONG, POSITION_NONE, POSITION_SHORT, SIGNAL_EXIT_LONG, SIGNAL_EXIT_SHORT,
+                         SIGNAL_LONG, SIGNAL_NEUTRAL, SIGNAL_SHORT, ema, position_states, wilder_smooth)
+from signal_detector import SignalDetector, SignalType
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+CODES = {
+    SignalType.NEUTRAL: SIGNAL_NEUTRAL,
+    SignalType.LONG: SIGNAL_LONG,
+    SignalType.SHORT: SIGNAL_SHORT,
+    SignalType.EXIT_LONG: SIGNAL_EXIT_LONG,
+    SignalType.EXIT_SHORT: SIGNAL_EXIT_SHORT
+}
+
+
+def test_jit_kernels():
+    """测试递推内核"""
+    print("=" * 80)
+    print(f"🧪 递推内核测试（后端: {jit_kernels.BACKEND}）")
+    print("=" * 80)
+
+    rng = np.random.default_rng(21)
+    values = rng.uniform(0, 5, 5000)
+
+    # 1. Wilder平滑与逐根循环一致
+    for period in (2, 14, 50):
+        result = wilder_smooth(values, period)
+        expected = np.full(len(values), np.nan)
+        expected[period - 1] = values[:period].mean()
+        expected[period:] = jit_kernels._linear_recurrence_loop(
+            values[period:], (period - 1) / period, 1 / period, expected[period - 1])
+        assert np.allclose(result, expected, rtol=1e-9, equal_nan=True), period
+    assert np.isnan(wilder_smooth(values[:5], 14)).all()
+    print("✅ Wilder平滑与逐根循环一致")
+
+    # 2. EMA与pandas ewm(adjust=False)一致
+    for span in (3, 12, 26):
+        expected = pd.Series(values).ewm(span=span, adjust=False).mean().to_numpy()
+        assert np.allclose(ema(values, span), expected, rtol=1e-9)
+    print("✅ EMA与pandas一致")
+
+    # 3. 持仓状态机：与逐根循环、逐根调用 detect_signal 完全一致
+    close = 3000 + np.cumsum(rng.normal(0, 6, 3000))
+    bands = compute_indicator_arrays(close, 20, 2.0, 14)
+    upper, middle, lower = bands['boll_upper'], bands['boll_middle'], bands['boll_lower']
+    for initial in (POSITION_NONE, POSITION_LONG, POSITION_SHORT):
+        codes, strength, final = position_states(close, upper, middle, lower, initial)
+        loop_codes, loop_strength, loop_final = jit_kernels._position_states_loop(
+            close, upper, middle, lower, initial)
+        numpy_codes, numpy_strength, numpy_final = jit_kernels._position_states_numpy(
+            close, upper, middle, lower, initial)
+        assert np.array_equal(codes, loop_codes) and np.array_equal(numpy_codes, loop_codes)
+        assert np.allclose(strength, loop_strength) and np.allclose(numpy_strength, loop_strength)
+        assert final == loop_final == numpy_final
+    assert {SIGNAL_LONG, SIGNAL_SHORT, SIGNAL_EXIT_LONG, SIGNAL_EXIT_SHORT} <= set(codes.tolist())
+
+    detector = SignalDetector()
+    for i in range(len(close)):
+        signal = detector.detect_signal({
+            'close': close[i], 'rsi': bands['rsi'][i],
+            'boll_upper': upper[i], 'boll_middle': middle[i], 'boll_lower': lower[i]
+        })
+        assert CODES[signal['signal_type']] == codes[i], i
+        assert signal['strength'] == round(strength[i], 2), i
+    print("✅ 持仓状态机与逐根调用 detect_signal 一致")
+
+    # 4. 空输入
+    codes, strength, final = position_states(close[:0], upper[:0], middle[:0], lower[:0], POSITION_LONG)
+    assert len(codes) == 0 and final == POSITION_LONG
+    print("✅ 空输入保持初始持仓")
+
+
+if __name__ == '__main__':
+    test_jit_kernels()
+    print("\n🎉 所有测试通过！")
@@ -0,0 +1,113 @@
+"""
+测试WebSocket K线推送
+使用本地WebSocket服务回放录制的币安K线消息，验证窗口更新、断线重连、重新订阅和REST补齐，
+以及非JSON帧、格式不符的消息和回调出错不会中断推送
+"""
+import asyncio
+import json
+import sys
+
+import websockets
+
+from kline_stream import KlineStream
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+RECORDED_FILE = 'test_kline_stream_recorded.json'
+FIRST_TS = 1764230400000
+
+
+class BackfillFetcher:
+    """模拟REST数据获取器，返回录制数据之前的几根K线"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def fetch_ohlcv(self, symbol, timeframe, limit=100, incremental=False):
+        self.calls += 1
+        return [[FIRST_TS - i * 60_000, 3000.0, 3001.0, 2999.0, 3000.0, 1.0] for i in range(3, 0, -1)]
+
+
+async def _replay():
+    with open(RECORDED_FILE, 'r', encoding='utf-8') as f:
+        recorded = json.load(f)
+
+    subscriptions = []
+    connection_count = 0
+
+    async def handler(ws):
+        nonlocal connection_count
+        connection_count += 1
+        subscriptions.append(json.loads(await ws.recv()))
+        await ws.send(json.dumps({'result': None, 'id': 1}))
+        # 第一个连接回放一半后断开，模拟断线；中间夹杂非JSON帧（OKX的文本pong）和格式不符的K线消息
+        messages = recorded[:4] if connection_count == 1 else recorded[4:]
+        await ws.send('pong')
+        await ws.send(json.dumps({'e': 'kline', 'k': {'t': 'bad'}}))
+        await ws.send(json.dumps([1, 2, 3]))
+        for message in messages:
+            await ws.send(json.dumps(message))
+        if connection_count > 1:
+            await ws.wait_closed()
+
+    events = []
+    fetcher = BackfillFetcher()
+    stream = None
+
+    def on_candle(candles, closed):
+        events.append((candles[-1][0], candles[-1][4], closed))
+        if closed and candles[-1][0] == FIRST_TS + 2 * 60_000:
+            stream.stop()
+        # 回调出错不应中断推送
+        if len(events) % 3 == 0:
+            raise RuntimeError('callback failed')
+
+    async with websockets.serve(handler, '127.0.0.1', 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        stream = KlineStream('ETH/USDT', '1m', on_candle=on_candle, data_fetcher=fetcher,
+                             exchange_id='binance', window=5, url=f'ws://127.0.0.1:{port}',
+                             reconnect_delay=0.05)
+        await asyncio.wait_for(stream.run(), timeout=10)
+
+    return stream, fetcher, subscriptions, events
+
+
+def test_kline_stream():
+    """测试K线推送"""
+    print("=" * 80)
+    print("🧪 WebSocket K线推送测试")
+    print("=" * 80)
+
+    stream, fetcher, subscriptions, events = asyncio.run(_replay())
+
+    # 断线后重连并重新订阅，每次连接都通过REST补齐
+    assert stream.connections == 2
+    assert subscriptions == [{'method': 'SUBSCRIBE', 'params': ['ethusdt@kline_1m'], 'id': 1}] * 2
+    assert fetcher.calls == 2
+    print("✅ 断线重连后重新订阅并补齐缺口")
+
+    # 窗口保持5根K线，时间连续，未收盘K线原地更新
+    timestamps = [candle[0] for candle in stream.candles]
+    assert timestamps == [FIRST_TS + i * 60_000 for i in range(-2, 3)]
+    assert stream.candles[-1][4] == 3018.7
+    assert stream.candles[-2][4] == 3026.8
+    print("✅ K线窗口正确维护")
+
+    closed_events = [event for event in events if event[2]]
+    assert len(events) >= 6
+    assert [event[0] for event in closed_events] == [FIRST_TS + i * 60_000 for i in range(3)]
+    print(f"✅ 共推送 {len(events)} 次事件，其中 {len(closed_events)} 次K线收盘（非JSON帧和回调出错不影响推送）")
+
+    # 不支持的交易所给出明确的错误
+    try:
+        KlineStream('ETH/USDT', '1m', on_candle=print, exchange_id='kraken')
+        assert False, '应当拒绝不支持的交易所'
+    except ValueError as e:
+        assert 'kraken' in str(e)
+    print("✅ 不支持推送的交易所被明确拒绝")
+
+
+if __name__ == '__main__':
+    test_kline_stream()
+    print("\n🎉 所有测试通过！")
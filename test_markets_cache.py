@@ -0,0 +1,86 @@
+"""
+测试市场信息缓存
+验证首次启动下载并缓存markets，之后启动直接从缓存加载并只做轻量连通性检查
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from data_fetcher import DataFetcher
+from markets_cache import MarketsCache
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+MARKET = {
+    'id': 'ETH-USDT', 'symbol': 'ETH/USDT', 'base': 'ETH', 'quote': 'USDT',
+    'baseId': 'ETH', 'quoteId': 'USDT', 'type': 'spot', 'spot': True, 'active': True
+}
+
+
+def make_fetcher(cache):
+    """创建DataFetcher，并把网络请求替换为计数的模拟函数"""
+    fetcher = DataFetcher(exchange_id='okx', markets_cache=cache)
+    exchange = fetcher.exchange
+    calls = {'load_markets': 0, 'fetch_time': 0}
+
+    def load_markets(reload=False, params={}):
+        calls['load_markets'] += 1
+        return exchange.set_markets([exchange.safe_market_structure(MARKET)])
+
+    def fetch_time(params={}):
+        calls['fetch_time'] += 1
+        return 1764230400000
+
+    exchange.load_markets = load_markets
+    exchange.fetch_time = fetch_time
+    return fetcher, calls
+
+
+def test_markets_cache():
+    """测试市场信息缓存"""
+    print("=" * 80)
+    print("🧪 市场信息缓存测试")
+    print("=" * 80)
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache = MarketsCache(cache_dir)
+
+        # 1. 冷启动：下载markets并写入缓存
+        fetcher, calls = make_fetcher(cache)
+        assert fetcher.test_connection()
+        assert calls == {'load_markets': 1, 'fetch_time': 0}
+        assert os.path.exists(os.path.join(cache_dir, 'okx.json'))
+        print("✅ 冷启动下载并缓存市场信息")
+
+        # 2. 热启动：构造时即从缓存加载，连通性检查只请求服务器时间
+        fetcher, calls = make_fetcher(cache)
+        assert fetcher.exchange.market('ETH/USDT')['id'] == 'ETH-USDT'
+        assert fetcher.test_connection()
+        assert calls == {'load_markets': 0, 'fetch_time': 1}
+        print("✅ 热启动跳过 load_markets，只做轻量检查")
+
+        # 3. 版本不一致时缓存失效
+        path = os.path.join(cache_dir, 'okx.json')
+        with open(path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        cached['ccxt_version'] = '0.0.0'
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(cached, f)
+        fetcher, calls = make_fetcher(cache)
+        assert not fetcher.exchange.markets
+        print("✅ ccxt版本变化后缓存失效")
+
+        # 4. 过期后缓存失效
+        assert not MarketsCache(cache_dir, ttl=-1).load('okx', fetcher.exchange)
+        print("✅ 超过有效期后缓存失效")
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_markets_cache()
+    print("\n🎉 所有测试通过！")
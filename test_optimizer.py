@@ -0,0 +1,158 @@
+"""
+测试参数优化工具
+验证网格解析、滚动切分、任务结果（包括横盘行情）与单独回测一致、多进程（共享内存）与单进程结果相同、断点续跑
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import optimizer
+
+from backtest import run_backtest, simulate
+from indicator import compute_indicator_arrays
+from optimizer import (SharedArrays, _attach_shared, evaluate_task, parse_grid, plan_tasks, run_optimizer,
+                       walk_forward_splits)
+from testkit import random_walk_arrays
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+STATS = ('trades', 'wins', 'hit_rate', 'total_return', 'max_drawdown', 'profit_factor', 'exposure')
+
+
+def test_optimizer():
+    """测试参数优化"""
+    print("=" * 80)
+    print("🧪 参数优化测试")
+    print("=" * 80)
+
+    # 1. 参数网格解析
+    assert parse_grid('10:30:5') == [10, 15, 20, 25, 30]
+    assert parse_grid('1.5:3.0:0.25') == [1.5, 1.75, 2.0, 2.25, 2.5, 2.75, 3.0]
+    assert parse_grid('2,2.5') == [2.0, 2.5]
+    print("✅ 参数网格解析正确")
+
+    # 2. 滚动切分：窗口等长，测试段首尾相接并结束于最后一根K线
+    splits = walk_forward_splits(10000, 4, 0.75)
+    assert len(splits) == 4 and splits[-1][3] == 10000
+    for (train_lo, train_hi, test_lo, test_hi), following in zip(splits, splits[1:] + [None]):
+        assert train_lo < train_hi == test_lo < test_hi
+        assert abs((test_hi - train_lo) - (splits[0][3] - splits[0][0])) <= 1
+        if following:
+            assert test_hi == following[2]
+    assert walk_forward_splits(500, 0) == [(0, 500, 500, 500)]
+    # 任务太少时按标准差倍数拆分，保证每个进程都有任务
+    assert len(plan_tasks(splits, [20], [1.5, 2.0, 2.5, 3.0], 0.0004, workers=32)) == 4 * 2 * 4
+    assert len(plan_tasks(splits, [20, 30], [1.5, 2.0], 0.0004, workers=1)) == 4 * 2 * 2
+    print(f"✅ 滚动切分正确: {splits}")
+
+    # 3. 单进程扫描；同时单独回测一组参数，用于第4步核对（测试段用之前的K线预热指标）
+    candles = random_walk_arrays(30000, seed=24)
+    periods, std_devs = [15, 20, 30], [1.5, 2.0, 2.5]
+    single = run_optimizer(candles, periods, std_devs, folds=3, train_ratio=0.7, workers=1, progress=False)
+    assert single['evaluated'] == 3 * 2 * 3
+    train_lo, train_hi, test_lo, test_hi = single['splits'][1]
+    train = run_backtest({name: values[train_lo:train_hi] for name, values in candles.items()}, 20, 2.0)
+    warm = compute_indicator_arrays(candles['close'][test_lo - 19:test_hi], 20, 2.0)
+    warm['close'] = candles['close'][test_lo - 19:test_hi]
+    test = simulate(candles['timestamp'][test_lo:test_hi], {name: values[19:] for name, values in warm.items()})
+    row = next(row for row in single['table'] if (row['boll_period'], row['boll_std']) == (20, 2.0))
+    assert row['train_trades'] > 0 and row['test_trades'] > 0
+    pick_folds = {pick['fold'] for pick in single['picks']}
+    assert pick_folds == {0, 1, 2}
+    assert len(single['table']) == 9
+    scores = [row['test_score'] for row in single['table'] if row['train_trades'] >= 30]
+    assert scores == sorted(scores, reverse=True)
+    print("✅ 排名表和滚动验证结果完整")
+
+    # 4. 多进程（共享内存）与单进程结果相同；断点续跑只计算剩余任务
+    directory = tempfile.mkdtemp()
+    try:
+        checkpoint = os.path.join(directory, 'optimizer.json')
+        parallel = run_optimizer(candles, periods, std_devs, folds=3, train_ratio=0.7, workers=2,
+                                 checkpoint=checkpoint, progress=False)
+        assert parallel['table'] == single['table'] and parallel['picks'] == single['picks']
+
+        with open(checkpoint, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        by_key = saved['tasks']
+        key = next(key for key in by_key if key.startswith('1|train|20|'))
+        stats = {(row['boll_period'], row['boll_std']): row for row in by_key[key]}[(20, 2.0)]
+        for name in STATS:
+            assert stats[name] == train.stats[name], name
+        key = next(key for key in by_key if key.startswith('1|test|20|'))
+        stats = {(row['boll_period'], row['boll_std']): row for row in by_key[key]}[(20, 2.0)]
+        for name in STATS:
+            assert stats[name] == test.stats[name], name
+        print("✅ 多进程结果与单进程相同，每个任务与单独回测一致")
+
+        # 模拟中断：删掉一部分已完成的任务
+        removed = list(by_key)[:5]
+        for key in removed:
+            del by_key[key]
+        with open(checkpoint, 'w', encoding='utf-8') as f:
+            json.dump(saved, f)
+        resumed = run_optimizer(candles, periods, std_devs, folds=3, train_ratio=0.7, workers=1,
+                                checkpoint=checkpoint, progress=False)
+        assert resumed['evaluated'] == len(removed) and resumed['table'] == single['table']
+        again = run_optimizer(candles, periods, std_devs, folds=3, train_ratio=0.7, workers=1,
+                              checkpoint=checkpoint, progress=False)
+        assert again['evaluated'] == 0 and again['table'] == single['table']
+        # 设置变化（手续费）时从头开始
+        changed = run_optimizer(candles, periods, std_devs, folds=3, train_ratio=0.7, fee_rate=0.0,
+                                workers=1, checkpoint=checkpoint, progress=False)
+        assert changed['evaluated'] == 3 * 2 * 3
+        print(f"✅ 断点续跑只计算剩余的 {len(removed)} 个任务，设置变化时重新计算")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    # 5. 共享内存数组在关闭后被删除
+    shared = SharedArrays({'close': candles['close']})
+    name = shared.spec['close'][0]
+    shared.close()
+    try:
+        shared_memory.SharedMemory(name=name)
+        assert False, '共享内存未删除'
+    except FileNotFoundError:
+        pass
+    print("✅ 共享内存关闭后已删除")
+
+    # 6. 全样本扫描（没有测试段）
+    full = run_optimizer(candles, [20], [2.0, 2.5], folds=0, workers=1, progress=False)
+    assert not full['picks'] and 'test_score' not in full['table'][0]
+    assert full['table'][0]['train_trades'] > 0
+    print("✅ 全样本扫描按训练段排名")
+
+    # 7. 横盘较多的行情：单个任务的统计与同样参数的 run_backtest 完全相同
+    rng = np.random.default_rng(31)
+    levels = np.round(3123.45 + np.cumsum(rng.choice([-0.05, 0.05], 400)), 2)
+    close = np.repeat(levels, rng.integers(5, 40, 400))
+    flat_candles = {'timestamp': np.arange(len(close), dtype=np.int64) * 60_000, 'close': close}
+    shared = SharedArrays(flat_candles)
+    try:
+        _attach_shared(shared.spec)
+        task = plan_tasks(walk_forward_splits(len(close), 0), [20], [1.5, 2.0, 2.5], 0.0004)[0]
+        _, rows = evaluate_task(task)
+    finally:
+        optimizer._SHARED.clear()
+        for block in optimizer._SHARED_BLOCKS:
+            block.close()
+        optimizer._SHARED_BLOCKS.clear()
+        shared.close()
+    for row in rows:
+        expected = run_backtest(flat_candles, 20, row['boll_std'], fee_rate=0.0004).stats
+        assert expected['trades'] > 0
+        for name in STATS:
+            assert row[name] == expected[name], (row['boll_std'], name)
+    print("✅ 横盘行情中任务结果与 run_backtest 一致")
+
+    print("\n🎉 参数优化测试通过！")
+
+
+if __name__ == '__main__':
+    test_optimizer()
@@ -0,0 +1,105 @@
+"""
+测试分位数通道
+验证批量计算、增量计算与pandas rolling().quantile() 一致，SignalDetector可用分位数通道代替布林带
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from incremental_indicator import IncrementalIndicators, IncrementalQuantileBands
+from indicator import SortedWindow, calculate_quantile_band_arrays, calculate_quantile_bands
+from signal_detector import SignalDetector, SignalType
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+
+def test_quantile_bands():
+    """测试分位数通道"""
+    print("=" * 80)
+    print("🧪 分位数通道测试")
+    print("=" * 80)
+
+    rng = np.random.default_rng(21)
+    # 厚尾收益率（t分布），含重复价格
+    close = np.round(3000 + np.cumsum(rng.standard_t(3, 3000) * 4), 1)
+    series = pd.Series(close)
+
+    # 1. 有序滑动窗口
+    window = SortedWindow(5)
+    for value in (5.0, 1.0, 3.0, 3.0, 9.0, 2.0):
+        window.push(value)
+    assert len(window) == 5 and window._sorted == [1.0, 2.0, 3.0, 3.0, 9.0]
+    window.replace_last(4.0)
+    assert window._sorted == [1.0, 3.0, 3.0, 4.0, 9.0]
+    assert window.quantile(0.0) == 1.0 and window.quantile(1.0) == 9.0 and window.quantile(0.5) == 3.0
+    assert window.quantile(0.875) == 4.0 + (9.0 - 4.0) * 0.5
+    assert np.isnan(SortedWindow(3).quantile(0.5))
+    print("✅ 有序滑动窗口插入、淘汰、替换和分位数正确")
+
+    # 2. 批量计算与pandas一致
+    for period, quantiles in ((20, (0.025, 0.5, 0.975)), (7, (0.1, 0.5, 0.9)), (1, (0.0, 0.5, 1.0))):
+        upper, middle, lower = calculate_quantile_band_arrays(close, period, quantiles)
+        rolling = series.rolling(period)
+        assert np.allclose(lower, rolling.quantile(quantiles[0]), equal_nan=True)
+        assert np.allclose(middle, rolling.quantile(quantiles[1]), equal_nan=True)
+        assert np.allclose(upper, rolling.quantile(quantiles[2]), equal_nan=True)
+    assert all(len(band) == 0 for band in calculate_quantile_band_arrays(close[:0]))
+    assert np.isnan(calculate_quantile_band_arrays(close[:10])[0]).all()
+    frame = calculate_quantile_bands(pd.DataFrame({'close': close}))
+    assert np.allclose(frame['qband_upper'], series.rolling(20).quantile(0.975), equal_nan=True)
+    print("✅ 批量计算与pandas rolling().quantile() 一致")
+
+    # 3. 增量计算（含未收盘K线的更新）与批量计算完全一致
+    bands = IncrementalQuantileBands(20)
+    upper, middle, lower = calculate_quantile_band_arrays(close, 20)
+    for i, price in enumerate(close):
+        bands.update(price + 50)
+        result = bands.replace_last(price)
+        assert result == (upper[i], middle[i], lower[i]) or (np.isnan(result[0]) and np.isnan(upper[i])), i
+
+    tracker = IncrementalIndicators(quantiles=(0.025, 0.5, 0.975))
+    for i, price in enumerate(close[:200]):
+        latest = tracker.update([i * 60000, price, price, price, price, 1.0])
+    assert latest['qband_upper'] == upper[199] and latest['qband_lower'] == lower[199]
+    assert 'qband_upper' not in IncrementalIndicators().update([0, 1, 1, 1, 1, 1])
+    print("✅ 增量计算与批量计算完全一致")
+
+    # 3b. 含NaN的收盘价：NaN不破坏有序窗口，含NaN的窗口在批量、增量和pandas中都为NaN
+    gappy = close[:300].copy()
+    gappy[[50, 51, 180]] = np.nan
+    upper, middle, lower = calculate_quantile_band_arrays(gappy, 20)
+    assert np.allclose(lower, pd.Series(gappy).rolling(20).quantile(0.025), equal_nan=True)
+    assert np.isnan(middle[50:71]).all() and not np.isnan(middle[49]) and not np.isnan(middle[71])
+    bands = IncrementalQuantileBands(20)
+    for i, price in enumerate(gappy):
+        result = bands.update(price)
+        assert result == (upper[i], middle[i], lower[i]) or (np.isnan(result[0]) and np.isnan(upper[i])), i
+    assert bands.window._missing == 0 and bands.window._sorted == sorted(gappy[-20:])
+    window = SortedWindow(3)
+    for value in (1.0, float('nan'), 2.0):
+        window.push(value)
+    assert np.isnan(window.quantile(0.5))
+    window.push(3.0)
+    window.push(4.0)
+    assert window.quantile(0.5) == 3.0
+    window.replace_last(float('nan'))
+    assert np.isnan(window.quantile(0.5)) and window._sorted == [2.0, 3.0]
+    print("✅ 含NaN的窗口在批量、增量和pandas中一致为NaN")
+
+    # 4. SignalDetector 使用分位数通道代替布林带
+    detector = SignalDetector(band_prefix='qband')
+    indicators = {'close': 95.0, 'rsi': 25.0, 'boll_upper': 120.0, 'boll_middle': 100.0, 'boll_lower': 90.0,
+                  'qband_upper': 110.0, 'qband_middle': 100.0, 'qband_lower': 96.0}
+    assert detector.detect_signal(indicators)['signal_type'] == SignalType.LONG
+    assert SignalDetector().detect_signal(indicators)['signal_type'] == SignalType.NEUTRAL
+    assert detector.detect_signal(dict(indicators, close=101.0))['signal_type'] == SignalType.EXIT_LONG
+    assert detector.detect_signal({'close': 95.0, 'rsi': 25.0, 'boll_upper': 120.0, 'boll_middle': 100.0,
+                                   'boll_lower': 90.0})['reason'] == '数据不完整'
+    print("✅ SignalDetector(band_prefix='qband') 按分位数通道检测信号")
+
+
+if __name__ == '__main__':
+    test_quantile_bands()
+    print("\n🎉 所有测试通过！")
@@ -0,0 +1,97 @@
+"""
+测试跨进程共享限频
+验证令牌桶按请求权重扣减、低优先级请求为关键请求保留额度、多个进程共用同一份额度
+"""
+import multiprocessing
+import shutil
+import sys
+import tempfile
+import time
+
+from data_fetcher import DataFetcher
+from rate_limiter import EXCHANGE_LIMITS, PRIORITY_CRITICAL, PRIORITY_LOW, RateLimitScheduler
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+TEST_LIMITS = {'test': {'capacity': 10, 'refill_per_sec': 20, 'weights': {'heavy': 4}}}
+
+
+def consume(state_dir, count):
+    """子进程：申请count次额度"""
+    scheduler = RateLimitScheduler(state_dir, limits=TEST_LIMITS)
+    for _ in range(count):
+        scheduler.acquire('test', 'light')
+
+
+def test_rate_limiter():
+    """测试限频调度"""
+    print("=" * 80)
+    print("🧪 跨进程限频测试")
+    print("=" * 80)
+
+    state_dir = tempfile.mkdtemp()
+    try:
+        # 1. 按方法权重扣减，剩余额度可查询
+        scheduler = RateLimitScheduler(state_dir, limits=TEST_LIMITS)
+        assert scheduler.weight('test', 'heavy') == 4
+        assert scheduler.weight('test', 'light') == 1
+        scheduler.acquire('test', 'heavy')
+        scheduler.acquire('test', 'light')
+        assert 4.5 <= scheduler.remaining('test') <= 6
+        print("✅ 按请求权重扣减额度")
+
+        # 2. 同一目录下的另一个实例看到相同的剩余额度
+        other = RateLimitScheduler(state_dir, limits=TEST_LIMITS)
+        assert abs(other.remaining('test') - scheduler.remaining('test')) < 1
+        print("✅ 多个实例共享状态文件")
+
+        # 3. 低优先级请求不能使用保留额度，关键请求可以
+        scheduler = RateLimitScheduler(state_dir, low_priority_reserve=0.5, limits={
+            'slow': {'capacity': 10, 'refill_per_sec': 5, 'weights': {}}
+        })
+        scheduler.acquire('slow', 'any', PRIORITY_CRITICAL, cost=6)
+        started = time.perf_counter()
+        scheduler.acquire('slow', 'any', PRIORITY_LOW, cost=1)
+        waited = time.perf_counter() - started
+        # 剩余4，低优先级需要扣减后仍不少于5，要等 (1 + 5 - 4) / 5 = 0.4秒
+        assert waited >= 0.3, waited
+        started = time.perf_counter()
+        scheduler.acquire('slow', 'any', PRIORITY_CRITICAL, cost=4)
+        assert time.perf_counter() - started < 0.1
+        print(f"✅ 低优先级请求等待 {waited:.2f}秒，关键请求直接使用保留额度")
+
+        # 4. 两个进程共用额度：共30个令牌，容量10，每秒恢复20 → 至少1秒
+        started = time.perf_counter()
+        workers = [multiprocessing.Process(target=consume, args=(state_dir, 15)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+            assert worker.exitcode == 0
+        elapsed = time.perf_counter() - started
+        # 不共享时每个进程只需 (15 - 10) / 20 = 0.25秒
+        assert elapsed >= 0.9, elapsed
+        print(f"✅ 两个进程共享额度，耗时 {elapsed:.2f}秒")
+
+        # 5. DataFetcher 每次请求前申请额度
+        # 恢复速度调低，避免两次查询之间恢复的令牌影响扣减量
+        scheduler = RateLimitScheduler(state_dir, limits={
+            'binance': dict(EXCHANGE_LIMITS['binance'], refill_per_sec=0.01)
+        })
+        fetcher = DataFetcher(exchange_id='binance', rate_limiter=scheduler)
+        fetcher.exchange.fetch_ohlcv = lambda symbol, timeframe, limit=None, **kwargs: [
+            [1764230400000, 1.0, 1.0, 1.0, 1.0, 1.0]
+        ]
+        before = scheduler.remaining('binance')
+        assert fetcher.fetch_ohlcv('ETH/USDT', '1h', limit=1) is not None
+        used = before - scheduler.remaining('binance')
+        assert 1.9 < used <= 2, used
+        print("✅ DataFetcher 按权重申请额度")
+    finally:
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    test_rate_limiter()
+    print("\n🎉 所有测试通过！")
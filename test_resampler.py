@@ -0,0 +1,146 @@
+"""
+测试K线周期合成
+验证从1分钟K线合成的各周期与直接按周期聚合的结果一致，逐根更新时只重算最后一根，
+基础K线缺口不被跨越，本地K线存储预热后不再按周期请求交易所，
+以及无法合成或基础K线不可能够用时直接按周期请求
+"""
+import shutil
+import sys
+import tempfile
+
+from candle_store import CandleStore
+from data_fetcher import DataFetcher
+from resampler import TimeframeResampler, resample_ohlcv, timeframe_to_ms
+from testkit import FakeExchange, random_walk_candles
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+DAY_START = 1764201600000  # 2025-11-27 00:00 UTC
+
+
+def reference(candles, timeframe):
+    """逐周期分组的参考实现"""
+    timeframe_ms = timeframe_to_ms(timeframe)
+    groups = {}
+    for candle in candles:
+        groups.setdefault(candle[0] - candle[0] % timeframe_ms, []).append(candle)
+    return [[bucket, group[0][1], max(c[2] for c in group), min(c[3] for c in group),
+             group[-1][4], sum(c[5] for c in group)]
+            for bucket, group in sorted(groups.items())]
+
+
+def assert_same(actual, expected):
+    assert len(actual) == len(expected), (len(actual), len(expected))
+    for a, e in zip(actual, expected):
+        assert a[0] == e[0]
+        assert all(abs(x - y) < 1e-9 for x, y in zip(a[1:], e[1:])), (a, e)
+
+
+def test_resampler():
+    """测试周期合成"""
+    print("=" * 80)
+    print("🧪 K线周期合成测试")
+    print("=" * 80)
+
+    minutes = random_walk_candles(DAY_START, 3 * 1440 + 37)
+
+    # 1. 一次性合成与参考实现一致（最后一根为未收盘K线）
+    for timeframe in ('5m', '15m', '1h', '4h', '1d'):
+        assert_same(resample_ohlcv(minutes, timeframe_to_ms(timeframe)), reference(minutes, timeframe))
+    print("✅ 5m/15m/1h/4h/1d 合成结果正确")
+
+    # 2. 基础K线从周期中间开始时丢弃不完整的第一根
+    assert resample_ohlcv(minutes[7:], timeframe_to_ms('15m'))[0][0] == DAY_START + 15 * 60_000
+    print("✅ 丢弃不完整的第一根合成K线")
+
+    # 3. 逐根推送（含未收盘K线的多次更新）与一次性合成一致
+    resampler = TimeframeResampler()
+    resampler.update('ETH/USDT', minutes[:1000])
+    assert resampler.get('ETH/USDT', '1h', limit=5)
+    for candle in minutes[1000:]:
+        partial = list(candle)
+        partial[4] = partial[1]
+        partial[5] = partial[5] / 2
+        resampler.update('ETH/USDT', [partial])
+        resampler.update('ETH/USDT', [candle])
+    for timeframe in ('1m', '15m', '1h', '4h', '1d'):
+        assert_same(resampler.get('ETH/USDT', timeframe, limit=10_000), reference(minutes, timeframe))
+    print("✅ 增量更新与一次性合成一致")
+
+    # 4. 数据量判断
+    assert resampler.covers('ETH/USDT', '1h', 72)
+    assert not resampler.covers('ETH/USDT', '1d', 10)
+    assert resampler.get('BTC/USDT', '1h') == []
+    print("✅ 本地数据量判断正确")
+
+    # 5. 无法对齐的周期
+    try:
+        resampler.get('ETH/USDT', '7m')
+        assert False, '应当拒绝无法按天对齐的周期'
+    except ValueError:
+        pass
+    print("✅ 拒绝无法合成的周期")
+
+    # 6. 超过上限时丢弃最早的基础K线
+    small = TimeframeResampler(max_base_candles=300)
+    small.update('ETH/USDT', minutes[:1000])
+    assert small.get('ETH/USDT', '1m', limit=10_000)[0][0] == minutes[700][0]
+    print("✅ 基础K线数量受上限约束")
+
+    # 7. 基础K线有缺口时丢弃缺口之前的数据，合成K线不跨缺口合并
+    gapped = TimeframeResampler()
+    gapped.update('ETH/USDT', minutes[:500])
+    assert gapped.get('ETH/USDT', '1h', limit=1000)
+    gapped.update('ETH/USDT', minutes[800:1000])
+    assert gapped.get('ETH/USDT', '1m', limit=10_000)[0][0] == minutes[800][0]
+    assert_same(gapped.get('ETH/USDT', '1h', limit=1000), reference(minutes[840:1000], '1h'))
+    gapped.update('ETH/USDT', minutes[1000:1100] + minutes[1200:1300])
+    assert_same(gapped.get('ETH/USDT', '1h', limit=1000), reference(minutes[1200:1300], '1h'))
+    print("✅ 基础K线缺口之前的数据被丢弃")
+
+    # 8. 本地K线存储已预热（backfill.py）时，1h周期直接从存储合成，不按周期请求交易所
+    root = tempfile.mkdtemp()
+    try:
+        store = CandleStore(root)
+        store.write('binance', 'ETH/USDT', '1m', minutes)
+        exchange = FakeExchange(candles=minutes)
+        fetcher = DataFetcher(candle_store=store)
+        fetcher.exchange = exchange
+        warm = TimeframeResampler(fetcher)
+        for _ in range(2):
+            candles = warm.fetch('ETH/USDT', '1h', limit=60)
+            assert_same(candles, reference(minutes, '1h')[-60:])
+        assert [call['timeframe'] for call in exchange.calls] == ['1m', '1m']
+
+        # 存储为空：一次增量请求（500根）不可能合成60根1h，不做同步直接按周期请求
+        exchange = FakeExchange(candles=minutes)
+        fetcher = DataFetcher(candle_store=CandleStore(root + '_empty'))
+        fetcher.exchange = exchange
+        cold = TimeframeResampler(fetcher)
+        assert len(cold.fetch('ETH/USDT', '1h', limit=60)) == 60
+        assert [call['timeframe'] for call in exchange.calls] == ['1h']
+        # 已有K线加一次增量请求可能够用时先同步，够用则本地合成，不够（不完整的第一根被丢弃）再按周期请求；
+        # 超出这个范围时不同步直接按周期请求
+        assert_same(cold.fetch('ETH/USDT', '15m', limit=20), reference(minutes, '15m')[-20:])
+        assert len(cold.fetch('ETH/USDT', '15m', limit=34)) == 34
+        assert len(cold.fetch('ETH/USDT', '15m', limit=100)) == 100
+        assert [call['timeframe'] for call in exchange.calls] == ['1h', '1m', '1m', '15m', '15m']
+
+        # 无法合成的周期（1w 不被解析，7m 不能按天对齐）直接按周期请求
+        exchange = FakeExchange(candles=minutes)
+        fetcher = DataFetcher(candle_store=store)
+        fetcher.exchange = exchange
+        weekly = TimeframeResampler(fetcher)
+        weekly.fetch('ETH/USDT', '1w', limit=5)  # 模拟交易所不支持1w，返回None，但不抛出异常
+        assert len(weekly.fetch('ETH/USDT', '7m', limit=5)) == 5
+        assert [call['timeframe'] for call in exchange.calls] == ['1w', '7m']
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(root + '_empty', ignore_errors=True)
+    print("✅ 存储预热后1h周期不再单独请求交易所")
+
+
+if __name__ == '__main__':
+    test_resampler()
+    print("\n🎉 所有测试通过！")
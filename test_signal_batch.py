@@ -0,0 +1,122 @@
+"""
+测试批量信号检测
+验证 detect_signals_batch 与逐根调用 detect_signal 的信号类型、强度、持仓和最终状态（含开仓K线）完全相同
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicator import calculate_all_indicators, calculate_quantile_band_arrays, compute_indicator_arrays
+from signal_detector import BATCH_SIGNAL_TYPES, SignalDetector, SignalType
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+POSITIONS = {SignalType.LONG: 1, SignalType.SHORT: -1}
+
+
+def run_loop(detector, data, prefix='boll'):
+    """逐根调用 detect_signal，返回 (信号类型, 强度, 持仓)"""
+    types, strengths, positions = [], [], []
+    for i in range(len(data['close'])):
+        signal = detector.detect_signal({name: data[name][i] for name in
+                                         ('close', 'rsi', f'{prefix}_upper', f'{prefix}_middle', f'{prefix}_lower')})
+        types.append(signal['signal_type'])
+        strengths.append(signal['strength'])
+        last = detector.last_signal
+        positions.append(POSITIONS[last['signal_type']] if last else 0)
+    return types, strengths, positions
+
+
+def assert_same(batch, loop):
+    types, strengths, positions = loop
+    assert [BATCH_SIGNAL_TYPES[code] for code in batch['signal']] == types
+    assert batch['strength'].tolist() == strengths
+    assert batch['position'].tolist() == positions
+
+
+def test_signal_batch():
+    """测试批量信号检测"""
+    print("=" * 80)
+    print("🧪 批量信号检测测试")
+    print("=" * 80)
+
+    rng = np.random.default_rng(22)
+    close = 3000 + np.cumsum(rng.normal(0, 8, 8000))
+    data = compute_indicator_arrays(close)
+    data['close'] = close
+
+    # 1. 与逐根调用完全相同（从空仓、多单、空单开始）
+    for start in (None, SignalType.LONG, SignalType.SHORT):
+        loop_detector, batch_detector = SignalDetector(), SignalDetector()
+        if start:
+            seed = {'close': 100.0, 'rsi': 50.0, 'boll_upper': 120.0, 'boll_middle': 110.0, 'boll_lower': 100.0}
+            if start == SignalType.SHORT:
+                seed.update(close=120.0)
+            loop_detector.detect_signal(seed)
+            batch_detector.detect_signal(seed)
+        loop = run_loop(loop_detector, data)
+        batch = batch_detector.detect_signals_batch(data)
+        assert_same(batch, loop)
+        assert (batch_detector.last_signal is None) == (loop_detector.last_signal is None)
+        if loop_detector.last_signal:
+            for key in ('signal_type', 'strength', 'reason', 'indicators'):
+                assert batch_detector.last_signal[key] == loop_detector.last_signal[key]
+    assert set(batch['signal'].tolist()) == {0, 1, 2, 3, 4}
+    print("✅ 信号类型、强度、持仓和最终状态与逐根调用完全相同")
+
+    # 2. 分段批量检测与整段相同；update_state=False 不改变状态
+    detector = SignalDetector()
+    parts = [detector.detect_signals_batch({name: values[lo:lo + 2000] for name, values in data.items()})
+             for lo in range(0, len(close), 2000)]
+    whole = SignalDetector().detect_signals_batch(data)
+    for name in ('signal', 'strength', 'position'):
+        assert np.array_equal(np.concatenate([part[name] for part in parts]), whole[name])
+    state = detector.last_signal
+    detector.detect_signals_batch(data, update_state=False)
+    assert detector.last_signal is state
+    empty = SignalDetector().detect_signals_batch({name: values[:0] for name, values in data.items()})
+    assert len(empty['signal']) == 0
+    print("✅ 分段检测与整段一致，update_state=False 不改变状态")
+
+    # 3. DataFrame输入和分位数通道
+    frame = calculate_all_indicators(pd.DataFrame({'close': close[:3000]}))
+    assert_same(SignalDetector().detect_signals_batch(frame),
+                run_loop(SignalDetector(), {name: frame[name].to_numpy() for name in frame.columns}))
+    upper, middle, lower = calculate_quantile_band_arrays(close[:3000])
+    qdata = {'close': close[:3000], 'rsi': data['rsi'][:3000],
+             'qband_upper': upper, 'qband_middle': middle, 'qband_lower': lower}
+    assert_same(SignalDetector(band_prefix='qband').detect_signals_batch(qdata),
+                run_loop(SignalDetector(band_prefix='qband'), qdata, 'qband'))
+    print("✅ DataFrame输入和分位数通道一致")
+
+    # 3b. 索引不是从0开始的DataFrame：恢复的开仓K线按位置取时间戳
+    frame = calculate_all_indicators(pd.DataFrame({
+        'timestamp': pd.date_range('2024-01-01', periods=3000, freq='min'), 'close': close[:3000]}))
+    # 截到最后一根持仓K线，使检测结束时仍有持仓
+    end = 100 + np.flatnonzero(SignalDetector().detect_signals_batch(frame.iloc[100:])['position'])[-1] + 1
+    for part in (frame.iloc[100:end], frame.iloc[100:end].set_index(frame.index[100:end] * 7)):
+        batch_detector, loop_detector = SignalDetector(), SignalDetector()
+        batch_detector.detect_signals_batch(part)
+        for row in part.to_dict('records'):
+            loop_detector.detect_signal(row)
+        assert loop_detector.get_position() is not None
+        assert batch_detector.get_position().entry_bar == loop_detector.get_position().entry_bar
+        assert isinstance(batch_detector.get_position().entry_bar, pd.Timestamp)
+    print("✅ 非0起始索引的DataFrame按位置恢复开仓K线")
+
+    # 4. 性能对比
+    start = time.perf_counter()
+    run_loop(SignalDetector(), data)
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    SignalDetector().detect_signals_batch(data)
+    batch_time = time.perf_counter() - start
+    print(f"✅ {len(close)} 根K线: 逐根 {loop_time * 1000:.0f}ms, 批量 {batch_time * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    test_signal_batch()
+    print("\n🎉 所有测试通过！")
@@ -0,0 +1,162 @@
+"""
+测试按交易对保存的持仓状态
+验证多个交易对互不干扰、detect_many 与逐个检测一致、多线程更新、按交易对恢复历史、last_signal 兼容
+"""
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+
+from indicator import compute_indicator_arrays
+from signal_detector import PositionState, SignalDetector, SignalType
+
+# 设置UTF-8编码
+sys.stdout.reconfigure(encoding='utf-8')
+
+BAND = {'rsi': 50.0, 'boll_upper': 120.0, 'boll_middle': 110.0, 'boll_lower': 100.0}
+
+
+def make_series(symbols, n=3000):
+    """每个交易对一段随机游走和对应的指标"""
+    series = {}
+    for seed, symbol in enumerate(symbols):
+        close = 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.003, n)))
+        data = compute_indicator_arrays(close)
+        series[symbol] = [{'close': close[i], 'rsi': data['rsi'][i], 'boll_upper': data['boll_upper'][i],
+                           'boll_middle': data['boll_middle'][i], 'boll_lower': data['boll_lower'][i],
+                           'timestamp': i} for i in range(20, n)]
+    return series
+
+
+def replay(rows):
+    """单交易对检测器逐根检测，返回信号类型序列"""
+    detector = SignalDetector()
+    return [detector.detect_signal(row)['signal_type'] for row in rows], detector
+
+
+def test_signal_state():
+    """测试按交易对保存的持仓状态"""
+    print("=" * 80)
+    print("🧪 按交易对持仓状态测试")
+    print("=" * 80)
+
+    # 1. 不同交易对的持仓互不影响；持仓记录包含方向、开仓价和开仓K线
+    detector = SignalDetector()
+    assert detector.detect_signal(dict(BAND, close=99.0), 'ETH/USDT')['signal_type'] == SignalType.LONG
+    assert detector.detect_signal(dict(BAND, close=121.0), 'BTC/USDT')['signal_type'] == SignalType.SHORT
+    assert detector.detect_signal(dict(BAND, close=111.0), 'SOL/USDT')['signal_type'] == SignalType.NEUTRAL
+    assert detector.detect_signal(dict(BAND, close=111.0), 'ETH/USDT')['signal_type'] == SignalType.EXIT_LONG
+    state = detector.get_position('BTC/USDT')
+    assert state.side == SignalType.SHORT and state.entry_price == 121.0 and state.entry_bar is None
+    assert set(detector.positions) == {'BTC/USDT'} and detector.last_signal is None
+    assert not hasattr(state, '__dict__')
+    detector.detect_signal(dict(BAND, close=98.0, timestamp=1234), 'SOL/USDT')
+    assert detector.get_position('SOL/USDT').entry_bar == 1234
+    print("✅ 各交易对的持仓互不影响，平仓后删除记录")
+
+    # 2. detect_many 与每个交易对单独使用一个检测器的结果相同
+    symbols = [f'COIN{i}/USDT' for i in range(20)]
+    series = make_series(symbols)
+    expected = {symbol: replay(rows) for symbol, rows in series.items()}
+    detector = SignalDetector()
+    results = {symbol: [] for symbol in symbols}
+    for i in range(len(series[symbols[0]])):
+        for symbol, signal in detector.detect_many({symbol: series[symbol][i] for symbol in symbols}).items():
+            results[symbol].append(signal['signal_type'])
+    for symbol in symbols:
+        types, single = expected[symbol]
+        assert results[symbol] == types
+        state = detector.get_position(symbol)
+        assert (state is None) == (single.last_signal is None)
+        if state:
+            for key in ('signal_type', 'strength', 'reason', 'indicators'):
+                assert state.signal[key] == single.last_signal[key]
+            assert state.entry_bar == single.get_position().entry_bar
+    print(f"✅ detect_many 与 {len(symbols)} 个独立检测器的结果相同")
+
+    # 3. 多线程同时更新不同交易对
+    detector = SignalDetector()
+    threaded = {}
+
+    def worker(symbol):
+        threaded[symbol] = [detector.detect_signal(row, symbol)['signal_type'] for row in series[symbol]]
+
+    threads = [threading.Thread(target=worker, args=(symbol,)) for symbol in symbols]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(threaded[symbol] == expected[symbol][0] for symbol in symbols)
+    print("✅ 多线程并发检测结果与单线程相同")
+
+    # 4. 批量检测按交易对推进状态
+    detector = SignalDetector()
+    for symbol in symbols[:3]:
+        rows = series[symbol]
+        data = {name: np.array([row[name] for row in rows]) for name in rows[0]}
+        detector.detect_signals_batch(data, symbol=symbol)
+        single = expected[symbol][1]
+        state = detector.get_position(symbol)
+        assert (state is None) == (single.last_signal is None)
+        if state:
+            assert state.signal['reason'] == single.last_signal['reason']
+            assert state.entry_bar == single.get_position().entry_bar
+    assert detector.last_signal is None
+    print("✅ detect_signals_batch 按交易对更新持仓状态")
+
+    # 5. last_signal 兼容单交易对用法（default_symbol）
+    detector = SignalDetector(default_symbol='ETH/USDT')
+    detector.detect_signal(dict(BAND, close=99.0))
+    assert detector.last_signal['signal_type'] == SignalType.LONG
+    assert detector.get_position('ETH/USDT').signal is detector.last_signal
+    detector.last_signal = None
+    assert detector.get_position('ETH/USDT') is None
+    detector.last_signal = {'signal_type': SignalType.SHORT, 'indicators': {'price': 130.0}}
+    assert isinstance(detector.get_position(), PositionState) and detector.get_position().entry_price == 130.0
+    print("✅ last_signal 读写默认交易对的状态")
+
+    # 6. 按交易对恢复历史；最近一次为平仓信号的交易对不恢复持仓
+    path = 'test_signals_history_state.json'
+    history = [
+        {'symbol': 'ETH/USDT', 'signal_type': '做多', 'timestamp': '2025-01-01 00:00:00', 'indicators': {'price': 3000}},
+        {'symbol': 'BTC/USDT', 'signal_type': '做空', 'timestamp': '2025-01-01 00:01:00', 'indicators': {'price': 90000}},
+        {'symbol': 'SOL/USDT', 'signal_type': '做多', 'timestamp': '2025-01-01 00:02:00', 'indicators': {'price': 200}},
+        {'symbol': 'SOL/USDT', 'signal_type': '平多', 'timestamp': '2025-01-01 00:03:00', 'indicators': {'price': 210}},
+        {'symbol': 'ETH/USDT', 'signal_type': '中性', 'timestamp': '2025-01-01 00:04:00', 'indicators': {'price': 3010}},
+    ]
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(history, f, ensure_ascii=False)
+        detector = SignalDetector(max_history=3)
+        detector.load_history(path)
+        assert set(detector.positions) == {'ETH/USDT', 'BTC/USDT'}
+        assert detector.get_position('ETH/USDT').side == SignalType.LONG
+        assert detector.get_position('BTC/USDT').entry_price == 90000
+        assert detector.default_symbol is None and detector.last_signal is None
+        assert len(detector.signals_history) == 3
+        assert detector.detect_signal(dict(BAND, close=111.0), 'ETH/USDT')['signal_type'] == SignalType.EXIT_LONG
+
+        # 单交易对的历史文件：作为默认交易对，不指定交易对的调用沿用它的状态
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(history[:1], f, ensure_ascii=False)
+        detector = SignalDetector()
+        detector.load_history(path)
+        assert detector.default_symbol == 'ETH/USDT' and detector.last_signal['signal_type'] == SignalType.LONG
+    finally:
+        os.remove(path)
+    print("✅ 按交易对恢复持仓状态")
+
+    # 7. 信号历史上限
+    detector = SignalDetector(max_history=100)
+    for i in range(250):
+        detector.record_signal(symbols[i % len(symbols)], {'signal_type': SignalType.NEUTRAL, 'strength': i})
+    assert len(detector.signals_history) == 100 and detector.signals_history[0]['strength'] == 150
+    print("✅ 信号历史按 max_history 保留最新的记录")
+
+    print("\n🎉 按交易对持仓状态测试通过！")
+
+
+if __name__ == '__main__':
+    test_signal_state()
@@ -0,0 +1,105 @@
+"""
+测试辅助模块 - 各测试共用的K线生成函数和模拟交易所（本身不是测试文件）
+"""
+import random
+import threading
+
+import numpy as np
+
+from resampler import resample_ohlcv, timeframe_to_ms
+
+MINUTE = 60_000
+
+
+def linear_candles(start_ts, count, price=3000.0):
+    """生成连续的1分钟K线，第i根的收盘价为 price + i"""
+    return [[start_ts + i * MINUTE, price + i, price + i + 1, price + i - 1, price + i, 1.0]
+            for i in range(count)]
+
+
+def random_walk_candles(start_ts, count, seed=7):
+    """生成随机游走的1分钟K线（ccxt格式列表）"""
+    rng = random.Random(seed)
+    candles = []
+    price = 3000.0
+    for i in range(count):
+        open_ = price
+        price += rng.uniform(-5, 5)
+        high = max(open_, price) + rng.uniform(0, 2)
+        low = min(open_, price) - rng.uniform(0, 2)
+        candles.append([start_ts + i * MINUTE, open_, high, low, price, rng.uniform(1, 10)])
+    return candles
+
+
+def random_walk_arrays(n, seed=23, start_ms=1_700_000_040_000):
+    """生成随机游走的1分钟K线（列名 -> 数组，与 CandleStore.open_arrays 相同）"""
+    rng = np.random.default_rng(seed)
+    close = 3000 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.0005, n)) * close
+    return {
+        'timestamp': start_ms + np.arange(n, dtype=np.int64) * MINUTE,
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+        'volume': rng.uniform(1, 10, n)
+    }
+
+
+class FakeExchange:
+    """
+    模拟交易所：实现 DataFetcher / Backfiller 用到的 parse_timeframe、milliseconds、fetch_ohlcv，
+    并记录每次 fetch_ohlcv 的参数（calls）
+
+    传入 candles 时按请求周期从这些1分钟K线合成返回；否则按时间戳生成K线，
+    设置了 now_ms 时只返回当前时间之前的K线，且价格随 now_ms 变化（模拟未收盘K线的更新）
+    """
+
+    rateLimit = 0
+
+    def __init__(self, now_ms=None, candles=None, fail_after_since=None):
+        """
+        Args:
+            now_ms: 交易所当前时间（毫秒），默认为最后一根K线之后30秒
+            candles: 1分钟K线历史
+            fail_after_since: since不早于该值的请求抛出 RuntimeError，模拟任务中途被杀
+        """
+        self.now_ms = now_ms
+        self.candles = candles
+        self.fail_after_since = fail_after_since
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def parse_timeframe(self, timeframe):
+        return timeframe_to_ms(timeframe) // 1000
+
+    def milliseconds(self):
+        if self.now_ms is None:
+            return self.candles[-1][0] + 30_000
+        return self.now_ms
+
+    def _generate(self, timeframe_ms, since, limit):
+        price = 3000 + (self.now_ms or 0) / 1e9
+        last = None if self.now_ms is None else self.now_ms - self.now_ms % timeframe_ms
+        ts = since if since is not None else last - (limit - 1) * timeframe_ms
+        candles = []
+        while (last is None or ts <= last) and len(candles) < limit:
+            close = price + ts / timeframe_ms
+            candles.append([ts, close, close + 1, close - 1, close, 10.0])
+            ts += timeframe_ms
+        return candles
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        with self._lock:
+            self.calls.append({'symbol': symbol, 'timeframe': timeframe, 'since': since, 'limit': limit})
+        if self.fail_after_since is not None and since >= self.fail_after_since:
+            raise RuntimeError('job killed')
+
+        timeframe_ms = timeframe_to_ms(timeframe)
+        if self.candles is None:
+            return self._generate(timeframe_ms, since, limit)
+        candles = resample_ohlcv(self.candles, timeframe_ms, drop_partial_head=False)
+        if since is not None:
+            return [list(candle) for candle in candles if candle[0] >= since][:limit]
+        return [list(candle) for candle in candles[-limit:]]